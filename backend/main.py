@@ -2,20 +2,39 @@
 """
 Main entry point for the Gospel Study API
 This file serves as the entry point for Google Cloud Run deployment
+
+Set WORKERS > 1 to pre-fork that many worker processes sharing one
+preloaded copy of the search index (see search/serving.py). A hot index
+reload gives each worker a private copy of the new index until the next
+restart.
 """
 
+import os
+
 import uvicorn
-from search.api import app
+
+
+def __getattr__(name):
+    # Keeps "uvicorn main:app" working without importing the API into the pre-fork master
+    if name == "app":
+        from search.api import app
+        return app
+    raise AttributeError(name)
 
 if __name__ == "__main__":
     # Get port from environment variable or default to 8080
-    import os
     port = int(os.environ.get("PORT", 8080))
-    
-    # Run the FastAPI application
-    uvicorn.run(
-        "search.api:app",
-        host="0.0.0.0",
-        port=port,
-        log_level="info"
-    )
\ No newline at end of file
+    workers = int(os.environ.get("WORKERS", 1))
+
+    if workers > 1:
+        # Production: one master preloads the index, forked workers share it
+        from search.serving import PreforkServer
+        PreforkServer(workers=workers, host="0.0.0.0", port=port, log_level="info").run()
+    else:
+        # Run the FastAPI application
+        uvicorn.run(
+            "search.api:app",
+            host="0.0.0.0",
+            port=port,
+            log_level="info"
+        )
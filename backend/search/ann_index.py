@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+FAISS index types for LDS Scripture Search
+Builds exact (flat) or approximate (IVF-Flat, IVF-PQ, HNSW) indexes and
+reports recall@k vs. latency of an approximate index against the flat one
+"""
+
+import json
+import time
+import logging
+import argparse
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+import numpy as np
+import faiss
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# CLI name -> FAISS class name recorded as config.json "index_type"
+INDEX_TYPES = {
+    'flat': 'IndexFlatIP',
+    'ivf_flat': 'IndexIVFFlat',
+    'ivf_pq': 'IndexIVFPQ',
+    'hnsw': 'IndexHNSWFlat',
+}
+
+# Build and search defaults per index type (nlist defaults to ~4*sqrt(n))
+DEFAULT_INDEX_PARAMS = {
+    'flat': {},
+    'ivf_flat': {'nprobe': 32},
+    'ivf_pq': {'nprobe': 32, 'pq_m': 64, 'pq_bits': 8},
+    'hnsw': {'hnsw_m': 32, 'ef_construction': 200, 'ef_search': 128},
+}
+
+# Values swept by the recall/latency report
+NPROBE_SWEEP = [1, 4, 8, 16, 32, 64, 128]
+EF_SEARCH_SWEEP = [16, 32, 64, 128, 256, 512]
+
+
+def resolve_index_params(index_type: str, num_vectors: int, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Merge user overrides into the defaults for an index type"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {list(INDEX_TYPES)}")
+
+    params = dict(DEFAULT_INDEX_PARAMS[index_type])
+    if index_type.startswith('ivf'):
+        params['nlist'] = max(1, int(4 * np.sqrt(num_vectors)))
+    params.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    return params
+
+
+def build_index(embeddings: np.ndarray, index_type: str = 'flat', params: Optional[Dict[str, Any]] = None) -> faiss.Index:
+    """
+    Build a FAISS inner-product index over L2-normalized embeddings
+
+    Args:
+        embeddings: float32 array of shape (n, dim), already normalized
+        index_type: One of INDEX_TYPES
+        params: Resolved parameters (see resolve_index_params)
+    """
+    params = params or resolve_index_params(index_type, len(embeddings))
+    dim = embeddings.shape[1]
+
+    if index_type == 'flat':
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == 'ivf_flat':
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, params['nlist'], faiss.METRIC_INNER_PRODUCT)
+    elif index_type == 'ivf_pq':
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, params['nlist'], params['pq_m'], params['pq_bits'], faiss.METRIC_INNER_PRODUCT)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dim, params['hnsw_m'], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params['ef_construction']
+    else:
+        raise ValueError(f"Unknown index type '{index_type}'")
+
+    if not index.is_trained:
+        logger.info(f"Training {INDEX_TYPES[index_type]} on {len(embeddings)} vectors...")
+        index.train(embeddings)
+
+    index.add(embeddings)
+    configure_search(index, params)
+    return index
+
+
+def read_index(path: str, mmap: bool = True) -> faiss.Index:
+    """
+    Read an index, memory-mapping its vector / code storage when possible
+
+    Mapped pages come from the page cache, so loading is near-instant and
+    worker processes reading the same file share one physical copy.
+    """
+    mmap_flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', None)  # Missing before faiss 1.11
+    if mmap and mmap_flag is not None:
+        try:
+            return faiss.read_index(str(path), mmap_flag)
+        except RuntimeError as e:
+            logger.warning(f"Memory-mapped load of {path} failed ({e}), reading into memory")
+    return faiss.read_index(str(path))
+
+
+def configure_search(index: faiss.Index, params: Dict[str, Any]):
+    """Apply the default nprobe / efSearch for searches without explicit parameters"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        if 'nprobe' in params:
+            ivf.nprobe = int(params['nprobe'])
+        # IVF indexes need a direct map for reconstruct() (used by mode sub-indexes)
+        ivf.make_direct_map()
+    if isinstance(index, faiss.IndexHNSW) and 'ef_search' in params:
+        index.hnsw.efSearch = int(params['ef_search'])
+
+
+def search_parameters(index: faiss.Index, params: Dict[str, Any], selector=None) -> faiss.SearchParameters:
+    """
+    Build per-search parameters carrying the tuning knobs and an optional ID selector
+
+    Explicit SearchParameters replace the index defaults, so nprobe / efSearch
+    must be repeated here for filtered searches.
+    """
+    if faiss.try_extract_index_ivf(index) is not None:
+        search_params = faiss.SearchParametersIVF()
+        if 'nprobe' in params:
+            search_params.nprobe = int(params['nprobe'])
+    elif isinstance(index, faiss.IndexHNSW):
+        search_params = faiss.SearchParametersHNSW()
+        if 'ef_search' in params:
+            search_params.efSearch = int(params['ef_search'])
+    else:
+        search_params = faiss.SearchParameters()
+
+    if selector is not None:
+        search_params.sel = selector
+    return search_params
+
+
+def evaluate_index(index: faiss.Index,
+                   exact_index: faiss.Index,
+                   queries: np.ndarray,
+                   params: Dict[str, Any],
+                   k: int = 10) -> List[Dict[str, Any]]:
+    """
+    Measure recall@k and per-query latency of an index against exact search
+
+    Sweeps nprobe (IVF) or efSearch (HNSW) so a setting can be picked from
+    the resulting table.
+
+    Returns:
+        One row per setting with recall@k and latency percentiles
+    """
+    _, exact_ids = exact_index.search(queries, k)
+
+    if faiss.try_extract_index_ivf(index) is not None:
+        knob, sweep = 'nprobe', [n for n in NPROBE_SWEEP if n <= params.get('nlist', n)]
+    elif isinstance(index, faiss.IndexHNSW):
+        knob, sweep = 'ef_search', [max(ef, k) for ef in EF_SEARCH_SWEEP]
+    else:
+        knob, sweep = None, [None]
+
+    rows = []
+    for value in sweep:
+        setting = dict(params)
+        if knob:
+            setting[knob] = value
+        search_params = search_parameters(index, setting)
+
+        latencies = []
+        found_ids = []
+        for query in queries:
+            start = time.perf_counter()
+            _, ids = index.search(query.reshape(1, -1), k, params=search_params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found_ids.append(ids[0])
+
+        hits = sum(len(set(found) & set(exact)) for found, exact in zip(found_ids, exact_ids))
+        rows.append({
+            'setting': {knob: value} if knob else {},
+            f'recall@{k}': round(hits / (k * len(queries)), 4),
+            'latency_ms_mean': round(float(np.mean(latencies)), 3),
+            'latency_ms_p95': round(float(np.percentile(latencies, 95)), 3),
+        })
+
+    return rows
+
+
+def sample_queries(embeddings: np.ndarray, num_queries: int = 200, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """
+    Make evaluation queries by perturbing random corpus vectors
+
+    Perturbed copies behave like paraphrased questions: their exact
+    neighbours are near, but not identical to, the source segment.
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(embeddings), size=min(num_queries, len(embeddings)), replace=False)
+    queries = embeddings[picks] + noise * rng.standard_normal((len(picks), embeddings.shape[1])).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def build_report(embeddings: np.ndarray, index: faiss.Index, index_type: str, params: Dict[str, Any],
+                 k: int = 10, num_queries: int = 200) -> Dict[str, Any]:
+    """Recall/latency report of an index against the flat baseline"""
+    exact_index = faiss.IndexFlatIP(embeddings.shape[1])
+    exact_index.add(embeddings)
+    queries = sample_queries(embeddings, num_queries)
+
+    baseline = evaluate_index(exact_index, exact_index, queries, {}, k)[0]
+    rows = evaluate_index(index, exact_index, queries, params, k)
+
+    return {
+        'index_type': INDEX_TYPES[index_type],
+        'index_params': params,
+        'num_vectors': len(embeddings),
+        'num_queries': len(queries),
+        'k': k,
+        'flat_baseline': baseline,
+        'results': rows,
+    }
+
+
+def log_report(report: Dict[str, Any]):
+    """Print a report as a table"""
+    k = report['k']
+    baseline = report['flat_baseline']
+    logger.info(f"=== {report['index_type']} vs IndexFlatIP ({report['num_vectors']} vectors, {report['num_queries']} queries) ===")
+    logger.info(f"  flat: recall@{k}=1.0000  mean={baseline['latency_ms_mean']:.3f}ms  p95={baseline['latency_ms_p95']:.3f}ms")
+    for row in report['results']:
+        setting = ", ".join(f"{key}={value}" for key, value in row['setting'].items()) or "default"
+        logger.info(f"  {setting}: recall@{k}={row[f'recall@{k}']:.4f}  "
+                    f"mean={row['latency_ms_mean']:.3f}ms  p95={row['latency_ms_p95']:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare an approximate index against the flat index')
+    parser.add_argument('--index-dir', default='./indexes',
+                        help='Directory with an existing flat scripture_index.faiss')
+    parser.add_argument('--index-type', choices=list(INDEX_TYPES), default='hnsw')
+    parser.add_argument('--nlist', type=int, help='IVF: number of clusters')
+    parser.add_argument('--pq-m', type=int, help='IVF-PQ: number of sub-quantizers')
+    parser.add_argument('--hnsw-m', type=int, help='HNSW: neighbours per node')
+    parser.add_argument('--ef-construction', type=int, help='HNSW: build-time search depth')
+    parser.add_argument('--k', type=int, default=10, help='k for recall@k')
+    parser.add_argument('--num-queries', type=int, default=200)
+
+    args = parser.parse_args()
+
+    flat_index = faiss.read_index(str(Path(args.index_dir) / "scripture_index.faiss"))
+    if not isinstance(flat_index, faiss.IndexFlat):
+        logger.error("The report needs the exact flat index to recover the original vectors")
+        return
+    embeddings = flat_index.reconstruct_n(0, flat_index.ntotal)
+
+    params = resolve_index_params(args.index_type, len(embeddings), {
+        'nlist': args.nlist,
+        'pq_m': args.pq_m,
+        'hnsw_m': args.hnsw_m,
+        'ef_construction': args.ef_construction,
+    })
+    index = build_index(embeddings, args.index_type, params)
+
+    report = build_report(embeddings, index, args.index_type, params, k=args.k, num_queries=args.num_queries)
+    log_report(report)
+
+    report_path = Path(args.index_dir) / f"index_report_{args.index_type}.json"
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Report saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
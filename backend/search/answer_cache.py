@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Semantic answer cache for LDS Scripture Search Q&A
+Reuses a generated answer when a new question embeds within a cosine
+threshold of a cached one asked in the same mode, with the same source
+filter, and that retrieved exactly the same sources
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, Iterable, FrozenSet, Tuple
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL = 24 * 3600         # Seconds
+DEFAULT_THRESHOLD = 0.95        # Cosine similarity between query embeddings
+
+
+class CachedAnswer:
+    """One cached answer and the retrieval it was generated from"""
+
+    __slots__ = ('bucket', 'embedding', 'source_ids', 'answer', 'created')
+
+    def __init__(self, bucket: Tuple[str, str], embedding: np.ndarray, source_ids: FrozenSet[str],
+                 answer: str, created: float):
+        self.bucket = bucket
+        self.embedding = embedding
+        self.source_ids = source_ids
+        self.answer = answer
+        self.created = created
+
+
+class AnswerCache:
+    """Thread-safe LRU of answers, bucketed by (mode, source filter)"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL,
+                 threshold: float = DEFAULT_THRESHOLD):
+        """
+        Initialize the answer cache
+
+        Args:
+            max_entries: Maximum number of cached answers
+            ttl_seconds: Age after which an answer is not reused (0 = never expires)
+            threshold: Minimum cosine similarity between query embeddings for a hit
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, str], Dict[int, CachedAnswer]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._index_version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+        logger.info(f"Answer cache: {max_entries} entries, ttl {ttl_seconds}s, threshold {threshold}")
+
+    @classmethod
+    def from_env(cls) -> Optional["AnswerCache"]:
+        """
+        Build a cache from ANSWER_CACHE_SIZE / ANSWER_CACHE_TTL / ANSWER_CACHE_THRESHOLD
+
+        Returns:
+            The cache, or None if ANSWER_CACHE_SIZE is 0
+        """
+        max_entries = int(os.getenv("ANSWER_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+        if max_entries <= 0:
+            return None
+        return cls(
+            max_entries=max_entries,
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", DEFAULT_TTL)),
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", DEFAULT_THRESHOLD))
+        )
+
+    def _expired(self, entry: CachedAnswer) -> bool:
+        return self.ttl_seconds > 0 and time.time() - entry.created > self.ttl_seconds
+
+    def _remove(self, entry_id: int):
+        """Drop an entry from the LRU and its bucket (lock held)"""
+        entry = self._entries.pop(entry_id)
+        bucket = self._buckets[entry.bucket]
+        del bucket[entry_id]
+        if not bucket:
+            del self._buckets[entry.bucket]
+
+    def check_version(self, index_version: str):
+        """Invalidate every answer if the index has changed since they were cached"""
+        with self._lock:
+            changed = self._index_version is not None and self._index_version != index_version
+            self._index_version = index_version
+        if changed:
+            logger.info(f"Index version changed to {index_version}, invalidating answer cache")
+            self.invalidate()
+
+    def invalidate(self):
+        """Forget every cached answer (call when the index is rebuilt or reloaded)"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def get(self, embedding: np.ndarray, bucket: Tuple[str, str], source_ids: Iterable[str]) -> Optional[str]:
+        """
+        Find a cached answer for a question
+
+        Args:
+            embedding: Normalized query embedding
+            bucket: (mode, canonical source filter)
+            source_ids: Ids of the sources retrieved for the question
+
+        Returns:
+            The most similar qualifying answer, or None
+        """
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        source_ids = frozenset(source_ids)
+
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id, entry in list(self._buckets.get(bucket, {}).items()):
+                if self._expired(entry):
+                    self._remove(entry_id)
+                    continue
+                if entry.source_ids != source_ids:
+                    continue
+                score = float(np.dot(entry.embedding, embedding))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id].answer
+
+    def put(self, embedding: np.ndarray, bucket: Tuple[str, str], source_ids: Iterable[str], answer: str):
+        """Cache the answer generated for a question"""
+        entry = CachedAnswer(bucket, np.array(embedding, dtype=np.float32).ravel(), frozenset(source_ids),
+                             answer, time.time())
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._buckets.setdefault(bucket, {})[entry_id] = entry
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'buckets': len(self._buckets),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -6,13 +6,16 @@ Deployed on Google Cloud Run for scalable LDS AI search
 
 import os
 import json
+import hmac
+import hashlib
+import asyncio
 import logging
 import re
 import time
 import base64
-import io
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Literal, Tuple
 from pathlib import Path
+from urllib.parse import quote
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -20,17 +23,24 @@ load_dotenv()
 
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response, RedirectResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool
 from pydantic import BaseModel
 import uvicorn
 import openai
 import json
 
 # Import our search engine, cloud storage, prompts, and TTS
-from .scripture_search import ScriptureSearchEngine
-from .cloud_storage import setup_cloud_storage
-from .prompts import get_system_prompt, build_context_prompt, get_mode_source_filter
+from .scripture_search import ScriptureSearchEngine, filter_key
+from .answer_cache import AnswerCache
+from .single_flight import SingleFlight
+from .embedding_cache import normalize_query
+from .facets import if_none_match
+from .serving import load_search_engine, latest_index_release, prune_index_versions
+from .prompts import get_system_prompt, assemble_context_prompt, count_tokens, preload_encoding, get_mode_source_filter, MODE_SOURCE_FILTERS
 from .google_tts import create_google_tts_client
+from .audio_mixer import render_podcast, prepare_podcast, stream_mp3, find_music_file, preload_music_beds
 
 # Import user management API router
 from .user_api import router as user_router
@@ -61,20 +71,29 @@ app.include_router(user_router)
 # Global search engine instance
 search_engine = None
 
-# Initialize OpenAI API client for Q&A
+# Set by the pre-fork server (serving.py): one shared warm flag per worker, and this worker's slot
+readiness = None
+worker_slot = None
+
+# Initialize OpenAI API clients for Q&A (async one for the request handlers)
 openai_client = None
+async_openai_client = None
 try:
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if openai_api_key:
         openai_client = openai.OpenAI(
             api_key=openai_api_key
         )
+        async_openai_client = openai.AsyncOpenAI(
+            api_key=openai_api_key
+        )
         logger.info("OpenAI API client initialized successfully for Q&A")
     else:
         logger.warning("OPENAI_API_KEY not found - AI responses will not be available")
 except Exception as e:
     logger.error(f"Failed to initialize OpenAI API client: {e}")
     openai_client = None
+    async_openai_client = None
 
 # Initialize Grok/XAI API client for CFM content generation
 grok_client = None
@@ -116,6 +135,9 @@ class SearchRequest(BaseModel):
     top_k: int = 10
     min_score: float = 0.0
     source_filter: Optional[Dict[str, Any]] = None
+    retrieval: Literal["semantic", "hybrid", "lexical"] = "semantic"
+    reference_neighbors: int = 0  # Semantic neighbours added to reference queries ("Alma 32:21")
+    expand_context: int = 0  # Neighbouring verses / paragraphs merged into each hit, per side
 
 class SearchResult(BaseModel):
     rank: int
@@ -130,6 +152,24 @@ class SearchResponse(BaseModel):
     total_found: int
     search_time_ms: int
 
+class SearchBatchRequest(BaseModel):
+    queries: List[str]
+    mode: str = "default"
+    top_k: int = 10
+    min_score: float = 0.0
+    source_filter: Optional[Dict[str, Any]] = None
+
+class SearchBatchItem(BaseModel):
+    query: str
+    results: List[SearchResult]
+    total_found: int
+
+class SearchBatchResponse(BaseModel):
+    mode: str
+    results: List[SearchBatchItem]
+    total_queries: int
+    search_time_ms: int
+
 class HealthResponse(BaseModel):
     status: str
     version: str
@@ -146,6 +186,9 @@ class AskRequest(BaseModel):
     top_k: int = 10
     min_score: float = 0.0
     source_filter: Optional[Dict[str, Any]] = None
+    retrieval: Literal["semantic", "hybrid", "lexical"] = "semantic"
+    reference_neighbors: int = 0  # Semantic neighbours added to reference queries ("Alma 32:21")
+    expand_context: int = 0  # Neighbouring verses / paragraphs merged into each hit, per side
 
 class AskResponse(BaseModel):
     query: str
@@ -155,12 +198,96 @@ class AskResponse(BaseModel):
     total_sources: int
     search_time_ms: int
     response_time_ms: int
+    prompt_tokens: int = 0  # System + context prompt tokens sent to the model (0 when cached)
+    cached: bool = False
+
+# Upper bound on queries per /search/batch request
+MAX_BATCH_QUERIES = 1000
 
 # Mode to filter mapping - Free tier only
 MODE_FILTERS = {
     "default": None  # Uses all sources
 }
 
+# Answers to near-identical questions over the same sources are reused
+answer_cache = AnswerCache.from_env()
+
+# Concurrent identical /search, /ask and /ask/stream requests share one execution
+single_flight = SingleFlight()
+
+# How long clients and CDNs may reuse /sources before revalidating (seconds)
+SOURCES_MAX_AGE = int(os.getenv("SOURCES_MAX_AGE", 300))
+
+# Serialized /sources response, keyed by the facets ETag
+sources_body: Dict[str, bytes] = {}
+
+# How long clients may reuse a cached audio file from /tts/audio (seconds)
+AUDIO_MAX_AGE = int(os.getenv("AUDIO_MAX_AGE", 3600))
+
+# Keys /tts/audio serves: final podcasts as named by podcast_cache_key
+# (audio-cache/<content_type>/<content_type>_....mp3). Per-segment TTS
+# fragments (audio-cache/segments/<sha256>.mp3) and anything else in the
+# bucket are not served.
+PODCAST_CACHE_KEY = re.compile(r"audio-cache/([\w-]+)/\1_[\w-]+\.mp3")
+
+# Admin endpoints (index reload) are disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Check for a newly published index version this often (seconds, 0 = never)
+INDEX_RELOAD_POLL_SEC = float(os.getenv("INDEX_RELOAD_POLL_SEC", 0))
+
+# One index reload at a time; status reported by /admin/index
+index_reload_lock = asyncio.Lock()
+index_reload_status: Dict[str, Any] = {"state": "idle", "last_reload": None, "last_error": None}
+background_tasks = set()
+
+def request_key(kind: str, request) -> tuple:
+    """Single-flight key: requests with equal keys get identical responses"""
+    return (kind, normalize_query(request.query), request.mode, request.top_k,
+            filter_key(request.source_filter or {}), request.min_score, request.retrieval,
+            request.reference_neighbors, request.expand_context)
+
+# Size of the content chunks a cached answer is replayed in by /ask/stream
+ANSWER_REPLAY_CHUNK_CHARS = 40
+
+def source_id(metadata: Dict[str, Any]):
+    """Identity of one retrieved source; expanded passages also carry their span"""
+    segment_id = metadata.get("id") or metadata.get("citation")
+    passage = metadata.get("passage")
+    if passage:
+        return (segment_id, passage["first_citation"], passage["last_citation"])
+    return segment_id
+
+def answer_cache_key(mode: str, source_filter: Optional[Dict[str, Any]], search_results: List[Dict[str, Any]]):
+    """(bucket, source ids) identifying the retrieval an answer was generated from"""
+    bucket = (mode, filter_key(source_filter or {}))
+    source_ids = [source_id(result["metadata"]) for result in search_results]
+    return bucket, source_ids
+
+def get_cached_answer(engine, query_embedding, cache_key) -> Optional[str]:
+    """Look up a cached answer, dropping every answer if the index has changed"""
+    # Requests still finishing on a swapped-out engine neither read nor fill the cache
+    if answer_cache is None or query_embedding is None or engine is not search_engine:
+        return None
+    answer_cache.check_version(engine.index_version)
+    return answer_cache.get(query_embedding, *cache_key)
+
+def cache_answer(engine, query_embedding, cache_key, answer: str):
+    """Remember a generated answer"""
+    if answer_cache is not None and query_embedding is not None and answer and engine is search_engine:
+        answer_cache.put(query_embedding, *cache_key, answer)
+
+def replay_answer_chunks(answer: str):
+    """Split a cached answer into word-aligned chunks for SSE replay"""
+    chunk = ""
+    for word in re.split(r"(?<=\s)(?=\S)", answer):
+        chunk += word
+        if len(chunk) >= ANSWER_REPLAY_CHUNK_CHARS:
+            yield chunk
+            chunk = ""
+    if chunk:
+        yield chunk
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize search engine on startup"""
@@ -169,36 +296,30 @@ async def startup_event():
         logger.info("🚀 Initializing Gospel Guide search engine...")
         startup_time = time.time()
         
-        # Setup Cloud Storage (download indexes if on Cloud Run)
-        if os.getenv('BUCKET_NAME'):
-            logger.info("📦 Setting up Cloud Storage...")
-            cloud_start = time.time()
-            setup_cloud_storage()
-            logger.info(f"📦 Cloud Storage setup completed in {time.time() - cloud_start:.2f}s")
-        
         # Log API client status
         if not grok_client:
             logger.warning("⚠️  Grok client not available - CFM Deep Dive will be disabled")
         else:
             logger.info("✅ Grok API client ready for CFM content generation")
         
-        # Initialize search engine (optional - only if indexes exist)
-        logger.info("🔍 Checking for search engine indexes...")
-        index_dir = os.getenv("INDEX_DIR", "search/indexes")
-        config_path = os.path.join(index_dir, "config.json")
-        
-        if os.path.exists(config_path):
-            logger.info("📚 Index files found, loading search engine...")
-            search_start = time.time()
-            # Use OPENAI_API_KEY for embeddings in search engine
-            openai_api_key = os.getenv("OPENAI_API_KEY")
-            search_engine = ScriptureSearchEngine(index_dir=index_dir, openai_api_key=openai_api_key)
-            search_time = time.time() - search_start
-            logger.info(f"✅ Search engine loaded with {search_engine.index.ntotal:,} segments in {search_time:.2f}s")
+        if search_engine is None:
+            search_engine = load_search_engine()
         else:
-            logger.warning("⚠️  Search index files not found - search functionality will be disabled")
-            logger.warning(f"⚠️  Looking for: {config_path}")
-            search_engine = None
+            # Preloaded by the pre-fork master; warm this worker's own thread pools
+            search_engine.warm_up()
+        
+        # Podcast intro/outro beds are the same for every request: render them now
+        await asyncio.get_running_loop().run_in_executor(None, preload_music_beds)
+        # Same for the prompt tokenizer, which tiktoken may have to download
+        await asyncio.get_running_loop().run_in_executor(None, preload_encoding)
+        
+        if INDEX_RELOAD_POLL_SEC > 0:
+            start_background(poll_index_versions())
+            logger.info(f"🔄 Checking for new index versions every {INDEX_RELOAD_POLL_SEC:.0f}s")
+        
+        if readiness is not None:
+            readiness[worker_slot] = 1
+            logger.info(f"✅ Worker {worker_slot} warm ({sum(readiness)}/{len(readiness)} workers ready)")
         
         total_startup_time = time.time() - startup_time
         if search_engine:
@@ -233,10 +354,14 @@ async def health():
 
 @app.get("/ready")
 async def readiness_check():
-    """Readiness check - returns 503 if search engine not loaded"""
+    """Readiness check - returns 503 until the search engine is loaded and every worker is warm"""
     if search_engine is None:
         raise HTTPException(status_code=503, detail="Search engine not ready")
-    return {"status": "ready", "search_engine_loaded": True}
+    workers = len(readiness) if readiness is not None else 1
+    warm = sum(readiness) if readiness is not None else 1
+    if warm < workers:
+        raise HTTPException(status_code=503, detail=f"{warm} of {workers} workers warm")
+    return {"status": "ready", "search_engine_loaded": True, "workers": workers}
 
 @app.get("/config")
 async def get_config():
@@ -273,13 +398,193 @@ async def get_config():
     return config_status
 
 @app.get("/sources", response_model=SourcesResponse)
-async def get_sources():
-    """Get available content sources for filtering"""
+async def get_sources(request: Request):
+    """
+    Get available content sources for filtering
+    
+    The summary only changes with the index, so it is served with an ETag
+    (clients and CDNs revalidate with If-None-Match and get a 304).
+    """
+    engine = search_engine
+    if not engine:
+        raise HTTPException(status_code=503, detail="Search engine not initialized")
+    
+    etag = engine.facets_etag
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={SOURCES_MAX_AGE}"}
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    body = sources_body.get(etag)
+    if body is None:
+        body = SourcesResponse(sources=engine.get_available_sources()).model_dump_json().encode()
+        sources_body.clear()
+        sources_body[etag] = body
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/ask/cache/stats")
+async def get_answer_cache_stats():
+    """Semantic answer cache hit/miss counters"""
+    if answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **answer_cache.stats()}
+
+@app.delete("/ask/cache")
+async def clear_answer_cache():
+    """Invalidate every cached answer (e.g. after prompt changes)"""
+    if answer_cache is None:
+        return {"enabled": False}
+    answer_cache.invalidate()
+    logger.info("🗑️ Answer cache cleared")
+    return {"enabled": True, "cleared": True}
+
+@app.get("/inflight/stats")
+async def get_single_flight_stats():
+    """Request coalescing counters"""
+    return single_flight.stats()
+
+@app.get("/search/cache/stats")
+async def get_embedding_cache_stats():
+    """Query embedding cache hit/miss counters"""
     if not search_engine:
         raise HTTPException(status_code=503, detail="Search engine not initialized")
+    if search_engine.embedding_cache is None:
+        return {"enabled": False}
+
+    # Counting the persistent tier's rows touches SQLite: keep it off the event loop
+    stats = await asyncio.get_running_loop().run_in_executor(None, search_engine.embedding_cache.stats)
+    return {"enabled": True, **stats}
+
+class ReloadRequest(BaseModel):
+    version: Optional[str] = None  # Index version to load (default: the published CURRENT)
+
+def require_admin(request: Request):
+    """Reject requests without the admin token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled (ADMIN_TOKEN not set)")
+    token = request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+def invalidate_index_caches():
+    """Drop everything derived from the previous index"""
+    if answer_cache is not None:
+        answer_cache.invalidate()
+    single_flight.reset()
+    sources_body.clear()
+
+async def reload_search_engine(version: Optional[str] = None):
+    """
+    Load an index version off the request path and swap it in
+    
+    The new engine is downloaded, loaded and warmed up on a worker thread
+    while the old one keeps serving. Rebinding search_engine is atomic;
+    requests already running keep the engine they started with, and the old
+    engine is freed once the last of them finishes. Its search thread pool
+    is shut down right away: queued searches still complete and the threads
+    exit once it drains. On failure the old engine stays in place.
+    
+    Local copies of versions other than the new one and the one it replaced
+    are then deleted; on Cloud Run the local disk is memory, so every
+    version kept costs instance RAM.
+    
+    With WORKERS > 1 each worker reloads on its own and loads a private copy
+    of the new engine: the memory the workers shared by being forked from
+    one preloaded master (serving.py) is not shared again until a restart.
+    """
+    global search_engine
+    async with index_reload_lock:
+        old_engine = search_engine
+        index_reload_status.update(state="reloading", target=version, started=time.time())
+        logger.info(f"🔄 Reloading search index (version {version or 'CURRENT'})...")
+        reload_start = time.time()
+        
+        try:
+            loop = asyncio.get_running_loop()
+            new_engine = await loop.run_in_executor(
+                None, load_search_engine, version, old_engine.embedding_cache if old_engine else None
+            )
+            if new_engine is None:
+                raise FileNotFoundError("No index found")
+        except Exception as e:
+            logger.error(f"❌ Index reload failed, keeping the current index: {e}")
+            index_reload_status.update(state="failed", last_error=str(e))
+            return
+        
+        search_engine = new_engine
+        invalidate_index_caches()
+        if old_engine is not None:
+            old_engine.close()
+        
+        if new_engine.index_release:
+            try:
+                await loop.run_in_executor(
+                    None, prune_index_versions, new_engine.index_release,
+                    old_engine.index_release if old_engine else None
+                )
+            except OSError as e:
+                logger.warning(f"⚠️ Could not prune old index versions: {e}")
+        
+        index_reload_status.update(state="idle", last_error=None, last_reload={
+            "version": new_engine.index_release,
+            "index_version": new_engine.index_version,
+            "previous_version": old_engine.index_release if old_engine else None,
+            "seconds": round(time.time() - reload_start, 2),
+            "finished": time.time(),
+        })
+        logger.info(f"✅ Swapped in index version {new_engine.index_release} "
+                    f"({new_engine.index.ntotal:,} segments) in {time.time() - reload_start:.2f}s")
+
+def start_background(coro):
+    """Run a coroutine as a task that outlives the request that started it"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def poll_index_versions():
+    """Reload whenever a different index version is published (INDEX_RELOAD_POLL_SEC)"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(INDEX_RELOAD_POLL_SEC)
+        try:
+            latest = await loop.run_in_executor(None, latest_index_release)
+            current = search_engine.index_release if search_engine else None
+            if latest and latest != current and index_reload_status["state"] != "reloading":
+                logger.info(f"🆕 Index version {latest} published (serving {current})")
+                await reload_search_engine(latest)
+        except Exception as e:
+            logger.error(f"❌ Index version check failed: {e}")
+
+@app.get("/admin/index")
+async def get_index_status(request: Request):
+    """Index version being served and the state of the last reload"""
+    require_admin(request)
+    engine = search_engine
+    return {
+        "version": engine.index_release if engine else None,
+        "index_version": engine.index_version if engine else None,
+        "total_segments": engine.index.ntotal if engine else 0,
+        "reload": index_reload_status,
+    }
+
+@app.post("/admin/index/reload", status_code=202)
+async def reload_index(request: Request, reload_request: Optional[ReloadRequest] = None):
+    """
+    Start a background index reload (requires the X-Admin-Token header)
     
-    sources = search_engine.get_available_sources()
-    return SourcesResponse(sources=sources)
+    With pre-forked workers this reloads only the worker that receives the
+    request; set INDEX_RELOAD_POLL_SEC so every worker picks up new versions.
+    Each worker then holds its own copy of the engine (see reload_search_engine).
+    """
+    require_admin(request)
+    # Checked and set without awaiting in between, so two requests cannot both start a reload
+    if index_reload_status["state"] == "reloading":
+        raise HTTPException(status_code=409, detail="An index reload is already in progress")
+    
+    version = reload_request.version if reload_request else None
+    index_reload_status.update(state="reloading", target=version, started=time.time())
+    start_background(reload_search_engine(version))
+    return {"status": "reloading", "version": version, "current_version": search_engine.index_release if search_engine else None}
 
 @app.post("/search", response_model=SearchResponse)
 async def search(request: SearchRequest):
@@ -299,6 +604,11 @@ async def search(request: SearchRequest):
     if not search_engine:
         raise HTTPException(status_code=503, detail="Search engine not initialized")
     
+    response = await single_flight.do(request_key("search", request), lambda: run_search(request))
+    return response.model_copy(update={"query": request.query})
+
+async def run_search(request: SearchRequest) -> SearchResponse:
+    """Execute a /search request (shared by identical in-flight requests)"""
     import time
     start_time = time.time()
     
@@ -316,11 +626,14 @@ async def search(request: SearchRequest):
                 final_filter.update(request.source_filter)
         
         # Perform search
-        results = search_engine.search(
+        results = await search_engine.asearch(
             query=request.query,
             top_k=request.top_k,
             source_filter=final_filter,
-            min_score=request.min_score
+            min_score=request.min_score,
+            retrieval=request.retrieval,
+            reference_neighbors=request.reference_neighbors,
+            expand_context=request.expand_context
         )
         
         search_time_ms = int((time.time() - start_time) * 1000)
@@ -346,10 +659,82 @@ async def search(request: SearchRequest):
             search_time_ms=search_time_ms
         )
         
+    except ValueError as e:
+        # Malformed source_filter (unknown operator, non-numeric range bound, ...)
+        raise HTTPException(status_code=400, detail=f"Invalid source filter: {str(e)}")
     except Exception as e:
         logger.error(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@app.post("/search/batch", response_model=SearchBatchResponse)
+async def search_batch(request: SearchBatchRequest):
+    """
+    Search many queries in one request
+    
+    All queries share the mode, top_k, min_score and source_filter. They are
+    embedded with batched API calls and searched with one matrix FAISS search;
+    results come back per query, in request order.
+    """
+    if not search_engine:
+        raise HTTPException(status_code=503, detail="Search engine not initialized")
+    
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    
+    start_time = time.time()
+    
+    try:
+        # Combine mode filter with custom filter
+        mode_filter = MODE_FILTERS.get(request.mode)
+        final_filter = None
+        if mode_filter or request.source_filter:
+            final_filter = {}
+            if mode_filter:
+                final_filter.update(mode_filter)
+            if request.source_filter:
+                final_filter.update(request.source_filter)
+        
+        batch_results = await search_engine.asearch_many(
+            queries=request.queries,
+            top_k=request.top_k,
+            source_filter=final_filter,
+            min_score=request.min_score
+        )
+        
+        search_time_ms = int((time.time() - start_time) * 1000)
+        
+        items = [
+            SearchBatchItem(
+                query=query,
+                results=[
+                    SearchResult(
+                        rank=result["rank"],
+                        score=result["score"],
+                        content=result["content"],
+                        metadata=result["metadata"]
+                    )
+                    for result in results
+                ],
+                total_found=len(results)
+            )
+            for query, results in zip(request.queries, batch_results)
+        ]
+        
+        logger.info(f"Batch search of {len(request.queries)} queries (mode: {request.mode}) completed in {search_time_ms}ms")
+        
+        return SearchBatchResponse(
+            mode=request.mode,
+            results=items,
+            total_queries=len(items),
+            search_time_ms=search_time_ms
+        )
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid source filter: {str(e)}")
+    except Exception as e:
+        logger.error(f"Batch search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+
 @app.post("/ask", response_model=AskResponse)
 async def ask_question(request: AskRequest):
     """
@@ -365,10 +750,18 @@ async def ask_question(request: AskRequest):
         
     if not openai_client:
         raise HTTPException(status_code=503, detail="OpenAI client not available - check OPENAI_API_KEY")
+    
+    response = await single_flight.do(request_key("ask", request), lambda: answer_question(request))
+    return response.model_copy(update={"query": request.query})
 
+async def answer_question(request: AskRequest) -> AskResponse:
+    """Execute an /ask request (shared by identical in-flight requests)"""
     import time
     start_time = time.time()
     
+    # The whole request runs on one engine, even if an index reload swaps it meanwhile
+    engine = search_engine
+    
     try:
         # Step 1: Perform search to get relevant sources
         mode_filter = get_mode_source_filter(request.mode)
@@ -382,12 +775,20 @@ async def ask_question(request: AskRequest):
             if request.source_filter:
                 final_filter.update(request.source_filter)
         
-        # Search for relevant sources
-        search_results = search_engine.search(
+        # Search for relevant sources (the embedding is kept for the answer cache;
+        # lexical retrieval and reference queries need none)
+        query_embedding = None
+        if engine.needs_embedding(request.query, request.retrieval):
+            query_embedding = await engine.aembed_query(request.query)
+        search_results = await engine.asearch(
             query=request.query,
             top_k=request.top_k,
             source_filter=final_filter,
-            min_score=request.min_score
+            min_score=request.min_score,
+            retrieval=request.retrieval,
+            reference_neighbors=request.reference_neighbors,
+            expand_context=request.expand_context,
+            query_embedding=query_embedding
         )
         
         search_time_ms = int((time.time() - start_time) * 1000)
@@ -403,18 +804,47 @@ async def ask_question(request: AskRequest):
                 response_time_ms=0
             )
         
-        # Step 2: Build context prompt with search results
-        context_prompt = build_context_prompt(request.query, search_results, request.mode)
+        # Step 2: Build context prompt with search results (deduplicated, within the token budget)
+        context = assemble_context_prompt(request.query, search_results, request.mode)
         system_prompt = get_system_prompt(request.mode)
         
+        # Convert the sources the prompt includes to response format
+        sources = [
+            SearchResult(
+                rank=result["rank"],
+                score=result["score"],
+                content=result["content"],
+                metadata=result["metadata"]
+            )
+            for result in context.sources
+        ]
+        
+        # Reuse the answer to a near-identical question over the same sources
+        cache_key = answer_cache_key(request.mode, final_filter, context.sources)
+        cached_answer = get_cached_answer(engine, query_embedding, cache_key)
+        if cached_answer is not None:
+            logger.info(f"🎯 AI Q&A '{request.query}' (mode: {request.mode}) served from answer cache in {search_time_ms}ms")
+            return AskResponse(
+                query=request.query,
+                mode=request.mode,
+                answer=cached_answer,
+                sources=sources,
+                total_sources=len(sources),
+                search_time_ms=search_time_ms,
+                response_time_ms=0,
+                cached=True
+            )
+        
+        prompt_tokens = count_tokens(system_prompt) + context.prompt_tokens
+        
         # Step 3: Generate AI response using OpenAI
         ai_start_time = time.time()
         
-        response = openai_client.chat.completions.create(
+        response = await async_openai_client.chat.completions.create(
             model="gpt-4o",  # Using GPT-4o for high-quality gospel Q&A
             messages=[
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": context_prompt}
+                {"role": "user", "content": context.prompt}
             ],
             max_tokens=2000,
             temperature=0.3  # Low temperature for consistent, factual responses
@@ -422,33 +852,27 @@ async def ask_question(request: AskRequest):
         
         ai_answer = response.choices[0].message.content
         ai_time_ms = int((time.time() - ai_start_time) * 1000)
+        cache_answer(engine, query_embedding, cache_key, ai_answer)
         
-        # Convert search results to response format
-        sources = [
-            SearchResult(
-                rank=result["rank"],
-                score=result["score"],
-                content=result["content"],
-                metadata=result["metadata"]
-            )
-            for result in search_results
-        ]
-        
-        logger.info(f"AI Q&A '{request.query}' (mode: {request.mode}) used {len(search_results)} sources in {search_time_ms + ai_time_ms}ms")
+        logger.info(f"AI Q&A '{request.query}' (mode: {request.mode}) used {len(sources)} sources "
+                    f"({prompt_tokens} prompt tokens) in {search_time_ms + ai_time_ms}ms")
         
         return AskResponse(
             query=request.query,
             mode=request.mode,
             answer=ai_answer,
             sources=sources,
-            total_sources=len(search_results),
+            total_sources=len(sources),
             search_time_ms=search_time_ms,
-            response_time_ms=ai_time_ms
+            response_time_ms=ai_time_ms,
+            prompt_tokens=prompt_tokens
         )
         
     except openai.OpenAIError as e:
         logger.error(f"OpenAI API error: {e}")
         raise HTTPException(status_code=500, detail=f"AI response generation failed: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid source filter: {str(e)}")
     except Exception as e:
         logger.error(f"Ask endpoint error: {e}")
         raise HTTPException(status_code=500, detail=f"Request failed: {str(e)}")
@@ -473,6 +897,9 @@ async def ask_question_stream(request: AskRequest):
         import time
         start_time = time.time()
         
+        # The whole stream runs on one engine, even if an index reload swaps it meanwhile
+        engine = search_engine
+        
         try:
             # Step 1: Perform search to get relevant sources
             logger.info(f"🔍 Starting search for: '{request.query}'")
@@ -489,12 +916,20 @@ async def ask_question_stream(request: AskRequest):
                 if request.source_filter:
                     final_filter.update(request.source_filter)
             
-            # Search for relevant sources
-            search_results = search_engine.search(
+            # Search for relevant sources (the embedding is kept for the answer cache;
+            # lexical retrieval and reference queries need none)
+            query_embedding = None
+            if engine.needs_embedding(request.query, request.retrieval):
+                query_embedding = await engine.aembed_query(request.query)
+            search_results = await engine.asearch(
                 query=request.query,
                 top_k=request.top_k,
                 source_filter=final_filter,
-                min_score=request.min_score
+                min_score=request.min_score,
+                retrieval=request.retrieval,
+                reference_neighbors=request.reference_neighbors,
+                expand_context=request.expand_context,
+                query_embedding=query_embedding
             )
             
             search_time_ms = int((time.time() - start_time) * 1000)
@@ -509,64 +944,81 @@ async def ask_question_stream(request: AskRequest):
                 yield f"data: {json.dumps({'type': 'done'})}\n\n"
                 return
             
-            # Step 2: Build context prompt with search results
+            # Step 2: Build context prompt with search results (deduplicated, within the token budget)
             logger.info(f"📝 Building context prompt...")
             context_start = time.time()
             
-            context_prompt = build_context_prompt(request.query, search_results, request.mode)
+            context = assemble_context_prompt(request.query, search_results, request.mode)
             system_prompt = get_system_prompt(request.mode)
             
             context_elapsed = time.time() - context_start
-            logger.info(f"✅ Context built in {context_elapsed:.3f}s, length: {len(context_prompt)} chars")
+            logger.info(f"✅ Context built in {context_elapsed:.3f}s, {context.prompt_tokens} tokens from {len(context.sources)} sources")
+            
+            # Sources the prompt includes are sent after the answer
+            sources = [
+                {
+                    'rank': result["rank"],
+                    'score': result["score"], 
+                    'content': result["content"],
+                    'metadata': result["metadata"]
+                }
+                for result in context.sources
+            ]
+            
+            # Replay the answer to a near-identical question over the same sources
+            cache_key = answer_cache_key(request.mode, final_filter, context.sources)
+            cached_answer = get_cached_answer(engine, query_embedding, cache_key)
+            if cached_answer is not None:
+                for content in replay_answer_chunks(cached_answer):
+                    yield f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
+                yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
+                yield f"data: {json.dumps({'type': 'timing', 'response_time_ms': 0, 'time_to_first_token_ms': 0, 'total_time_ms': search_time_ms, 'prompt_tokens': 0, 'cached': True})}\n\n"
+                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                logger.info(f"🎯 Streaming AI Q&A '{request.query}' (mode: {request.mode}) replayed from answer cache in {search_time_ms}ms")
+                return
+            
+            prompt_tokens = count_tokens(system_prompt) + context.prompt_tokens
             
             # Step 3: Stream AI response using OpenAI
             logger.info(f"🤖 Starting OpenAI streaming...")
             ai_start_time = time.time()
             
-            stream = openai_client.chat.completions.create(
+            stream = await async_openai_client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": context_prompt}
+                    {"role": "user", "content": context.prompt}
                 ],
                 max_tokens=2000,
                 temperature=0.3,
                 stream=True  # Enable streaming
             )
             
-            # Stream the response chunks
+            # Stream the response chunks - awaiting each one leaves the event loop
+            # free to serve other requests between tokens
             full_response = ""
-            first_chunk = True
-            for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
+            first_token_ms = None
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content is not None:
                     content = chunk.choices[0].delta.content
                     full_response += content
                     
-                    if first_chunk:
-                        openai_first_chunk_time = time.time() - ai_start_time
-                        logger.info(f"🎯 First OpenAI chunk received in {openai_first_chunk_time:.3f}s")
-                        first_chunk = False
+                    if first_token_ms is None:
+                        first_token_ms = int((time.time() - ai_start_time) * 1000)
+                        logger.info(f"🎯 First OpenAI token in {first_token_ms}ms "
+                                    f"({int((time.time() - start_time) * 1000)}ms after request start)")
                     
                     yield f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
             
             ai_time_ms = int((time.time() - ai_start_time) * 1000)
-            
-            # Send sources at the end
-            sources = [
-                {
-                    'rank': result["rank"],
-                    'score': result["score"], 
-                    'content': result["content"],
-                    'metadata': result["metadata"]
-                }
-                for result in search_results
-            ]
+            cache_answer(engine, query_embedding, cache_key, full_response)
             
             yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
-            yield f"data: {json.dumps({'type': 'timing', 'response_time_ms': ai_time_ms, 'total_time_ms': search_time_ms + ai_time_ms})}\n\n"
+            yield f"data: {json.dumps({'type': 'timing', 'response_time_ms': ai_time_ms, 'time_to_first_token_ms': first_token_ms, 'total_time_ms': search_time_ms + ai_time_ms, 'prompt_tokens': prompt_tokens})}\n\n"
             yield f"data: {json.dumps({'type': 'done'})}\n\n"
             
-            logger.info(f"Streaming AI Q&A '{request.query}' (mode: {request.mode}) completed in {search_time_ms + ai_time_ms}ms")
+            logger.info(f"Streaming AI Q&A '{request.query}' (mode: {request.mode}) completed in {search_time_ms + ai_time_ms}ms "
+                        f"(time to first token {first_token_ms}ms)")
             
         except openai.OpenAIError as e:
             logger.error(f"OpenAI API error: {e}")
@@ -575,8 +1027,9 @@ async def ask_question_stream(request: AskRequest):
             logger.error(f"Streaming ask endpoint error: {e}")
             yield f"data: {json.dumps({'type': 'error', 'error': f'Request failed: {str(e)}'})}\n\n"
     
+    # Identical questions already streaming subscribe to that stream instead
     return StreamingResponse(
-        generate_response(), 
+        single_flight.stream(request_key("ask_stream", request), generate_response), 
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -621,6 +1074,9 @@ class TTSPodcastResponse(BaseModel):
     character_count: int
     total_duration_sec: float
     generation_time_ms: int
+    segment_cache_hits: int = 0  # TTS chunks reused from the segment cache
+    segment_cache_misses: int = 0  # TTS chunks synthesized for this request
+    audio_url: Optional[str] = None  # Cached copy with Range support (/tts/audio/...), once cached
 
 # Helper functions for CFM 2026 Deep Dive
 @app.get("/debug/paths")
@@ -846,28 +1302,13 @@ def generate_audio_with_tts(script_text: str, voice: str = "cfm_male") -> Dict[s
         return {}
 
 
-@app.post("/tts/podcast", response_model=TTSPodcastResponse)
-async def generate_podcast_tts(request: TTSPodcastRequest):
+def podcast_is_conversation(request: TTSPodcastRequest) -> bool:
     """
-    Generate podcast audio with clean voice and music intro/outro.
+    Validate a podcast request
     
-    Audio structure:
-    - Intro: 0-7s music at full volume
-    - Music fade-out: 10s-16s (6 second exponential fade to silence)
-    - Voice starts: 11s (4 seconds into the fade-out)
-    - Voice: Full volume, no background music during main content
-    - Outro fade-in: Music fades in 10 seconds before voice ends
-    - Outro: 30 seconds of music after voice ends (with 8s fade-out at end)
-    - Final: Normalized with -1dB headroom
-    
-    Supports caching: Final audio is cached to avoid regeneration
+    Returns:
+        True for the multi-speaker script format, False for single-speaker text
     """
-    import time
-    import hashlib
-    from pydub import AudioSegment
-    from pydub.effects import normalize
-    start_time = time.time()
-    
     # Determine if this is conversation or single-speaker format
     is_conversation = bool(request.script and request.voices)
     
@@ -891,35 +1332,124 @@ async def generate_podcast_tts(request: TTSPodcastRequest):
         if not request.script or len(request.script) == 0:
             raise HTTPException(status_code=400, detail="Script array cannot be empty")
     
+    return is_conversation
+
+def podcast_cache_key(request: TTSPodcastRequest, is_conversation: bool) -> str:
+    """Audio cache key (GCS blob path) for the final mixed podcast"""
+    # Generate cache key based on content
+    if is_conversation:
+        # Use script content for cache key
+        script_text = " ".join([f"{seg.get('speaker', '')}: {seg.get('text', '')}" for seg in request.script])
+        content_hash = hashlib.sha256(script_text.encode()).hexdigest()[:16]
+    else:
+        content_hash = hashlib.sha256(request.text.encode()).hexdigest()[:16]
+    
+    # Determine content type and build appropriate cache key
+    content_type = request.content_type or "podcast"
+    voice_suffix = f"_{request.voice}" if request.voice else ""
+    
+    if content_type == "study_guide" and request.week_number and request.study_level:
+        return f"audio-cache/study_guide/study_guide_week_{request.week_number:02d}_{request.study_level}{voice_suffix}.mp3"
+    elif content_type == "lesson_plan" and request.week_number and request.audience:
+        return f"audio-cache/lesson_plan/lesson_plan_week_{request.week_number:02d}_{request.audience}{voice_suffix}.mp3"
+    elif content_type == "core_content" and request.week_number:
+        return f"audio-cache/core_content/core_content_week_{request.week_number:02d}{voice_suffix}.mp3"
+    elif content_type == "daily_thoughts" and request.week_number:
+        return f"audio-cache/daily_thoughts/daily_thoughts_week_{request.week_number:02d}{voice_suffix}.mp3"
+    elif content_type == "podcast":
+        return f"audio-cache/podcast/podcast_{content_hash}{voice_suffix}.mp3"
+    else:
+        # Generic fallback using content hash
+        return f"audio-cache/{content_type}/{content_type}_{content_hash}{voice_suffix}.mp3"
+
+def cached_audio_url(cache_key: str) -> str:
+    """URL serving a cached audio file with Range support (see get_cached_audio_file)"""
+    return f"/tts/audio/{quote(cache_key)}"
+
+async def synthesize_podcast_voice(request: TTSPodcastRequest, is_conversation: bool):
+    """
+    Synthesize the voice of a podcast request
+    
+    Returns:
+        Tuple of (MP3 bytes per voice segment, silence in ms after each
+        segment, character count, SegmentAudio with the segment cache counts)
+    """
+    loop = asyncio.get_running_loop()
+    
+    # ========== DETERMINE FORMAT: CONVERSATION OR SINGLE SPEAKER ==========
+    if is_conversation:
+        # Multi-speaker conversation format
+        logger.info(f"🎭 Generating conversation with {len(request.script)} segments")
+        
+        voice_mp3 = []
+        gaps_ms = []
+        spoken = [(idx, line) for idx, line in enumerate(request.script) if line.get('text', '').strip()]
+        total_chars = sum(len(line['text']) for _, line in spoken)
+        
+        # Synthesize every line concurrently; results come back in script order
+        segment_audio = await loop.run_in_executor(
+            None,
+            tts_client.generate_audio_segments,
+            [(line['text'], request.voices.get(line.get('speaker', 'host'), 'aoede')) for _, line in spoken]
+        )
+        
+        for (idx, line), segment_bytes in zip(spoken, segment_audio.audio):
+            if not segment_bytes:
+                logger.warning(f"  Failed to generate segment {idx + 1}, skipping")
+                continue
+            
+            voice_mp3.append(segment_bytes)
+            # Pause between speakers (except after last segment)
+            gaps_ms.append(request.pause_between_speakers_ms if idx < len(request.script) - 1 else 0)
+        
+        if not voice_mp3:
+            raise HTTPException(status_code=500, detail="No voice segments generated")
+        
+        return voice_mp3, gaps_ms, total_chars, segment_audio
+    
+    # Single speaker format (backward compatible)
+    if not request.text:
+        raise HTTPException(status_code=400, detail="Either 'text' or 'script' must be provided")
+    
+    logger.info(f"🎙️ Generating single-speaker audio")
+    # Chunks of long text are synthesized concurrently, off the event loop
+    segment_audio = await loop.run_in_executor(
+        None, tts_client.generate_audio_segments, [(request.text, request.voice)]
+    )
+    voice_audio_bytes = segment_audio.audio[0]
+    
+    if not voice_audio_bytes:
+        raise HTTPException(status_code=500, detail="Voice audio generation failed")
+    
+    return [voice_audio_bytes], [0], len(request.text), segment_audio
+
+@app.post("/tts/podcast", response_model=TTSPodcastResponse)
+async def generate_podcast_tts(request: TTSPodcastRequest):
+    """
+    Generate podcast audio with clean voice and music intro/outro.
+    
+    Audio structure:
+    - Intro: 0-7s music at full volume
+    - Music fade-out: 10s-16s (6 second exponential fade to silence)
+    - Voice starts: 11s (4 seconds into the fade-out)
+    - Voice: Full volume, no background music during main content
+    - Outro fade-in: Music fades in 10 seconds before voice ends
+    - Outro: 30 seconds of music after voice ends (with 8s fade-out at end)
+    - Final: Normalized with -1dB headroom
+    
+    Supports caching: Final audio is cached to avoid regeneration
+    
+    Returns the whole MP3 as base64 JSON; /tts/podcast/stream streams the
+    same audio as audio/mpeg instead.
+    """
+    start_time = time.time()
+    is_conversation = podcast_is_conversation(request)
+    
     # ========== CHECK CACHE FIRST ==========
     cache_key = None
     if audio_cache_manager:
         try:
-            # Generate cache key based on content
-            if is_conversation:
-                # Use script content for cache key
-                script_text = " ".join([f"{seg.get('speaker', '')}: {seg.get('text', '')}" for seg in request.script])
-                content_hash = hashlib.sha256(script_text.encode()).hexdigest()[:16]
-            else:
-                content_hash = hashlib.sha256(request.text.encode()).hexdigest()[:16]
-            
-            # Determine content type and build appropriate cache key
-            content_type = request.content_type or "podcast"
-            voice_suffix = f"_{request.voice}" if request.voice else ""
-            
-            if content_type == "study_guide" and request.week_number and request.study_level:
-                cache_key = f"audio-cache/study_guide/study_guide_week_{request.week_number:02d}_{request.study_level}{voice_suffix}.mp3"
-            elif content_type == "lesson_plan" and request.week_number and request.audience:
-                cache_key = f"audio-cache/lesson_plan/lesson_plan_week_{request.week_number:02d}_{request.audience}{voice_suffix}.mp3"
-            elif content_type == "core_content" and request.week_number:
-                cache_key = f"audio-cache/core_content/core_content_week_{request.week_number:02d}{voice_suffix}.mp3"
-            elif content_type == "daily_thoughts" and request.week_number:
-                cache_key = f"audio-cache/daily_thoughts/daily_thoughts_week_{request.week_number:02d}{voice_suffix}.mp3"
-            elif content_type == "podcast":
-                cache_key = f"audio-cache/podcast/podcast_{content_hash}{voice_suffix}.mp3"
-            else:
-                # Generic fallback using content hash
-                cache_key = f"audio-cache/{content_type}/{content_type}_{content_hash}{voice_suffix}.mp3"
+            cache_key = podcast_cache_key(request, is_conversation)
             
             # Check if we have cached audio
             cached_audio = audio_cache_manager.get_cached_audio(cache_key)
@@ -938,234 +1468,54 @@ async def generate_podcast_tts(request: TTSPodcastRequest):
                     title=request.title,
                     character_count=character_count,
                     total_duration_sec=cached_duration,
-                    generation_time_ms=total_time_ms
+                    generation_time_ms=total_time_ms,
+                    audio_url=cached_audio_url(cache_key)
                 )
         except Exception as e:
             logger.warning(f"Cache check failed: {e}, proceeding with generation")
     
     try:
         # Find the intro/outro music file
-        music_paths = [
-            Path(__file__).parent.parent / "assets" / "intro_mp3s" / "inspiring-inspirational-background-music-412596.mp3",
-            Path("/app/assets/intro_mp3s/inspiring-inspirational-background-music-412596.mp3"),
-        ]
-        
-        music_file = None
-        for path in music_paths:
-            if path.exists():
-                music_file = path
-                break
-        
+        music_file = find_music_file()
         if not music_file:
-            logger.warning("⚠️ Intro music file not found, falling back to standard TTS")
-            # Fall back to standard TTS without music
-            fallback_text = request.text if request.text else ""
-            audio_b64 = tts_client.generate_audio_base64(
-                text=fallback_text,
-                voice=request.voice
-            )
-            total_time_ms = int((time.time() - start_time) * 1000)
-            return TTSPodcastResponse(
-                audio_base64=audio_b64,
-                title=request.title,
-                character_count=len(fallback_text),
-                total_duration_sec=0.0,
-                generation_time_ms=total_time_ms
-            )
-        
-        # ========== DETERMINE FORMAT: CONVERSATION OR SINGLE SPEAKER ==========
-        if request.script and request.voices:
-            # Multi-speaker conversation format
-            logger.info(f"🎭 Generating conversation with {len(request.script)} segments")
-            
-            voice_segments = []
-            total_chars = 0
-            
-            for idx, line in enumerate(request.script):
-                speaker = line.get('speaker', 'host')
-                text = line.get('text', '')
-                voice_name = request.voices.get(speaker, 'aoede')
-                
-                if not text.strip():
-                    continue
-                
-                total_chars += len(text)
-                
-                # Generate this speaker's audio segment
-                logger.info(f"  Generating segment {idx + 1}/{len(request.script)}: {speaker} ({voice_name})")
-                segment_b64 = tts_client.generate_audio_base64(text, voice_name)
-                
-                if not segment_b64:
-                    logger.warning(f"  Failed to generate segment {idx + 1}, skipping")
-                    continue
-                
-                segment_bytes = base64.b64decode(segment_b64)
-                audio_seg = AudioSegment.from_mp3(io.BytesIO(segment_bytes))
-                
-                voice_segments.append(audio_seg)
-                
-                # Add pause between speakers (except after last segment)
-                if idx < len(request.script) - 1:
-                    pause_duration = request.pause_between_speakers_ms
-                    voice_segments.append(AudioSegment.silent(duration=pause_duration))
-            
-            # Concatenate all voice segments into one track
-            if voice_segments:
-                voice = sum(voice_segments)
-            else:
-                raise HTTPException(status_code=500, detail="No voice segments generated")
-            
-            character_count = total_chars
-            
-        else:
-            # Single speaker format (backward compatible)
-            if not request.text:
-                raise HTTPException(status_code=400, detail="Either 'text' or 'script' must be provided")
-            
-            logger.info(f"🎙️ Generating single-speaker audio")
-            voice_audio_b64 = tts_client.generate_audio_base64(
-                text=request.text,
-                voice=request.voice
-            )
-            
-            if not voice_audio_b64:
-                raise HTTPException(status_code=500, detail="Voice audio generation failed")
-            
-            voice_audio_bytes = base64.b64decode(voice_audio_b64)
-            voice = AudioSegment.from_mp3(io.BytesIO(voice_audio_bytes))
-            character_count = len(request.text)
-        
-        # Load music for intro/outro
-        music = AudioSegment.from_mp3(str(music_file))
-        
-        # ========== TIMING CONFIGURATION ==========
-        intro_duration_ms = 10000          # 10s intro at full volume
-        music_fadeout_ms = 6000            # 6s fade out (10s-16s)
-        voice_start_ms = 11000             # Voice starts at 11s
-        outro_fadein_ms = 10000            # 10s fade in before voice ends
-        outro_duration_ms = 30000          # 30s outro after voice
-        outro_final_fadeout_ms = 8000      # 8s fade out at very end
-        
-        voice_duration_ms = len(voice)
-        
-        # Total duration needed for music
-        total_duration_needed = intro_duration_ms + music_fadeout_ms + outro_fadein_ms + outro_duration_ms
-        
-        # Ensure music is long enough (loop if needed with crossfade for seamless loop)
-        while len(music) < total_duration_needed + 5000:
-            music = music.append(music, crossfade=2000)
-        
-        # ========== BUILD INTRO + EXPONENTIAL FADE OUT ==========
-        # Intro: 0-10s at full volume
-        intro_music = music[:intro_duration_ms]
-        
-        # Exponential fade out: 10s-16s (6 second fade)
-        # Apply exponential fade by processing in small chunks with increasing attenuation
-        fadeout_section = music[intro_duration_ms:intro_duration_ms + music_fadeout_ms]
-        
-        # Create exponential fade by splitting into segments and applying graduated volume
-        import math
-        chunk_size_ms = 100  # 100ms chunks for smooth fade
-        num_chunks = music_fadeout_ms // chunk_size_ms
-        faded_chunks = AudioSegment.empty()
-        
-        for i in range(num_chunks):
-            chunk_start = i * chunk_size_ms
-            chunk_end = (i + 1) * chunk_size_ms
-            chunk = fadeout_section[chunk_start:chunk_end]
-            
-            # Exponential curve: faster drop at start, slower at end
-            # progress goes from 0 to 1, we want volume to go from 1 to 0 exponentially
-            progress = i / num_chunks
-            # Exponential decay: e^(-3*progress) gives nice curve (drops to ~5% by end)
-            volume_multiplier = math.exp(-4 * progress)
-            # Convert to dB reduction (0 dB = full volume, -inf dB = silence)
-            if volume_multiplier > 0.001:
-                db_reduction = 20 * math.log10(volume_multiplier)
-                chunk = chunk + db_reduction
-            else:
-                chunk = chunk - 60  # Effectively silent
-            
-            faded_chunks += chunk
-        
-        intro_with_fadeout = intro_music + faded_chunks
-        
-        # ========== VOICE TRACK (NO FADE-IN, FULL VOLUME) ==========
-        # Voice starts at 18 seconds at FULL volume (no fade-in)
-        voice_with_padding = AudioSegment.silent(duration=voice_start_ms) + voice
-        
-        # ========== BUILD OUTRO (FADE IN UNDER LAST 10s OF VOICE) ==========
-        # Calculate when outro should start fading in (10s before voice ends)
-        outro_start_position = voice_start_ms + voice_duration_ms - outro_fadein_ms
-        
-        # Get music section for outro (fade-in + full outro)
-        outro_music_start = intro_duration_ms + music_fadeout_ms
-        outro_total_length = outro_fadein_ms + outro_duration_ms
-        outro_music = music[outro_music_start:outro_music_start + outro_total_length]
-        
-        # First 10s: fade in from silence
-        outro_fadein = outro_music[:outro_fadein_ms].fade_in(duration=outro_fadein_ms)
-        
-        # Next 30s: full volume with fade out at end
-        outro_full = outro_music[outro_fadein_ms:outro_fadein_ms + outro_duration_ms]
-        outro_full = outro_full.fade_out(duration=outro_final_fadeout_ms)
-        
-        complete_outro = outro_fadein + outro_full
+            # Same layout without the beds; not cached, so deploying the music fixes it
+            logger.warning("⚠️ Intro music file not found, rendering voice without music")
         
-        # ========== FINAL MIX ==========
-        # Calculate silence duration between intro fadeout and outro fadein
-        silence_duration = max(0, voice_duration_ms - music_fadeout_ms - outro_fadein_ms)
+        voice_mp3, gaps_ms, character_count, segment_audio = await synthesize_podcast_voice(request, is_conversation)
         
-        # Build base music track: intro + fadeout + silence + outro
-        base_track = intro_with_fadeout + AudioSegment.silent(duration=silence_duration)
-        
-        # Pad base track to match where outro should start
-        if len(base_track) < outro_start_position:
-            base_track = base_track + AudioSegment.silent(duration=outro_start_position - len(base_track))
-        
-        # Add outro music (this will overlay on last 10s of voice + 30s after)
-        base_track = base_track[:outro_start_position] + complete_outro
-        
-        # Ensure voice track is padded to match base track length
-        if len(voice_with_padding) < len(base_track):
-            voice_with_padding = voice_with_padding + AudioSegment.silent(duration=len(base_track) - len(voice_with_padding))
-        
-        # Overlay voice on top of music track
-        final_audio = base_track.overlay(voice_with_padding)
-        
-        # Normalize to consistent levels
-        final_audio = normalize(final_audio)
-        final_audio = final_audio - 1  # -1dB headroom
-        
-        # Export to MP3 bytes with good quality
-        output_buffer = io.BytesIO()
-        final_audio.export(output_buffer, format="mp3", bitrate="192k")
-        output_buffer.seek(0)
-        final_audio_bytes = output_buffer.read()
+        # ========== MIX VOICE OVER INTRO/OUTRO MUSIC (see audio_mixer) ==========
+        final_audio_bytes, total_duration_sec = await asyncio.get_running_loop().run_in_executor(
+            None, render_podcast, voice_mp3, gaps_ms, music_file
+        )
         final_audio_b64 = base64.b64encode(final_audio_bytes).decode('utf-8')
         
         # ========== UPLOAD TO CACHE ==========
-        if cache_key and audio_cache_manager:
+        audio_url = None
+        if cache_key and audio_cache_manager and music_file:
             try:
                 upload_success = audio_cache_manager.upload_to_cache(cache_key, final_audio_bytes)
                 if upload_success:
                     logger.info(f"💾 Cached audio for future requests: {cache_key}")
+                    audio_url = cached_audio_url(cache_key)
                 else:
                     logger.warning(f"⚠️ Failed to cache audio: {cache_key}")
             except Exception as e:
                 logger.warning(f"Cache upload failed: {e}, but returning generated audio")
         
-        total_duration_sec = len(final_audio) / 1000.0
         total_time_ms = int((time.time() - start_time) * 1000)
         
-        logger.info(f"✅ Podcast TTS generated in {total_time_ms}ms, duration: {total_duration_sec:.1f}s")
+        logger.info(f"✅ Podcast TTS generated in {total_time_ms}ms, duration: {total_duration_sec:.1f}s, "
+                    f"segments: {segment_audio.cache_hits} cached / {segment_audio.cache_misses} synthesized")
         
         return TTSPodcastResponse(
             audio_base64=final_audio_b64,
             title=request.title,
             character_count=character_count,
             total_duration_sec=total_duration_sec,
-            generation_time_ms=total_time_ms
+            generation_time_ms=total_time_ms,
+            segment_cache_hits=segment_audio.cache_hits,
+            segment_cache_misses=segment_audio.cache_misses,
+            audio_url=audio_url
         )
         
     except HTTPException:
@@ -1174,6 +1524,168 @@ async def generate_podcast_tts(request: TTSPodcastRequest):
         logger.error(f"Podcast TTS generation error: {e}")
         raise HTTPException(status_code=500, detail=f"Podcast TTS generation failed: {str(e)}")
 
+class ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that closes its body generator however the response ends, e.g. on client disconnect"""
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            aclose = getattr(self.body_iterator, 'aclose', None)
+            if aclose:
+                await aclose()
+
+@app.post("/tts/podcast/stream")
+async def stream_podcast_tts(request: TTSPodcastRequest):
+    """
+    Generate podcast audio (same request and audio as /tts/podcast) as a
+    streamed audio/mpeg response.
+    
+    - Cached podcast: 303 redirect to /tts/audio/..., which serves the
+      cached file with HTTP Range support (seeking, resumable downloads)
+    - Otherwise: the voice is synthesized, then the MP3 is streamed with
+      chunked transfer while it is being encoded, so playback can start
+      before the mix is finished; the complete file is cached afterwards
+    
+    Response headers carry the duration and segment cache counts.
+    """
+    start_time = time.time()
+    is_conversation = podcast_is_conversation(request)
+    loop = asyncio.get_running_loop()
+    
+    cache_key = None
+    if audio_cache_manager:
+        try:
+            cache_key = podcast_cache_key(request, is_conversation)
+            if await loop.run_in_executor(None, audio_cache_manager.check_cache, cache_key):
+                return RedirectResponse(cached_audio_url(cache_key), status_code=303)
+        except Exception as e:
+            logger.warning(f"Cache check failed: {e}, proceeding with generation")
+    
+    try:
+        voice_mp3, gaps_ms, character_count, segment_audio = await synthesize_podcast_voice(request, is_conversation)
+        headers = {
+            "X-Character-Count": str(character_count),
+            "X-Segment-Cache-Hits": str(segment_audio.cache_hits),
+            "X-Segment-Cache-Misses": str(segment_audio.cache_misses),
+        }
+        
+        music_file = find_music_file()
+        if not music_file:
+            # Same as /tts/podcast: the voice alone, not cached
+            logger.warning("⚠️ Intro music file not found, streaming voice without music")
+            cache_key = None
+        
+        mix = await loop.run_in_executor(None, prepare_podcast, voice_mp3, gaps_ms, music_file)
+        headers["X-Audio-Duration-Sec"] = f"{mix.duration_sec:.2f}"
+        audio_chunks = stream_mp3(mix.blocks())
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Podcast TTS generation error: {e}")
+        raise HTTPException(status_code=500, detail=f"Podcast TTS generation failed: {str(e)}")
+    
+    logger.info(f"🎧 Podcast stream starting after {int((time.time() - start_time) * 1000)}ms")
+    streamed = []       # MP3 chunks, kept to cache the finished file
+    completed = []
+    
+    async def stream_audio():
+        try:
+            async for chunk in iterate_in_threadpool(audio_chunks):
+                streamed.append(chunk)
+                yield chunk
+            completed.append(True)
+            logger.info(f"✅ Podcast streamed in {int((time.time() - start_time) * 1000)}ms "
+                        f"({sum(len(chunk) for chunk in streamed)} bytes)")
+        finally:
+            # Stops the encoder if the client went away
+            audio_chunks.close()
+    
+    def cache_streamed_audio():
+        if completed and cache_key and audio_cache_manager:
+            if audio_cache_manager.upload_to_cache(cache_key, b''.join(streamed)):
+                logger.info(f"💾 Cached audio for future requests: {cache_key}")
+    
+    return ClosingStreamingResponse(stream_audio(), media_type="audio/mpeg", headers=headers,
+                                    background=BackgroundTask(cache_streamed_audio))
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range Range header ("bytes=0-499", "bytes=500-", "bytes=-500")
+    
+    Returns:
+        (first, last) inclusive byte offsets, or None to serve the whole file
+        (no header, or one this endpoint does not support, e.g. multiple ranges)
+    
+    Raises:
+        ValueError: If the range cannot be satisfied (416)
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[len("bytes="):].strip().partition("-")
+    if not (start or end) or (start and not start.isdigit()) or (end and not end.isdigit()):
+        return None
+    
+    if not start:
+        # Suffix range: the last N bytes
+        if int(end) == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - int(end)), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or first > last:
+        raise ValueError("Range not satisfiable")
+    return first, last
+
+@app.api_route("/tts/audio/{cache_key:path}", methods=["GET", "HEAD"])
+async def get_cached_audio_file(cache_key: str, request: Request):
+    """
+    Serve a cached audio file as audio/mpeg with HTTP Range support
+    
+    Streams from Cloud Storage in chunks, so players can seek and resume
+    without the file passing through memory whole. Only final podcast files
+    are served (PODCAST_CACHE_KEY).
+    """
+    if not audio_cache_manager:
+        raise HTTPException(status_code=503, detail="Audio cache not available")
+    if not PODCAST_CACHE_KEY.fullmatch(cache_key):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    
+    info = await asyncio.get_running_loop().run_in_executor(None, audio_cache_manager.get_blob_info, cache_key)
+    if not info:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    
+    size = info['size']
+    etag = f'"{info["etag"]}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={AUDIO_MAX_AGE}",
+    }
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        byte_range = parse_byte_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", **headers})
+    
+    if byte_range:
+        first, last = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    else:
+        first, last = 0, size - 1
+        status_code = 200
+    headers["Content-Length"] = str(last - first + 1)
+    
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type="audio/mpeg")
+    return StreamingResponse(
+        audio_cache_manager.iter_range(cache_key, first, last, generation=info['generation']),
+        status_code=status_code, headers=headers, media_type="audio/mpeg"
+    )
+
 
 # =============================================================================
 # CACHE MANAGEMENT ENDPOINTS
@@ -6,21 +6,27 @@ Manages caching of TTS-generated audio files in Google Cloud Storage.
 - Cache retrieval: Download cached audio for subsequent requests
 - Age-based cleanup: Delete files older than 30 days (manual trigger)
 - Cache statistics: Track usage and storage
+- Segment cache: Content-addressed audio per synthesized text chunk, shared
+  by every podcast, guide and voice that says the same words
 
 Cost-effective solution for podcast, study guide, and lesson plan audio.
 """
 
 import os
+import json
 import logging
 import hashlib
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Tuple
+from typing import Optional, Dict, List, Tuple, Iterator, Any
 from pathlib import Path
 from google.cloud import storage
 from google.api_core.exceptions import NotFound
 
 logger = logging.getLogger(__name__)
 
+# Bump to invalidate every cached segment (e.g. after changing the audio encoding)
+SEGMENT_CACHE_VERSION = 1
+
 
 class AudioCacheManager:
     """Manages audio file caching in Google Cloud Storage"""
@@ -107,6 +113,73 @@ class AudioCacheManager:
         
         return f"{base_path}/{filename}"
     
+    def segment_cache_key(
+        self,
+        text: str,
+        voice_name: str,
+        speaking_rate: float = 1.0,
+        pitch: float = 0.0
+    ) -> str:
+        """
+        Generate the content-addressed cache key for one synthesized chunk
+        
+        Format: audio-cache/segments/<sha256>.mp3
+        
+        Args:
+            text: Cleaned text exactly as sent to TTS
+            voice_name: Full TTS voice name (en-US-Chirp3-HD-Aoede), so voice aliases share entries
+            speaking_rate: Speed of speech
+            pitch: Voice pitch adjustment
+            
+        Returns:
+            GCS blob path for the segment
+        """
+        identity = json.dumps([SEGMENT_CACHE_VERSION, text, voice_name, round(speaking_rate, 3), round(pitch, 3)],
+                              ensure_ascii=False)
+        return f"audio-cache/segments/{hashlib.sha256(identity.encode('utf-8')).hexdigest()}.mp3"
+    
+    def get_segment(self, cache_key: str) -> Optional[bytes]:
+        """
+        Download a cached segment in one request (no separate exists() check)
+        
+        Args:
+            cache_key: GCS blob path from segment_cache_key
+            
+        Returns:
+            Audio bytes if cached, None otherwise
+        """
+        try:
+            return self.bucket.blob(cache_key).download_as_bytes()
+        except NotFound:
+            return None
+        except Exception as e:
+            logger.warning(f"Error downloading cached segment {cache_key}: {e}")
+            return None
+    
+    def put_segment(self, cache_key: str, audio_bytes: bytes) -> bool:
+        """
+        Upload a synthesized segment
+        
+        Args:
+            cache_key: GCS blob path from segment_cache_key
+            audio_bytes: MP3 bytes
+            
+        Returns:
+            True if upload successful, False otherwise
+        """
+        try:
+            blob = self.bucket.blob(cache_key)
+            blob.metadata = {
+                'created_at': datetime.utcnow().isoformat(),
+                'content_type': 'audio/mpeg',
+                'cache_version': str(SEGMENT_CACHE_VERSION)
+            }
+            blob.upload_from_string(audio_bytes, content_type='audio/mpeg')
+            return True
+        except Exception as e:
+            logger.warning(f"Error uploading segment {cache_key}: {e}")
+            return False
+    
     def check_cache(self, cache_key: str) -> bool:
         """
         Check if audio file exists in cache
@@ -163,6 +236,51 @@ class AudioCacheManager:
             logger.error(f"Error downloading cached audio {cache_key}: {e}")
             return None
     
+    def get_blob_info(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached file's size and version without downloading it
+        
+        Args:
+            cache_key: GCS blob path
+            
+        Returns:
+            Dict with size, etag and generation, or None if not cached
+        """
+        try:
+            blob = self.bucket.get_blob(cache_key)
+        except Exception as e:
+            logger.error(f"Error looking up cached audio {cache_key}: {e}")
+            return None
+        if blob is None:
+            return None
+        return {'size': blob.size, 'etag': blob.etag, 'generation': blob.generation}
+    
+    def iter_range(
+        self,
+        cache_key: str,
+        first: int,
+        last: int,
+        generation: Optional[int] = None,
+        chunk_size: int = 1024 * 1024
+    ) -> Iterator[bytes]:
+        """
+        Stream bytes first..last (inclusive) of a cached file in chunks
+        
+        Args:
+            cache_key: GCS blob path
+            first: First byte offset
+            last: Last byte offset (inclusive)
+            generation: Object generation from get_blob_info, so a file
+                replaced mid-stream cannot mix two versions
+            chunk_size: Bytes per GCS request
+        """
+        blob = self.bucket.blob(cache_key, generation=generation)
+        position = first
+        while position <= last:
+            end = min(position + chunk_size - 1, last)
+            yield blob.download_as_bytes(start=position, end=end)
+            position = end + 1
+    
     def upload_to_cache(self, cache_key: str, audio_bytes: bytes) -> bool:
         """
         Upload audio file to cache
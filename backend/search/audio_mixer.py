@@ -0,0 +1,398 @@
+"""
+Podcast audio mixing with NumPy
+
+Decodes MP3 to PCM once (ffmpeg, resampled to the mix rate) into NumPy
+arrays. Voice segments are copied into one preallocated track at their
+offsets, fades are vectorized gain envelopes on the music beds, and the mix
+is normalized from a single peak pass and encoded back to MP3 in blocks.
+
+Audio structure (same timing as the original pydub mixer):
+- Intro: 0-10s music at full volume
+- Music fade-out: 10s-16s (6 second exponential fade to silence)
+- Voice starts: 11s
+- Outro fade-in: music fades in 10 seconds before the voice ends
+- Outro: 30 seconds of music after the voice ends (with 8s fade-out at end)
+- Final: Normalized with -1dB headroom
+"""
+
+import time
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple, Union, Iterable, Iterator, Optional, Dict
+import numpy as np
+from pydub import AudioSegment
+
+logger = logging.getLogger(__name__)
+
+# Mix format (the music's format; mono 24kHz TTS voices are upsampled on decode)
+MIX_FRAME_RATE = 44100
+MIX_CHANNELS = 2
+MP3_BITRATE = "192k"
+
+# ========== TIMING CONFIGURATION ==========
+INTRO_DURATION_MS = 10000          # 10s intro at full volume
+MUSIC_FADEOUT_MS = 6000            # 6s fade out (10s-16s)
+VOICE_START_MS = 11000             # Voice starts at 11s
+OUTRO_FADEIN_MS = 10000            # 10s fade in before voice ends
+OUTRO_DURATION_MS = 30000          # 30s outro after voice
+OUTRO_FINAL_FADEOUT_MS = 8000      # 8s fade out at very end
+MUSIC_LOOP_CROSSFADE_MS = 2000     # Crossfade when looping short music
+
+# Exponential fade-out: gain e^(-k * progress), down to ~2% at the end
+FADEOUT_CURVE = 4.0
+
+# pydub's normalize() headroom (0.1dB) plus the extra -1dB
+HEADROOM_DB = 1.1
+
+# Concurrent ffmpeg decoders for voice segments
+DECODE_THREADS = 8
+
+# Mix is produced and encoded in blocks of this length
+BLOCK_MS = 10000
+
+# Intro/outro music, in the source tree or the container
+MUSIC_PATHS = [
+    Path(__file__).parent.parent / "assets" / "intro_mp3s" / "inspiring-inspirational-background-music-412596.mp3",
+    Path("/app/assets/intro_mp3s/inspiring-inspirational-background-music-412596.mp3"),
+]
+
+# Rendered beds per music file, kept for the life of the process
+_music_beds: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+_music_beds_lock = threading.Lock()
+
+
+def ms_to_frames(ms: float) -> int:
+    """Number of frames in ms milliseconds at the mix rate"""
+    return int(round(ms * MIX_FRAME_RATE / 1000))
+
+
+def _ffmpeg_command(args: List[str]) -> List[str]:
+    """Command line for the ffmpeg pydub is configured with"""
+    return [AudioSegment.converter, '-hide_banner', '-loglevel', 'error'] + args
+
+
+def decode_mp3(audio: Union[bytes, str, Path], channels: int = MIX_CHANNELS, dtype=np.float32) -> np.ndarray:
+    """
+    Decode MP3 bytes or an MP3 file to PCM at the mix rate
+
+    Args:
+        audio: MP3 bytes or file path
+        channels: Channels to decode to
+        dtype: np.float32 (samples in [-1, 1]) or np.int16
+
+    Returns:
+        Array of shape (frames, channels)
+    """
+    data = audio if isinstance(audio, bytes) else Path(audio).read_bytes()
+    sample_format = 'f32le' if dtype == np.float32 else 's16le'
+    result = subprocess.run(
+        _ffmpeg_command(['-i', 'pipe:0', '-f', sample_format, '-ar', str(MIX_FRAME_RATE), '-ac', str(channels),
+                         'pipe:1']),
+        input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed: {result.stderr.decode(errors='ignore').strip()}")
+    return np.frombuffer(result.stdout, dtype=dtype).reshape(-1, channels)
+
+
+def decode_voice(segments: List[bytes]) -> List[np.ndarray]:
+    """Decode TTS voice segments (mono) concurrently, in order, as 1-D int16 arrays"""
+    def decode(segment: bytes) -> np.ndarray:
+        return decode_mp3(segment, channels=1, dtype=np.int16)[:, 0]
+
+    if len(segments) <= 1:
+        return [decode(segment) for segment in segments]
+    with ThreadPoolExecutor(max_workers=DECODE_THREADS) as pool:
+        return list(pool.map(decode, segments))
+
+
+class Mp3Stream:
+    """
+    MP3 encoder over float PCM blocks in the mix format (within [-1, 1])
+
+    Blocks are fed to ffmpeg from a background thread while iterating
+    yields the encoded bytes as they come out, so neither the PCM nor the
+    MP3 has to be held in full. close() stops the encoder from any thread,
+    e.g. when the client of a streamed response goes away.
+    """
+
+    def __init__(self, blocks: Iterable[np.ndarray], bitrate: str = MP3_BITRATE, chunk_size: int = 64 * 1024):
+        self.chunk_size = chunk_size
+        self.closed = False
+        self._feed_errors: List[Exception] = []
+        self._process = subprocess.Popen(
+            _ffmpeg_command(['-f', 's16le', '-ar', str(MIX_FRAME_RATE), '-ac', str(MIX_CHANNELS), '-i', 'pipe:0',
+                             '-b:a', bitrate, '-f', 'mp3', 'pipe:1']),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self._writer = threading.Thread(target=self._feed, args=(blocks,), name="mp3-encode", daemon=True)
+        self._writer.start()
+
+    def _feed(self, blocks: Iterable[np.ndarray]):
+        try:
+            for block in blocks:
+                samples = np.empty(block.shape, dtype='<i2')
+                np.multiply(block, 32767, out=samples, casting='unsafe')
+                self._process.stdin.write(samples.tobytes())
+        except (BrokenPipeError, ValueError):
+            pass    # Encoder stopped by close()
+        except Exception as e:
+            self._feed_errors.append(e)
+        finally:
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def __iter__(self) -> Iterator[bytes]:
+        finished = False
+        try:
+            while True:
+                chunk = self._process.stdout.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            finished = not self.closed
+        finally:
+            if not finished:
+                self.close()
+            returncode = self._process.wait()
+            self._writer.join()
+            self.closed = True
+
+        if not finished:
+            return
+        if self._feed_errors:
+            raise self._feed_errors[0]
+        if returncode:
+            raise RuntimeError(f"ffmpeg encode failed: {self._process.stderr.read().decode(errors='ignore').strip()}")
+
+    def close(self):
+        """Stop the encoder (no-op once finished)"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+
+
+def stream_mp3(blocks: Iterable[np.ndarray], bitrate: str = MP3_BITRATE) -> Mp3Stream:
+    """Encode float PCM blocks in the mix format to MP3, as an iterable of MP3 chunks (see Mp3Stream)"""
+    return Mp3Stream(blocks, bitrate)
+
+
+def encode_mp3(blocks: Iterable[np.ndarray], bitrate: str = MP3_BITRATE) -> bytes:
+    """Encode float PCM blocks in the mix format to one MP3"""
+    return b''.join(stream_mp3(blocks, bitrate))
+
+
+def exponential_fade_out(frames: int) -> np.ndarray:
+    """Gain envelope falling from 1 exponentially: fast drop at the start, slower at the end"""
+    return np.exp(-FADEOUT_CURVE * np.arange(frames, dtype=np.float32) / max(frames, 1))
+
+
+def linear_fade(frames: int, fade_in: bool = True) -> np.ndarray:
+    """Gain envelope rising from 0 to 1 (or falling from 1 to 0), linear in amplitude like pydub's fades"""
+    ramp = np.linspace(0.0, 1.0, frames, endpoint=False, dtype=np.float32)
+    return ramp if fade_in else ramp[::-1]
+
+
+def loop_music(music: np.ndarray, min_frames: int, crossfade_frames: int) -> np.ndarray:
+    """Repeat music with a crossfade at each joint until it is at least min_frames long"""
+    if len(music) >= min_frames:
+        return music
+    crossfade_frames = min(crossfade_frames, len(music) // 2)
+    step = len(music) - crossfade_frames
+    repeats = -(-(min_frames - crossfade_frames) // step)
+
+    looped = np.zeros((step * repeats + crossfade_frames, music.shape[1]), dtype=np.float32)
+    fade_in = linear_fade(crossfade_frames)[:, None]
+    faded = music.copy()
+    faded[:crossfade_frames] *= fade_in
+    faded[len(music) - crossfade_frames:] *= fade_in[::-1]
+    for i in range(repeats):
+        looped[i * step:i * step + len(music)] += faded
+    # The very start and end are not joints
+    looped[:crossfade_frames] = music[:crossfade_frames]
+    looped[-crossfade_frames:] = music[-crossfade_frames:]
+    return looped
+
+
+def render_beds(music: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cut and fade the intro and outro music beds
+
+    Returns:
+        Tuple of (intro bed: full volume then the exponential fade-out,
+        outro bed: linear fade-in, full volume, final linear fade-out)
+    """
+    intro_frames = ms_to_frames(INTRO_DURATION_MS + MUSIC_FADEOUT_MS)
+    outro_frames = ms_to_frames(OUTRO_FADEIN_MS + OUTRO_DURATION_MS)
+    music = loop_music(music, intro_frames + outro_frames + ms_to_frames(5000),
+                       ms_to_frames(MUSIC_LOOP_CROSSFADE_MS))
+
+    intro = music[:intro_frames].copy()
+    fade_start = ms_to_frames(INTRO_DURATION_MS)
+    intro[fade_start:] *= exponential_fade_out(intro_frames - fade_start)[:, None]
+
+    outro = music[intro_frames:intro_frames + outro_frames].copy()
+    fadein_frames = ms_to_frames(OUTRO_FADEIN_MS)
+    fadeout_frames = ms_to_frames(OUTRO_FINAL_FADEOUT_MS)
+    outro[:fadein_frames] *= linear_fade(fadein_frames)[:, None]
+    outro[-fadeout_frames:] *= linear_fade(fadeout_frames, fade_in=False)[:, None]
+    return intro, outro
+
+
+class PodcastMix:
+    """
+    Voice segments laid out over the music beds on the podcast timeline
+
+    TTS segments never overlap, so the voice is one preallocated mono int16
+    track with each segment copied to its offset. The stereo mix is produced
+    in blocks, adding the beds only where they play, and scaled by a gain
+    found in one peak pass: the whole podcast never exists as a float buffer.
+    """
+
+    def __init__(self, voice_segments: List[np.ndarray], gaps_ms: List[int],
+                 intro: Optional[np.ndarray] = None, outro: Optional[np.ndarray] = None):
+        """
+        Args:
+            voice_segments: Voice segments from decode_voice, in order
+            gaps_ms: Silence after each segment (e.g. the pause between speakers)
+            intro: Intro bed from render_beds (None with outro for voice only,
+                starting straight away)
+            outro: Outro bed from render_beds
+        """
+        gaps = [ms_to_frames(gap) for gap in gaps_ms]
+        self.voice = np.zeros(sum(len(segment) for segment in voice_segments) + sum(gaps), dtype=np.int16)
+        position = 0
+        for segment, gap in zip(voice_segments, gaps):
+            self.voice[position:position + len(segment)] = segment
+            position += len(segment) + gap
+
+        if intro is None or outro is None:
+            self.voice_start = 0
+            self.beds = []
+            self.frames = len(self.voice)
+        else:
+            self.voice_start = ms_to_frames(VOICE_START_MS)
+            # The outro fades in under the last OUTRO_FADEIN_MS of the voice;
+            # a short voice track cuts the intro's fade-out off where the outro begins
+            outro_start = self.voice_start + len(self.voice) - ms_to_frames(OUTRO_FADEIN_MS)
+            self.beds = [(0, intro[:max(0, min(len(intro), outro_start))]), (outro_start, outro)]
+            self.frames = max(outro_start + len(outro), self.voice_start + len(self.voice))
+
+        # Normalize: peak HEADROOM_DB below full scale
+        peak = max((float(np.max(np.abs(block))) for block in self._blocks()), default=0.0)
+        self.gain = 10 ** (-HEADROOM_DB / 20) / peak if peak > 0 else 1.0
+
+    @property
+    def duration_sec(self) -> float:
+        return self.frames / MIX_FRAME_RATE
+
+    def _blocks(self) -> Iterator[np.ndarray]:
+        """Unnormalized stereo float32 blocks of the mix, in order"""
+        block_frames = ms_to_frames(BLOCK_MS)
+        voice_end = self.voice_start + len(self.voice)
+        for start in range(0, self.frames, block_frames):
+            stop = min(start + block_frames, self.frames)
+            block = np.zeros((stop - start, MIX_CHANNELS), dtype=np.float32)
+
+            first, last = max(start, self.voice_start), min(stop, voice_end)
+            if first < last:
+                voice = self.voice[first - self.voice_start:last - self.voice_start]
+                block[first - start:last - start] += voice[:, None] * np.float32(1 / 32768)
+
+            for bed_start, bed in self.beds:
+                first, last = max(start, bed_start), min(stop, bed_start + len(bed))
+                if first < last:
+                    block[first - start:last - start] += bed[first - bed_start:last - bed_start]
+            yield block
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        """Normalized stereo float32 blocks of the mix, in order"""
+        for block in self._blocks():
+            block *= self.gain
+            yield block
+
+
+def find_music_file() -> Optional[Path]:
+    """The intro/outro music file, None if it is not deployed"""
+    return next((path for path in MUSIC_PATHS if path.exists()), None)
+
+
+def load_music_beds(music_file: Union[str, Path]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Intro and outro beds for a music file, decoded and rendered on first use
+
+    The beds are the same for every podcast, so they are kept (read-only)
+    for the life of the process; call at startup to keep the decode off the
+    first request.
+
+    Returns:
+        Tuple of (intro bed, outro bed) as from render_beds
+    """
+    key = str(music_file)
+    with _music_beds_lock:
+        if key not in _music_beds:
+            start = time.time()
+            intro, outro = render_beds(decode_mp3(music_file))
+            intro.flags.writeable = False
+            outro.flags.writeable = False
+            _music_beds[key] = (intro, outro)
+            logger.info(f"🎵 Music beds ready in {time.time() - start:.2f}s "
+                        f"({(intro.nbytes + outro.nbytes) / 1024 / 1024:.1f}MB)")
+        return _music_beds[key]
+
+
+def preload_music_beds() -> bool:
+    """Render the beds for the deployed music file ahead of the first podcast; False if unavailable"""
+    music_file = find_music_file()
+    if not music_file:
+        return False
+    try:
+        load_music_beds(music_file)
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Could not pre-render podcast music beds: {e}")
+        return False
+
+
+def prepare_podcast(voice_mp3: List[bytes], gaps_ms: List[int],
+                    music_file: Optional[Union[str, Path]]) -> PodcastMix:
+    """
+    Decode the voice segments and lay them out over the music beds
+
+    Args:
+        voice_mp3: MP3 bytes per voice segment, in order
+        gaps_ms: Silence after each segment
+        music_file: Intro/outro music MP3 (beds come from load_music_beds);
+            None for the voice alone
+
+    Returns:
+        PodcastMix ready to encode (encode_mp3) or stream (stream_mp3) from its blocks()
+    """
+    start = time.time()
+    intro, outro = load_music_beds(music_file) if music_file else (None, None)
+    mix = PodcastMix(decode_voice(voice_mp3), gaps_ms, intro, outro)
+    logger.info(f"🎚️ Laid out {mix.duration_sec:.1f}s podcast in {time.time() - start:.2f}s")
+    return mix
+
+
+def render_podcast(voice_mp3: List[bytes], gaps_ms: List[int],
+                   music_file: Optional[Union[str, Path]]) -> Tuple[bytes, float]:
+    """
+    Mix and encode a whole podcast (see prepare_podcast)
+
+    Returns:
+        Tuple of (MP3 bytes, duration in seconds)
+    """
+    mix = prepare_podcast(voice_mp3, gaps_ms, music_file)
+    start = time.time()
+    audio = encode_mp3(mix.blocks())
+    logger.info(f"🎚️ Encoded {mix.duration_sec:.1f}s podcast in {time.time() - start:.2f}s")
+    return audio, mix.duration_sec
@@ -14,14 +14,35 @@ import numpy as np
 import faiss
 from openai import OpenAI
 from tqdm import tqdm
-import pickle
+
+try:
+    from .ann_index import INDEX_TYPES, resolve_index_params, build_index, build_report, log_report
+    from .metadata_columns import MetadataColumns
+    from .segment_store import SegmentStore
+    from .lexical_index import LexicalIndex
+    from .neighbors import compute_neighbors, save_neighbors
+    from .facets import compute_facets, save_facets
+    from .index_versions import new_version_name, version_dir, write_manifest, set_current
+    from .prompts import MODE_SOURCE_FILTERS
+    from .scripture_search import SUBINDEX_DIR, SUBINDEX_MAX_FRACTION, filter_key
+except ImportError:  # Running as a standalone script
+    from ann_index import INDEX_TYPES, resolve_index_params, build_index, build_report, log_report
+    from metadata_columns import MetadataColumns
+    from segment_store import SegmentStore
+    from lexical_index import LexicalIndex
+    from neighbors import compute_neighbors, save_neighbors
+    from facets import compute_facets, save_facets
+    from index_versions import new_version_name, version_dir, write_manifest, set_current
+    from prompts import MODE_SOURCE_FILTERS
+    from scripture_search import SUBINDEX_DIR, SUBINDEX_MAX_FRACTION, filter_key
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class ScriptureEmbeddingBuilder:
-    def __init__(self, content_dir: str, output_dir: str, openai_api_key: str = None):
+    def __init__(self, content_dir: str, output_dir: str, openai_api_key: str = None,
+                 index_type: str = 'flat', index_params: Dict[str, Any] = None, evaluate: bool = False):
         """
         Initialize the embedding builder
         
@@ -29,6 +50,9 @@ class ScriptureEmbeddingBuilder:
             content_dir: Path to directory with JSON content files
             output_dir: Path to save FAISS index and metadata
             openai_api_key: OpenAI API key (or set OPENAI_API_KEY env var)
+            index_type: 'flat' (exact), 'ivf_flat', 'ivf_pq' or 'hnsw'
+            index_params: Overrides for nlist / nprobe / pq_m / hnsw_m / ef_construction / ef_search
+            evaluate: Write a recall@k vs. latency report against the flat index
         """
         self.content_dir = Path(content_dir)
         self.output_dir = Path(output_dir)
@@ -55,6 +79,12 @@ class ScriptureEmbeddingBuilder:
             "come_follow_me.json"
         ]
         
+        # FAISS index type and tuning (recorded in config.json for the search engine)
+        self.index_type = index_type
+        self.index_params_overrides = index_params or {}
+        self.index_params = {}
+        self.evaluate = evaluate
+        
         # Storage for all text segments and metadata
         self.all_texts = []
         self.all_metadata = []
@@ -98,7 +128,7 @@ class ScriptureEmbeddingBuilder:
                 if 'book' in item:  # Scripture
                     metadata.update({
                         'book': item.get('book'),
-                        'chapter': item.get('chapter'),
+                        'chapter': item.get('chapter', item.get('section')),  # D&C numbers sections
                         'verse': item.get('verse')
                     })
                 elif 'speaker' in item:  # General Conference
@@ -155,19 +185,28 @@ class ScriptureEmbeddingBuilder:
     
     def build_faiss_index(self, embeddings: np.ndarray):
         """Build FAISS index from embeddings"""
-        logger.info("Building FAISS index...")
+        logger.info(f"Building FAISS index ({INDEX_TYPES[self.index_type]})...")
         
-        # Use IndexFlatIP for cosine similarity (after L2 normalization)
-        # This gives exact search results, fast for 58K segments
+        # Inner product on L2-normalized vectors = cosine similarity
+        # 'flat' gives exact search results; IVF / HNSW trade a little recall for speed
         faiss.normalize_L2(embeddings)  # Normalize for cosine similarity
-        index = faiss.IndexFlatIP(self.embedding_dim)
-        
-        # Add embeddings to index
-        index.add(embeddings)
+        self.index_params = resolve_index_params(self.index_type, len(embeddings), self.index_params_overrides)
+        index = build_index(embeddings, self.index_type, self.index_params)
         
-        logger.info(f"FAISS index built with {index.ntotal} vectors")
+        logger.info(f"FAISS index built with {index.ntotal} vectors ({self.index_params})")
         return index
     
+    def save_index_report(self, embeddings: np.ndarray, index: faiss.Index):
+        """Save recall@k vs. latency of the built index against an exact flat index"""
+        logger.info("Evaluating index against flat baseline...")
+        report = build_report(embeddings, index, self.index_type, self.index_params)
+        log_report(report)
+        
+        report_path = self.output_dir / "index_report.json"
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Index report saved to {report_path}")
+    
     def save_index_and_metadata(self, index: faiss.Index):
         """Save FAISS index and metadata to disk"""
         logger.info("Saving index and metadata...")
@@ -177,11 +216,17 @@ class ScriptureEmbeddingBuilder:
         faiss.write_index(index, str(index_path))
         logger.info(f"FAISS index saved to {index_path}")
         
-        # Save metadata
-        metadata_path = self.output_dir / "scripture_metadata.pkl"
-        with open(metadata_path, 'wb') as f:
-            pickle.dump(self.all_metadata, f)
-        logger.info(f"Metadata saved to {metadata_path}")
+        # Save metadata as the compact segment store (interned columns + content blob)
+        SegmentStore.write(self.output_dir, self.all_metadata)
+        
+        # BM25 index over the same segments for lexical / hybrid retrieval
+        LexicalIndex.build(self.all_texts).save(self.output_dir)
+        
+        # Previous/next verse and paragraph links for passage expansion,
+        # and the /sources facet summary
+        columns = MetadataColumns(self.all_metadata)
+        save_neighbors(self.output_dir, compute_neighbors(columns))
+        save_facets(self.output_dir, compute_facets(columns))
         
         # Save configuration
         config = {
@@ -189,7 +234,8 @@ class ScriptureEmbeddingBuilder:
             'embedding_dim': self.embedding_dim,
             'total_segments': len(self.all_texts),
             'content_files': self.content_files,
-            'index_type': 'IndexFlatIP'
+            'index_type': INDEX_TYPES[self.index_type],
+            'index_params': self.index_params
         }
         
         config_path = self.output_dir / "config.json"
@@ -197,6 +243,37 @@ class ScriptureEmbeddingBuilder:
             json.dump(config, f, indent=2)
         logger.info(f"Configuration saved to {config_path}")
         
+    def save_mode_subindexes(self, embeddings: np.ndarray):
+        """Save a flat sub-index and id map for each fixed mode filter"""
+        logger.info("Building mode sub-indexes...")
+        
+        subindex_dir = self.output_dir / SUBINDEX_DIR
+        subindex_dir.mkdir(parents=True, exist_ok=True)
+        columns = MetadataColumns(self.all_metadata)
+        manifest = {}
+        
+        for mode, mode_filter in MODE_SOURCE_FILTERS.items():
+            ids = columns.filter_indices(mode_filter).astype(np.int64)
+            if len(ids) == 0 or len(ids) > SUBINDEX_MAX_FRACTION * len(embeddings):
+                logger.info(f"  Skipping '{mode}' sub-index ({len(ids)} segments)")
+                continue
+            
+            sub_index = faiss.IndexFlatIP(self.embedding_dim)
+            sub_index.add(embeddings[ids])
+            faiss.write_index(sub_index, str(subindex_dir / f"{mode}.faiss"))
+            np.save(subindex_dir / f"{mode}_ids.npy", ids)
+            
+            manifest[mode] = {
+                'filter': filter_key(mode_filter),
+                'total_segments': len(embeddings),
+                'count': len(ids)
+            }
+            logger.info(f"  '{mode}' sub-index: {len(ids)} vectors")
+        
+        with open(subindex_dir / "manifest.json", 'w') as f:
+            json.dump(manifest, f, indent=2)
+        logger.info(f"Mode sub-indexes saved to {subindex_dir}")
+        
     def build_complete_index(self, batch_size: int = 100):
         """Complete pipeline: load content, generate embeddings, build index"""
         logger.info("=== Starting Scripture Embedding Pipeline ===")
@@ -213,6 +290,13 @@ class ScriptureEmbeddingBuilder:
         # Step 4: Save everything
         self.save_index_and_metadata(index)
         
+        # Step 5: Prebuilt sub-indexes for the fixed search modes
+        # (build_faiss_index has already normalized the embeddings in place)
+        self.save_mode_subindexes(embeddings)
+        
+        if self.evaluate:
+            self.save_index_report(embeddings, index)
+        
         logger.info("=== Scripture Embedding Pipeline Complete ===")
         logger.info(f"Index saved to: {self.output_dir}")
         logger.info(f"Total segments indexed: {len(self.all_texts)}")
@@ -228,6 +312,19 @@ def main():
                         help='Batch size for embedding generation')
     parser.add_argument('--openai-key', 
                         help='OpenAI API key (or set OPENAI_API_KEY env var)')
+    parser.add_argument('--index-type', choices=list(INDEX_TYPES), default='flat',
+                        help='FAISS index type (flat = exact search)')
+    parser.add_argument('--nlist', type=int, help='IVF: number of clusters (default ~4*sqrt(n))')
+    parser.add_argument('--nprobe', type=int, help='IVF: clusters scanned per query')
+    parser.add_argument('--pq-m', type=int, help='IVF-PQ: number of sub-quantizers')
+    parser.add_argument('--hnsw-m', type=int, help='HNSW: neighbours per node')
+    parser.add_argument('--ef-construction', type=int, help='HNSW: build-time search depth')
+    parser.add_argument('--ef-search', type=int, help='HNSW: query-time search depth')
+    parser.add_argument('--evaluate', action='store_true',
+                        help='Write index_report.json with recall@k vs. latency against the flat index')
+    parser.add_argument('--versioned', action='store_true',
+                        help='Build into OUTPUT_DIR/versions/<timestamp> with a checksum manifest, '
+                             'then point OUTPUT_DIR/CURRENT at it')
     
     args = parser.parse_args()
     
@@ -236,17 +333,41 @@ def main():
         logger.error("Please provide OpenAI API key via --openai-key or OPENAI_API_KEY env var")
         return
     
+    # Versioned builds go to their own directory; running services keep
+    # serving CURRENT until it is switched below
+    output_dir = args.output_dir
+    version = None
+    if args.versioned:
+        version = new_version_name()
+        output_dir = str(version_dir(args.output_dir, version))
+        logger.info(f"Building index version {version} in {output_dir}")
+    
     # Build embeddings
     builder = ScriptureEmbeddingBuilder(
         content_dir=args.content_dir,
-        output_dir=args.output_dir,
-        openai_api_key=args.openai_key
+        output_dir=output_dir,
+        openai_api_key=args.openai_key,
+        index_type=args.index_type,
+        index_params={
+            'nlist': args.nlist,
+            'nprobe': args.nprobe,
+            'pq_m': args.pq_m,
+            'hnsw_m': args.hnsw_m,
+            'ef_construction': args.ef_construction,
+            'ef_search': args.ef_search
+        },
+        evaluate=args.evaluate
     )
     
     try:
         builder.build_complete_index(batch_size=args.batch_size)
         logger.info("✅ Scripture embedding index built successfully!")
         
+        if version:
+            write_manifest(output_dir, version)
+            set_current(args.output_dir, version)
+            logger.info(f"✅ Published index version {version}")
+        
     except Exception as e:
         logger.error(f"❌ Error building embeddings: {e}")
         raise
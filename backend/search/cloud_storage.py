@@ -5,10 +5,19 @@ Downloads content files and search indexes from Google Cloud Storage on startup
 """
 
 import os
+import shutil
 import logging
+from typing import Optional
 from pathlib import Path
 from google.cloud import storage
 
+try:
+    from .index_versions import (CURRENT_FILE, VERSIONS_DIR, IndexVersionError, version_dir,
+                                 verify_manifest, set_current)
+except ImportError:  # Running as a standalone script
+    from index_versions import (CURRENT_FILE, VERSIONS_DIR, IndexVersionError, version_dir,
+                                verify_manifest, set_current)
+
 logger = logging.getLogger(__name__)
 
 class CloudStorageManager:
@@ -21,22 +30,106 @@ class CloudStorageManager:
         self.client = storage.Client()
         self.bucket = self.client.bucket(self.bucket_name)
     
-    def download_indexes(self, local_dir: str = "indexes"):
-        """Download search indexes from Cloud Storage"""
+    def current_version(self) -> Optional[str]:
+        """Version named by indexes/CURRENT in the bucket, None for an unversioned bucket"""
+        blob = self.bucket.blob(f"indexes/{CURRENT_FILE}")
+        if not blob.exists():
+            return None
+        return blob.download_as_text().strip() or None
+    
+    def download_version(self, local_dir: str, version: str):
+        """
+        Download one index version and point the local CURRENT at it
+        
+        The files go to a scratch directory that is verified against the
+        version's manifest before being renamed into place, so a loader never
+        sees a partial or corrupt version. A version already present locally
+        is not downloaded again.
+        """
+        target = version_dir(local_dir, version)
+        if target.is_dir():
+            try:
+                verify_manifest(target)
+                logger.info(f"Index version {version} already downloaded")
+                set_current(local_dir, version)
+                return
+            except IndexVersionError as e:
+                logger.warning(f"⚠️  Local copy of version {version} is unusable ({e}), downloading again")
+                shutil.rmtree(target)
+        
+        prefix = f"indexes/{VERSIONS_DIR}/{version}/"
+        scratch = target.with_name(f".{version}.{os.getpid()}.partial")
+        shutil.rmtree(scratch, ignore_errors=True)
+        try:
+            for blob in self.bucket.list_blobs(prefix=prefix):
+                if blob.name.endswith('/'):
+                    continue
+                local_file = scratch / blob.name[len(prefix):]
+                local_file.parent.mkdir(parents=True, exist_ok=True)
+                blob.download_to_filename(str(local_file))
+                logger.info(f"✅ Downloaded {version}/{blob.name[len(prefix):]} ({local_file.stat().st_size / 1024 / 1024:.1f}MB)")
+            
+            verify_manifest(scratch)
+            try:
+                scratch.rename(target)
+            except OSError:
+                # Another process (e.g. a sibling worker) finished the same version first
+                if not target.is_dir():
+                    raise
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        
+        set_current(local_dir, version)
+    
+    def download_indexes(self, local_dir: str = "indexes", version: Optional[str] = None):
+        """
+        Download search indexes from Cloud Storage
+        
+        Args:
+            local_dir: Local index root
+            version: Version to fetch from a versioned bucket (defaults to the bucket's CURRENT)
+        """
         local_path = Path(local_dir)
         local_path.mkdir(parents=True, exist_ok=True)
         
+        version = version or self.current_version()
+        if version:
+            self.download_version(local_dir, version)
+            return
+        
         # Required index files
         required_files = [
             "config.json",
-            "scripture_index.faiss", 
-            "scripture_metadata.pkl"
+            "scripture_index.faiss"
         ]
         
-        for filename in required_files:
+        # Metadata: the compact segment store, or the legacy pickle
+        optional_files = [
+            "scripture_segments.json",
+            "scripture_segment_codes.npy",
+            "scripture_segment_loc.npy",
+            "scripture_content.bin",
+            "scripture_content_offsets.npy",
+            "scripture_metadata.pkl",
+            # BM25 index (built on first use when absent)
+            "lexical_index.json",
+            "lexical_offsets.npy",
+            "lexical_docs.npy",
+            "lexical_tf.npy",
+            "lexical_doc_lengths.npy",
+            # Neighbour links and /sources facets (computed at load when absent)
+            "scripture_neighbors.npy",
+            "facets.json"
+        ]
+        
+        for filename in required_files + optional_files:
             blob = self.bucket.blob(f"indexes/{filename}")
             local_file = local_path / filename
             
+            if filename in optional_files and not blob.exists():
+                logger.info(f"Skipping {filename} (not in bucket)")
+                continue
+            
             try:
                 logger.info(f"Downloading {filename}...")
                 blob.download_to_filename(str(local_file))
@@ -44,6 +137,18 @@ class CloudStorageManager:
             except Exception as e:
                 logger.error(f"❌ Failed to download {filename}: {e}")
                 raise
+        
+        if not (local_path / "scripture_segments.json").exists() and not (local_path / "scripture_metadata.pkl").exists():
+            raise FileNotFoundError("No segment metadata found in bucket (scripture_segments.json or scripture_metadata.pkl)")
+        
+        # Optional prebuilt mode sub-indexes (built on startup if missing)
+        for blob in self.bucket.list_blobs(prefix="indexes/subindexes/"):
+            if blob.name.endswith('/'):
+                continue
+            local_file = local_path / Path(blob.name).relative_to("indexes")
+            local_file.parent.mkdir(parents=True, exist_ok=True)
+            blob.download_to_filename(str(local_file))
+            logger.info(f"✅ Downloaded {local_file.relative_to(local_path)}")
     
     def download_content(self, local_dir: str = "content"):
         """Download content files from Cloud Storage (optional)"""
@@ -75,8 +180,8 @@ class CloudStorageManager:
             logger.error(f"❌ Cannot access bucket {self.bucket_name}: {e}")
             return False
 
-def setup_cloud_storage():
-    """Setup function called on API startup"""
+def setup_cloud_storage(version: Optional[str] = None):
+    """Setup function called on API startup (and before loading a new index version)"""
     bucket_name = os.getenv('BUCKET_NAME')
     if not bucket_name:
         logger.warning("No BUCKET_NAME set, skipping Cloud Storage setup")
@@ -91,7 +196,7 @@ def setup_cloud_storage():
         
         # Download required search indexes
         index_dir = os.getenv('INDEX_DIR', 'indexes')
-        manager.download_indexes(index_dir)
+        manager.download_indexes(index_dir, version)
         
         logger.info("🎉 Cloud Storage setup complete")
         
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Query embedding cache for LDS Scripture Search
+Keeps recently embedded queries in an in-process LRU (size + TTL bounded)
+with an optional SQLite tier that survives restarts, so repeated questions
+skip the OpenAI embeddings round trip
+"""
+
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+import weakref
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 2048            # ~12MB of 1536-dim float32 vectors
+DEFAULT_CACHE_TTL = 7 * 24 * 3600    # Seconds; embeddings only change with the model
+SQLITE_TIMEOUT = 30.0                # Seconds to wait for another process's write lock
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query: collapsed whitespace, case-folded"""
+    return re.sub(r'\s+', ' ', query).strip().casefold()
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU of query embeddings with an optional SQLite tier
+
+    SQLite work never holds the LRU lock: reads from the event loop go
+    through aget(), which runs them on an executor, and writes are handed
+    to a background writer thread, so a slow disk or another worker's
+    write lock only delays the lookups that actually need the disk.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE, ttl_seconds: float = DEFAULT_CACHE_TTL,
+                 path: Optional[str] = None):
+        """
+        Initialize the embedding cache
+
+        Args:
+            max_size: Maximum number of embeddings held in memory
+            ttl_seconds: Age after which an entry is ignored (0 = never expires)
+            path: SQLite file for the persistent tier (None = memory only)
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # SQLite connections and writer threads must not cross fork(): one
+        # of each per process, keyed by pid (see _db and _writer)
+        self._db_lock = threading.Lock()
+        self._connections: Dict[int, sqlite3.Connection] = {}
+        self._writers: Dict[int, ThreadPoolExecutor] = {}
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with self._db_lock:
+                self._db()  # Fail at startup, not on the first lookup, if the file is unusable
+        if hasattr(os, 'register_at_fork'):
+            # A lock held by one of the parent's threads at fork() would stay held in the child
+            cache = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: cache() is not None and cache()._reset_locks())
+
+        logger.info(f"Embedding cache: {max_size} entries, ttl {ttl_seconds}s, "
+                    f"persistent tier {'at ' + path if path else 'disabled'}")
+
+    @classmethod
+    def from_env(cls) -> Optional["EmbeddingCache"]:
+        """
+        Build a cache from EMBEDDING_CACHE_SIZE / EMBEDDING_CACHE_TTL / EMBEDDING_CACHE_PATH
+
+        Returns:
+            The cache, or None if EMBEDDING_CACHE_SIZE is 0
+        """
+        max_size = int(os.getenv("EMBEDDING_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+        if max_size <= 0:
+            return None
+        return cls(
+            max_size=max_size,
+            ttl_seconds=float(os.getenv("EMBEDDING_CACHE_TTL", DEFAULT_CACHE_TTL)),
+            path=os.getenv("EMBEDDING_CACHE_PATH") or None
+        )
+
+    @staticmethod
+    def key(query: str, model: str) -> str:
+        """Cache key for a query under an embedding model"""
+        digest = hashlib.sha256(normalize_query(query).encode('utf-8')).hexdigest()
+        return f"{model}:{digest}"
+
+    def _reset_locks(self):
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created > self.ttl_seconds
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        """
+        This process's connection to the persistent tier (_db_lock held)
+
+        A worker forked from the process that built the cache opens its own
+        connection. The inherited one is kept but never used, since closing
+        it in the child could disturb the parent's locks.
+
+        Returns:
+            The connection, or None without a persistent tier
+        """
+        if not self.path:
+            return None
+        db = self._connections.get(os.getpid())
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT, check_same_thread=False)
+            # WAL lets workers read while another one writes
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, created REAL NOT NULL, embedding BLOB NOT NULL)"
+            )
+            db.commit()
+            self._prune_disk(db)
+            self._connections[os.getpid()] = db
+        return db
+
+    def _prune_disk(self, db: sqlite3.Connection):
+        """Drop expired rows from the persistent tier"""
+        if self.ttl_seconds > 0:
+            db.execute("DELETE FROM embeddings WHERE created < ?", (time.time() - self.ttl_seconds,))
+            db.commit()
+
+    def _remember(self, key: str, created: float, embedding: np.ndarray):
+        """Insert into the in-memory LRU, evicting the oldest entry if full (lock held)"""
+        self._entries[key] = (created, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _writer(self) -> ThreadPoolExecutor:
+        """This process's background thread for persistent-tier writes"""
+        with self._db_lock:
+            writer = self._writers.get(os.getpid())
+            if writer is None:
+                writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache")
+                self._writers[os.getpid()] = writer
+            return writer
+
+    def _get_memory(self, key: str) -> Optional[np.ndarray]:
+        """Look a key up in the in-memory LRU (counts a hit, not a miss)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, embedding = entry
+            if self._expired(created):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def _get_disk(self, key: str) -> Optional[np.ndarray]:
+        """Look a key up in the persistent tier, promoting a hit to memory and counting the outcome"""
+        row = None
+        if self.path:
+            with self._db_lock:
+                row = self._db().execute(
+                    "SELECT created, embedding FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+
+        with self._lock:
+            if row is not None and not self._expired(row[0]):
+                embedding = np.frombuffer(row[1], dtype=np.float32)
+                self._remember(key, row[0], embedding)
+                self.disk_hits += 1
+                return embedding
+            self.misses += 1
+            return None
+
+    def get(self, query: str, model: str) -> Optional[np.ndarray]:
+        """
+        Look up the embedding of a query (blocks on the persistent tier; use aget on the event loop)
+
+        Returns:
+            Read-only float32 vector, or None on a miss
+        """
+        key = self.key(query, model)
+        embedding = self._get_memory(key)
+        if embedding is None:
+            embedding = self._get_disk(key)
+        return embedding
+
+    async def aget(self, query: str, model: str) -> Optional[np.ndarray]:
+        """Non-blocking get(): a memory miss reads the persistent tier on an executor thread"""
+        key = self.key(query, model)
+        embedding = self._get_memory(key)
+        if embedding is not None:
+            return embedding
+        if not self.path:
+            return self._get_disk(key)  # Only counts the miss
+        return await asyncio.get_running_loop().run_in_executor(None, self._get_disk, key)
+
+    def _write_disk(self, key: str, created: float, data: bytes):
+        try:
+            with self._db_lock:
+                db = self._db()
+                db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, created, embedding) VALUES (?, ?, ?)",
+                    (key, created, data)
+                )
+                db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def put(self, query: str, model: str, embedding: np.ndarray):
+        """Store the embedding of a query in memory now and in the persistent tier in the background"""
+        key = self.key(query, model)
+        embedding = np.array(embedding, dtype=np.float32).ravel()
+        embedding.setflags(write=False)  # Shared between requests
+        created = time.time()
+
+        with self._lock:
+            self._remember(key, created, embedding)
+        if self.path:
+            self._writer().submit(self._write_disk, key, created, embedding.tobytes())
+
+    def flush(self):
+        """Wait for pending persistent-tier writes"""
+        if self.path:
+            self._writer().submit(lambda: None).result()
+
+    def _clear_disk(self):
+        with self._db_lock:
+            db = self._db()
+            db.execute("DELETE FROM embeddings")
+            db.commit()
+
+    def clear(self):
+        """Empty every tier and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if self.path:
+            # Queued behind pending writes, so none of them lands afterwards
+            self._writer().submit(self._clear_disk).result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and occupancy (counts the persistent tier's rows, so blocks on it)"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            stats = {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                'persistent': self.path is not None,
+            }
+        if self.path:
+            with self._db_lock:
+                stats['disk_size'] = self._db().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return stats
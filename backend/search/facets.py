@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Source facets for LDS Scripture Search
+The /sources summary (distinct source types, standard works, books,
+speakers and years with segment counts, plus books per standard work and
+years per speaker), computed once from the metadata columns and saved
+next to the index
+"""
+
+import json
+import hashlib
+import logging
+from typing import Dict, Any, Optional
+from pathlib import Path
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FACETS_FILE = "facets.json"
+
+# Summary key -> metadata field
+FACETS = {
+    'source_types': 'source_type',
+    'standard_works': 'standard_work',
+    'books': 'book',
+    'speakers': 'speaker',
+    'years': 'year',
+}
+
+# Summary key -> (outer field, inner field)
+NESTED_FACETS = {
+    'books_by_standard_work': ('standard_work', 'book'),
+    'years_by_speaker': ('speaker', 'year'),
+}
+
+
+def _sort_key(value: Any):
+    # Numbers before strings, each in natural order (mixed types cannot be compared directly)
+    return (isinstance(value, str), value if isinstance(value, (int, float, str)) else str(value))
+
+
+def _counts(column) -> Dict[Any, int]:
+    """Segment count per distinct value, in sorted value order"""
+    counts = np.bincount(column.codes[column.codes >= 0], minlength=len(column.categories))
+    found = {column.categories[code]: int(n) for code, n in enumerate(counts) if n}
+    return {value: found[value] for value in sorted(found, key=_sort_key)}
+
+
+def _nested_counts(outer, inner) -> Dict[str, Dict[str, int]]:
+    """Segment count per (outer value, inner value) pair, both levels sorted"""
+    both = (outer.codes >= 0) & (inner.codes >= 0)
+    pairs, pair_counts = np.unique(outer.codes[both].astype(np.int64) * len(inner.categories) + inner.codes[both],
+                                   return_counts=True)
+
+    grouped: Dict[Any, Dict[Any, int]] = {}
+    for pair, n in zip(pairs.tolist(), pair_counts.tolist()):
+        outer_code, inner_code = divmod(pair, len(inner.categories))
+        grouped.setdefault(outer.categories[outer_code], {})[inner.categories[inner_code]] = n
+
+    return {
+        str(value): {str(inner_value): grouped[value][inner_value]
+                     for inner_value in sorted(grouped[value], key=_sort_key)}
+        for value in sorted(grouped, key=_sort_key)
+    }
+
+
+def compute_facets(columns) -> Dict[str, Any]:
+    """
+    Compute the source summary served by /sources
+
+    Args:
+        columns: MetadataColumns over the segment metadata
+
+    Returns:
+        JSON-ready dict: a sorted value list per facet (source_types,
+        standard_works, books, speakers, years), total_segments, 'counts'
+        (segments per value) and 'nested' (books_by_standard_work,
+        years_by_speaker); count keys are strings
+    """
+    facets: Dict[str, Any] = {}
+    counts: Dict[str, Dict[str, int]] = {}
+    for key, field in FACETS.items():
+        field_counts = _counts(columns.column(field))
+        facets[key] = list(field_counts)
+        counts[key] = {str(value): n for value, n in field_counts.items()}
+
+    nested: Dict[str, Dict[str, Dict[str, int]]] = {}
+    for key, (outer_field, inner_field) in NESTED_FACETS.items():
+        nested[key] = _nested_counts(columns.column(outer_field), columns.column(inner_field))
+
+    facets['total_segments'] = columns.size
+    facets['counts'] = counts
+    facets['nested'] = nested
+    logger.info(f"Computed source facets for {columns.size} segments")
+    return facets
+
+
+def facets_etag(facets: Dict[str, Any]) -> str:
+    """Strong ETag for a facet summary (changes only when its content does)"""
+    body = json.dumps(facets, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+
+def save_facets(index_dir: str, facets: Dict[str, Any]):
+    """Write the facet summary next to the FAISS files"""
+    with open(Path(index_dir) / FACETS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(facets, f, ensure_ascii=False, indent=2)
+
+
+def load_facets(index_dir: str, total_segments: int) -> Optional[Dict[str, Any]]:
+    """Read a saved facet summary, None if absent or built for a different index"""
+    path = Path(index_dir) / FACETS_FILE
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        facets = json.load(f)
+    if facets.get('total_segments') != total_segments:
+        logger.warning(f"Ignoring {FACETS_FILE}: built for {facets.get('total_segments')} segments, index has {total_segments}")
+        return None
+    return facets
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, as for GET)"""
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(',')]
+    return '*' in candidates or etag in (tag[2:] if tag.startswith('W/') else tag for tag in candidates)
@@ -10,14 +10,40 @@ Quality: Excellent with Chirp 3 HD voices
 
 import os
 import re
+import time
+import random
 import logging
 import base64
 import hashlib
-from typing import Optional, Dict
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, List, Tuple, NamedTuple
 from google.cloud import texttospeech
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable, DeadlineExceeded
 
 logger = logging.getLogger(__name__)
 
+# synthesize_speech calls in flight across all requests (shared thread pool)
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", 16))
+
+# synthesize_speech calls in flight for a single request, so one long podcast
+# cannot take the whole pool
+TTS_REQUEST_CONCURRENCY = int(os.getenv("TTS_REQUEST_CONCURRENCY", 6))
+
+# Retries per call for quota (429) and transient availability errors
+TTS_MAX_RETRIES = 4
+TTS_RETRY_BASE_DELAY = 0.5     # seconds, doubled per attempt
+TTS_QUOTA_BASE_DELAY = 2.0     # seconds; per-minute quotas need a longer pause
+
+RETRYABLE_ERRORS = (ResourceExhausted, ServiceUnavailable, DeadlineExceeded)
+
+
+class SegmentAudio(NamedTuple):
+    """Result of GoogleCloudTTS.generate_audio_segments"""
+    audio: List[Optional[bytes]]    # MP3 per segment in request order, None where it failed
+    cache_hits: int                 # chunks served from the segment cache
+    cache_misses: int               # chunks synthesized
+
 # Import audio cache manager (will be initialized in factory function)
 try:
     from .audio_cache import AudioCacheManager
@@ -128,6 +154,10 @@ class GoogleCloudTTS:
             self.client = texttospeech.TextToSpeechClient()
             self.default_voice = "cfm_male"
             self.cache_manager = cache_manager
+            self.executor = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix="tts")
+            # Set when the quota is exhausted: every worker holds off until then
+            self._quota_lock = threading.Lock()
+            self._quota_until = 0.0
             
             if self.cache_manager:
                 logger.info("✅ Google Cloud TTS client initialized with caching enabled")
@@ -201,6 +231,162 @@ class GoogleCloudTTS:
         logger.info(f"Split text into {len(chunks)} chunks for Google Cloud TTS")
         return chunks
     
+    def _synthesize_chunk(
+        self,
+        text: str,
+        language_code: str,
+        voice_name: str,
+        speaking_rate: float,
+        pitch: float
+    ) -> bytes:
+        """
+        Synthesize one chunk, retrying quota and availability errors with
+        exponential backoff and jitter
+
+        A quota error also pauses every other call on this client until the
+        backoff has passed, instead of letting them all hit the quota again.
+        """
+        synthesis_input = texttospeech.SynthesisInput(text=text)
+        voice_config = texttospeech.VoiceSelectionParams(
+            language_code=language_code,
+            name=voice_name
+        )
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.MP3,
+            speaking_rate=speaking_rate,
+            pitch=pitch
+        )
+
+        for attempt in range(TTS_MAX_RETRIES + 1):
+            wait_sec = self._quota_until - time.time()
+            if wait_sec > 0:
+                time.sleep(wait_sec)
+
+            try:
+                response = self.client.synthesize_speech(
+                    input=synthesis_input,
+                    voice=voice_config,
+                    audio_config=audio_config
+                )
+                return response.audio_content
+            except RETRYABLE_ERRORS as e:
+                if attempt == TTS_MAX_RETRIES:
+                    raise
+                base_delay = TTS_QUOTA_BASE_DELAY if isinstance(e, ResourceExhausted) else TTS_RETRY_BASE_DELAY
+                delay = base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+                if isinstance(e, ResourceExhausted):
+                    with self._quota_lock:
+                        self._quota_until = max(self._quota_until, time.time() + delay)
+                logger.warning(f"⏳ TTS {type(e).__name__}, retry {attempt + 1}/{TTS_MAX_RETRIES} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _render_chunk(
+        self,
+        text: str,
+        language_code: str,
+        voice_name: str,
+        speaking_rate: float,
+        pitch: float
+    ) -> Tuple[bytes, bool]:
+        """
+        Audio for one chunk: from the segment cache when enabled, otherwise
+        synthesized (and uploaded to the cache in the background)
+
+        Returns:
+            Tuple of (MP3 bytes, whether it came from the cache)
+        """
+        if not self.cache_manager:
+            return self._synthesize_chunk(text, language_code, voice_name, speaking_rate, pitch), False
+
+        cache_key = self.cache_manager.segment_cache_key(text, voice_name, speaking_rate, pitch)
+        cached = self.cache_manager.get_segment(cache_key)
+        if cached:
+            return cached, True
+
+        audio = self._synthesize_chunk(text, language_code, voice_name, speaking_rate, pitch)
+        self.executor.submit(self.cache_manager.put_segment, cache_key, audio)
+        return audio, False
+
+    def _render_ordered(self, jobs: List[Tuple], max_concurrency: int) -> List[Optional[Tuple[bytes, bool]]]:
+        """
+        Run _render_chunk for each job on the shared pool, at most
+        max_concurrency at a time
+
+        Returns:
+            _render_chunk result per job in job order, None where a job failed
+        """
+        results: List[Optional[Tuple[bytes, bool]]] = [None] * len(jobs)
+        pending = {}
+        queue = iter(enumerate(jobs))
+
+        def submit_next():
+            for i, job in queue:
+                pending[self.executor.submit(self._render_chunk, *job)] = i
+                return
+
+        for _ in range(max(1, max_concurrency)):
+            submit_next()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to generate audio for chunk {i + 1}/{len(jobs)}: {e}")
+                submit_next()
+
+        return results
+
+    def generate_audio_segments(
+        self,
+        segments: List[Tuple[str, Optional[str]]],
+        speaking_rate: float = 1.0,
+        pitch: float = 0.0,
+        max_concurrency: int = TTS_REQUEST_CONCURRENCY
+    ) -> SegmentAudio:
+        """
+        Generate audio for several texts at once, e.g. the lines of a podcast script
+
+        Every chunk of every segment is looked up in the segment cache or
+        synthesized concurrently (up to max_concurrency calls at a time),
+        then reassembled in order.
+
+        Args:
+            segments: (text, voice) pairs
+            speaking_rate: Speed of speech (0.25 to 4.0, default 1.0)
+            pitch: Voice pitch adjustment (-20.0 to 20.0, default 0.0)
+            max_concurrency: Calls in flight for this request
+
+        Returns:
+            SegmentAudio with MP3 bytes per segment in the given order (None
+            for a segment that failed) and the chunk cache hit/miss counts
+        """
+        start = time.time()
+        jobs = []
+        owners = []     # segment index per job
+        for i, (text, voice) in enumerate(segments):
+            language_code, voice_name = self.get_voice_config(voice)
+            for chunk in self.chunk_text_smartly(clean_text_for_tts(text)):
+                jobs.append((chunk, language_code, voice_name, speaking_rate, pitch))
+                owners.append(i)
+
+        rendered = self._render_ordered(jobs, max_concurrency)
+
+        parts: List[List[Optional[bytes]]] = [[] for _ in segments]
+        for i, result in zip(owners, rendered):
+            parts[i].append(result[0] if result else None)
+        # MP3 frames can simply be concatenated; a segment with any failed chunk fails
+        audio_segments = [b''.join(chunks) if chunks and all(chunks) else None for chunks in parts]
+
+        cache_hits = sum(1 for result in rendered if result and result[1])
+        cache_misses = sum(1 for result in rendered if result and not result[1])
+        failed = sum(audio is None for audio in audio_segments)
+        logger.info(f"✅ Generated {len(segments) - failed}/{len(segments)} segments in {time.time() - start:.2f}s "
+                    f"({cache_hits} cached, {cache_misses} synthesized)")
+        return SegmentAudio(audio_segments, cache_hits, cache_misses)
+
     def generate_audio(
         self,
         text: str,
@@ -221,56 +407,9 @@ class GoogleCloudTTS:
             Audio bytes in MP3 format or None if failed
         """
         try:
-            # Clean text before processing
-            text = clean_text_for_tts(text)
-            
-            language_code, voice_name = self.get_voice_config(voice)
-            
-            # Handle text chunking for long content
-            chunks = self.chunk_text_smartly(text)
-            audio_segments = []
-            
-            for i, chunk in enumerate(chunks):
-                logger.info(f"Generating audio for chunk {i+1}/{len(chunks)} ({len(chunk)} chars)")
-                
-                try:
-                    # Set up synthesis input
-                    synthesis_input = texttospeech.SynthesisInput(text=chunk)
-                    
-                    # Configure voice
-                    voice_config = texttospeech.VoiceSelectionParams(
-                        language_code=language_code,
-                        name=voice_name
-                    )
-                    
-                    # Configure audio output
-                    audio_config = texttospeech.AudioConfig(
-                        audio_encoding=texttospeech.AudioEncoding.MP3,
-                        speaking_rate=speaking_rate,
-                        pitch=pitch
-                    )
-                    
-                    # Generate speech
-                    response = self.client.synthesize_speech(
-                        input=synthesis_input,
-                        voice=voice_config,
-                        audio_config=audio_config
-                    )
-                    
-                    audio_segments.append(response.audio_content)
-                    
-                except Exception as e:
-                    logger.error(f"Failed to generate audio for chunk {i+1}: {e}")
-                    return None
-            
-            # Combine audio segments
-            if len(audio_segments) == 1:
-                combined_audio = audio_segments[0]
-            else:
-                # Simple concatenation for MP3 segments
-                combined_audio = b''.join(audio_segments)
-            
-            logger.info(f"✅ Successfully generated {len(combined_audio)} bytes of audio")
+            combined_audio = self.generate_audio_segments([(text, voice)], speaking_rate, pitch).audio[0]
+            if combined_audio:
+                logger.info(f"✅ Successfully generated {len(combined_audio)} bytes of audio")
             return combined_audio
             
         except Exception as e:
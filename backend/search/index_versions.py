@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Versioned index directories for LDS Scripture Search
+An index root holds one directory per build under versions/, each with a
+manifest.json of file sizes and SHA-256 checksums, and a CURRENT file
+naming the version to serve. Publishing a build only rewrites CURRENT, so a
+running service can verify and load the new version while still serving
+the old one.
+
+    indexes/
+        CURRENT                  -> "20250101-120000"
+        versions/20250101-120000/
+            manifest.json
+            config.json, scripture_index.faiss, ...
+
+A root without CURRENT is an unversioned index directory and is used as is.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+MANIFEST_FILE = "manifest.json"
+
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class IndexVersionError(Exception):
+    """A version is missing, incomplete or fails its checksums"""
+
+
+def new_version_name() -> str:
+    """Sortable version name for a build started now"""
+    return time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+
+
+def version_dir(root: str, version: str) -> Path:
+    """Directory of one version under an index root"""
+    return Path(root) / VERSIONS_DIR / version
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(index_dir: str, version: str) -> Dict[str, Any]:
+    """Record the size and checksum of every file in a built index directory"""
+    index_dir = Path(index_dir)
+    files = {}
+    for path in sorted(p for p in index_dir.rglob('*') if p.is_file() and p.name != MANIFEST_FILE):
+        files[path.relative_to(index_dir).as_posix()] = {'size': path.stat().st_size, 'sha256': _sha256(path)}
+
+    manifest = {'version': version, 'created': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), 'files': files}
+    with open(index_dir / MANIFEST_FILE, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Wrote manifest for version {version} ({len(files)} files)")
+    return manifest
+
+
+def verify_manifest(index_dir: str, checksums: bool = True) -> Dict[str, Any]:
+    """
+    Check an index directory against its manifest
+
+    Args:
+        index_dir: Version directory
+        checksums: Also compare SHA-256 checksums, not just sizes
+
+    Returns:
+        The manifest
+
+    Raises:
+        IndexVersionError: If the manifest is missing or a file is missing or differs
+    """
+    index_dir = Path(index_dir)
+    manifest_path = index_dir / MANIFEST_FILE
+    if not manifest_path.exists():
+        raise IndexVersionError(f"No {MANIFEST_FILE} in {index_dir}")
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+
+    for name, expected in manifest['files'].items():
+        path = index_dir / name
+        if not path.exists():
+            raise IndexVersionError(f"Version {manifest['version']}: {name} is missing")
+        if path.stat().st_size != expected['size']:
+            raise IndexVersionError(f"Version {manifest['version']}: {name} has the wrong size")
+        if checksums and _sha256(path) != expected['sha256']:
+            raise IndexVersionError(f"Version {manifest['version']}: {name} fails its checksum")
+    return manifest
+
+
+def read_current(root: str) -> Optional[str]:
+    """Version named by CURRENT, None for an unversioned root"""
+    path = Path(root) / CURRENT_FILE
+    if not path.exists():
+        return None
+    return path.read_text().strip() or None
+
+
+def set_current(root: str, version: str):
+    """Point CURRENT at a version (atomic: readers see the old or the new name, never a partial one)"""
+    if not version_dir(root, version).is_dir():
+        raise IndexVersionError(f"Version {version} does not exist under {root}")
+    tmp_path = Path(root) / f".{CURRENT_FILE}.{os.getpid()}.tmp"
+    tmp_path.write_text(version + "\n")
+    os.replace(tmp_path, Path(root) / CURRENT_FILE)
+    logger.info(f"CURRENT -> {version}")
+
+
+def resolve_index_dir(root: str, version: Optional[str] = None) -> Tuple[Path, Optional[str]]:
+    """
+    Directory to load for an index root
+
+    Args:
+        root: Index root (INDEX_DIR)
+        version: Specific version, defaults to CURRENT
+
+    Returns:
+        Tuple of (directory, version); version is None for an unversioned root
+    """
+    version = version or read_current(root)
+    if version is None:
+        return Path(root), None
+    path = version_dir(root, version)
+    if not path.is_dir():
+        raise IndexVersionError(f"Version {version} does not exist under {root}")
+    return path, version
+
+
+def list_versions(root: str) -> List[str]:
+    """Versions present under an index root, oldest first"""
+    versions_path = Path(root) / VERSIONS_DIR
+    if not versions_path.is_dir():
+        return []
+    return sorted(p.name for p in versions_path.iterdir() if p.is_dir() and not p.name.startswith('.'))
+
+
+def prune_versions(root: str, keep: Iterable[Optional[str]]) -> List[str]:
+    """
+    Delete every version under an index root except the ones to keep
+
+    The version CURRENT names is always kept, as are scratch directories of
+    downloads in progress. An engine still serving a deleted version is not
+    affected: its files are already open or memory-mapped, and their space
+    is released once it lets go of them.
+
+    Args:
+        root: Index root
+        keep: Versions to keep (None entries are ignored)
+
+    Returns:
+        The versions deleted
+    """
+    keep = {version for version in keep if version} | {read_current(root)}
+    removed = [version for version in list_versions(root) if version not in keep]
+    for version in removed:
+        shutil.rmtree(version_dir(root, version), ignore_errors=True)
+    if removed:
+        logger.info(f"Pruned index versions {', '.join(removed)}")
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and publish versioned index directories')
+    parser.add_argument('--root', default='./indexes', help='Index root containing versions/ and CURRENT')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='List versions and the current one')
+    verify = subparsers.add_parser('verify', help='Verify a version against its manifest')
+    verify.add_argument('version', nargs='?', help='Version (default: CURRENT)')
+    publish = subparsers.add_parser('publish', help='Verify a version and point CURRENT at it')
+    publish.add_argument('version')
+
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        current = read_current(args.root)
+        for version in list_versions(args.root):
+            print(f"{'*' if version == current else ' '} {version}")
+    elif args.command == 'verify':
+        index_dir, version = resolve_index_dir(args.root, args.version)
+        manifest = verify_manifest(index_dir)
+        print(f"Version {version}: {len(manifest['files'])} files OK")
+    elif args.command == 'publish':
+        verify_manifest(version_dir(args.root, args.version))
+        set_current(args.root, args.version)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+BM25 lexical index for LDS Scripture Search
+An inverted index over segment content, stored as CSR postings arrays next
+to the FAISS files. Catches exact phrases and rare names that embeddings
+rank poorly, and answers lexical-only queries without any network call.
+"""
+
+import re
+import json
+import logging
+import argparse
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from collections import Counter
+from pathlib import Path
+import numpy as np
+
+try:
+    from .segment_store import SegmentStore
+except ImportError:  # Running as a standalone script
+    from segment_store import SegmentStore
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+LEXICAL_SPEC_FILE = "lexical_index.json"
+POSTINGS_OFFSETS_FILE = "lexical_offsets.npy"
+POSTINGS_DOCS_FILE = "lexical_docs.npy"
+POSTINGS_TF_FILE = "lexical_tf.npy"
+DOC_LENGTHS_FILE = "lexical_doc_lengths.npy"
+
+# Standard BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens (apostrophes split words: nephi's -> nephi, s)"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class LexicalIndex:
+    """Okapi BM25 over an inverted index held as CSR arrays"""
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray,
+                 doc_lengths: np.ndarray, k1: float = BM25_K1, b: float = BM25_B):
+        """
+        Args:
+            terms: Vocabulary; term i's postings are docs[offsets[i]:offsets[i + 1]]
+            offsets: int64 array of len(terms) + 1 postings offsets
+            docs: int32 segment ids, ascending within each term
+            tfs: Term frequency of each posting
+            doc_lengths: Token count of each segment
+        """
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.num_docs = len(doc_lengths)
+        self.k1 = k1
+        self.b = b
+
+        avgdl = float(doc_lengths.mean()) if self.num_docs else 0.0
+        # Per-document part of the BM25 denominator, computed once
+        self._length_norm = (k1 * (1 - b + b * doc_lengths / avgdl)).astype(np.float32) if avgdl else \
+            np.full(self.num_docs, k1, dtype=np.float32)
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "LexicalIndex":
+        """Tokenize every segment and build the postings"""
+        term_ids: Dict[str, int] = {}
+        posting_terms, posting_docs, posting_tfs, doc_lengths = [], [], [], []
+
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text or '')
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                posting_terms.append(term_ids.setdefault(term, len(term_ids)))
+                posting_docs.append(doc)
+                posting_tfs.append(tf)
+
+        terms = list(term_ids)
+        posting_terms = np.array(posting_terms, dtype=np.int64)
+        # Stable sort keeps each term's documents in ascending order
+        order = np.argsort(posting_terms, kind='stable')
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(posting_terms, minlength=len(terms)), out=offsets[1:])
+
+        index = cls(
+            terms,
+            offsets,
+            np.array(posting_docs, dtype=np.int32)[order],
+            np.minimum(np.array(posting_tfs, dtype=np.int64), np.iinfo(np.uint16).max).astype(np.uint16)[order],
+            np.array(doc_lengths, dtype=np.int32)
+        )
+        logger.info(f"Built BM25 index: {index.num_docs} segments, {len(terms)} terms, {len(index.docs)} postings")
+        return index
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        """Check whether an index directory has a saved lexical index"""
+        index_dir = Path(index_dir)
+        return all((index_dir / name).exists() for name in
+                   (LEXICAL_SPEC_FILE, POSTINGS_OFFSETS_FILE, POSTINGS_DOCS_FILE, POSTINGS_TF_FILE, DOC_LENGTHS_FILE))
+
+    def save(self, index_dir: str):
+        """Write the index next to the FAISS files"""
+        index_dir = Path(index_dir)
+        np.save(index_dir / POSTINGS_OFFSETS_FILE, self.offsets)
+        np.save(index_dir / POSTINGS_DOCS_FILE, self.docs)
+        np.save(index_dir / POSTINGS_TF_FILE, self.tfs)
+        np.save(index_dir / DOC_LENGTHS_FILE, self.doc_lengths)
+        with open(index_dir / LEXICAL_SPEC_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'k1': self.k1, 'b': self.b, 'terms': list(self.term_ids)}, f, ensure_ascii=False)
+        logger.info(f"BM25 index saved to {index_dir}")
+
+    @classmethod
+    def load(cls, index_dir: str, mmap_files: bool = True) -> "LexicalIndex":
+        """Open a saved index, memory-mapping the postings"""
+        index_dir = Path(index_dir)
+        mmap_mode = 'r' if mmap_files else None
+        with open(index_dir / LEXICAL_SPEC_FILE, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+
+        index = cls(
+            spec['terms'],
+            np.load(index_dir / POSTINGS_OFFSETS_FILE, mmap_mode=mmap_mode),
+            np.load(index_dir / POSTINGS_DOCS_FILE, mmap_mode=mmap_mode),
+            np.load(index_dir / POSTINGS_TF_FILE, mmap_mode=mmap_mode),
+            np.load(index_dir / DOC_LENGTHS_FILE),
+            k1=spec['k1'],
+            b=spec['b']
+        )
+        logger.info(f"Loaded BM25 index: {index.num_docs} segments, {len(index.term_ids)} terms")
+        return index
+
+    def score(self, query: str) -> Optional[np.ndarray]:
+        """
+        BM25 score of every segment for a query
+
+        Returns:
+            float32 array with one score per segment, or None if no query term is indexed
+        """
+        query_terms = Counter(t for t in tokenize(query) if t in self.term_ids)
+        if not query_terms:
+            return None
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term, count in query_terms.items():
+            term_id = self.term_ids[term]
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.docs[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+
+            df = end - start
+            idf = np.log1p((self.num_docs - df + 0.5) / (df + 0.5))
+            # Each document appears once per term, so plain fancy-index add is safe
+            scores[docs] += count * idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs])
+        return scores
+
+    def search(self, query: str, top_k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k segments for a query
+
+        Args:
+            query: Free text
+            top_k: Number of hits
+            mask: Optional boolean array restricting the candidate segments
+
+        Returns:
+            Tuple of (scores, indices), best first; only segments containing a query term
+        """
+        scores = self.score(query) if top_k > 0 else None
+        if scores is None:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        if mask is not None:
+            scores[~mask] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        order = np.argsort(-scores[candidates], kind='stable')
+        indices = candidates[order]
+        return scores[indices], indices.astype(np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the BM25 lexical index for an existing index directory')
+    parser.add_argument('--index-dir', default='./indexes',
+                        help='Directory containing the segment store')
+
+    args = parser.parse_args()
+
+    store = SegmentStore(args.index_dir)
+    LexicalIndex.build(store.content(i) for i in range(len(store))).save(args.index_dir)
+
+
+if __name__ == "__main__":
+    main()
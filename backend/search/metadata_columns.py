@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Columnar view over scripture segment metadata
+Stores each filterable field as categorical codes so source filters
+can be evaluated as vectorized NumPy masks instead of per-dict loops
+
+Source filter language (all clauses are ANDed):
+    {"book": "nephi"}                        substring match (case-insensitive)
+    {"speaker": ["Russell M. Nelson", ...]}  value is one of the list
+    {"min_year": 1971, "max_year": 2000}     inclusive numeric range
+    {"year": {"min": 2015, "max": 2020}}     same, operator form
+    {"book": {"eq": "Alma"}}                 exact match (case-insensitive)
+    {"book": {"contains": "nephi"}}          substring match
+    {"speaker": {"in": [...]}}               exact match against any value
+    {"book": {"not_in": [...]}}              none of the values (missing passes)
+"""
+
+import logging
+import math
+from typing import List, Dict, Any, Sequence, Tuple, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Fields encoded eagerly at load time - any other field is encoded on first use
+FACET_FIELDS = (
+    'source_type',
+    'standard_work',
+    'book',
+    'chapter',
+    'verse',
+    'speaker',
+    'title',
+    'year',
+    'session',
+    'paragraph',
+    'lesson_title',
+    'filename',
+)
+
+
+def _hashable(value: Any) -> Any:
+    """Convert list values (e.g. mode_tags) into something usable as a dict key"""
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
+
+
+def encode_values(values: Sequence[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """Intern a field's values into int32 codes (-1 = None) and a list of distinct values"""
+    codes = np.full(len(values), -1, dtype=np.int32)
+    categories: List[Any] = []
+    lookup: Dict[Any, int] = {}
+
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+
+        key = (type(value), _hashable(value))
+        code = lookup.get(key)
+        if code is None:
+            code = len(categories)
+            lookup[key] = code
+            categories.append(value)
+        codes[i] = code
+
+    return codes, categories
+
+
+# Key prefixes that turn a field into a range bound, e.g. min_year
+RANGE_PREFIXES = {'min_': 'min', 'max_': 'max'}
+
+# Operators accepted in the {"field": {"op": operand}} form
+FILTER_OPERATORS = ('eq', 'contains', 'in', 'not_in', 'min', 'max')
+
+
+def _to_number(value: Any) -> float:
+    """Numeric value of a metadata value, NaN if it has none"""
+    if isinstance(value, bool):
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return math.nan
+    return math.nan
+
+
+def value_equals(meta_value: Any, value: Any) -> bool:
+    """Exact match, case-insensitive when the filter value is a string"""
+    if isinstance(value, str):
+        return str(meta_value).lower() == value.lower()
+    return meta_value == value
+
+
+def parse_filter(source_filter: Dict[str, Any]) -> List[Tuple[str, str, Any]]:
+    """
+    Parse a source filter into (field, operator, operand) clauses
+
+    Plain values use the 'match' operator (see value_matches).
+
+    Raises:
+        ValueError: If an operator or operand is not valid
+    """
+    clauses = []
+
+    for key, value in source_filter.items():
+        for prefix, op in RANGE_PREFIXES.items():
+            if key.startswith(prefix) and len(key) > len(prefix):
+                clauses.append((key[len(prefix):], op, value))
+                break
+        else:
+            if isinstance(value, dict):
+                if not value:
+                    raise ValueError(f"Empty operator dict for filter field '{key}'")
+                for op, operand in value.items():
+                    if op not in FILTER_OPERATORS:
+                        raise ValueError(f"Unknown filter operator '{op}' for field '{key}'")
+                    clauses.append((key, op, operand))
+            else:
+                clauses.append((key, 'match', value))
+
+    for field, op, operand in clauses:
+        if op in ('min', 'max') and math.isnan(_to_number(operand)):
+            raise ValueError(f"'{op}' bound for '{field}' must be numeric, got {operand!r}")
+        if op in ('in', 'not_in') and not isinstance(operand, list):
+            raise ValueError(f"'{op}' operand for '{field}' must be a list")
+
+    return clauses
+
+
+def value_matches(meta_value: Any, value: Any) -> bool:
+    """
+    Compare a single metadata value against a filter value
+
+    Mirrors the original per-segment matching rules:
+        - list filter: metadata value must be one of the listed values
+        - string filter: case-insensitive substring for string metadata,
+          case-insensitive equality against str() of anything else
+        - everything else: plain equality
+    """
+    if isinstance(value, list):
+        return meta_value in value
+    if isinstance(value, str):
+        if isinstance(meta_value, str):
+            return value.lower() in meta_value.lower()
+        return str(meta_value).lower() == value.lower()
+    return meta_value == value
+
+
+class CategoricalColumn:
+    """One metadata field stored as int32 codes into a list of distinct values"""
+
+    __slots__ = ('codes', 'categories')
+
+    def __init__(self, codes: np.ndarray, categories: List[Any]):
+        self.codes = codes            # -1 marks a missing value
+        self.categories = categories  # Distinct non-null values, indexed by code
+
+    def lookup_table(self, matching_codes: Sequence[int]) -> np.ndarray:
+        """
+        Boolean table indexed by code; the extra trailing slot is the
+        target of code -1 so missing values never match
+        """
+        table = np.zeros(len(self.categories) + 1, dtype=bool)
+        table[list(matching_codes)] = True
+        return table
+
+    def mask(self, predicate) -> np.ndarray:
+        """Evaluate predicate once per distinct value and broadcast it to every row"""
+        matching = [code for code, category in enumerate(self.categories) if predicate(category)]
+        return self.lookup_table(matching)[self.codes]
+
+
+class MetadataColumns:
+    def __init__(self, metadata: Sequence[Dict[str, Any]], fields: Tuple[str, ...] = FACET_FIELDS,
+                 columns: Optional[Dict[str, CategoricalColumn]] = None):
+        """
+        Build a columnar representation of segment metadata
+
+        Args:
+            metadata: Sequence of per-segment metadata dicts (index order)
+            fields: Fields to encode eagerly; others are encoded lazily
+            columns: Already-encoded columns, skips the eager pass
+        """
+        self._metadata = metadata
+        self.size = len(metadata)
+        self._columns: Dict[str, CategoricalColumn] = {}
+        self._numeric: Dict[str, np.ndarray] = {}
+
+        if columns is not None:
+            self._columns.update(columns)
+            return
+
+        for field in fields:
+            self._columns[field] = self._build_column(field)
+
+        logger.info(f"Built columnar metadata for {self.size} segments ({len(self._columns)} fields)")
+
+    def _build_column(self, field: str) -> CategoricalColumn:
+        """Encode one metadata field as categorical codes"""
+        # Stores that already hold interned columns (SegmentStore) hand them over directly
+        if hasattr(self._metadata, 'column'):
+            column = self._metadata.column(field)
+            if column is not None:
+                return column
+
+        codes, categories = encode_values([meta.get(field) for meta in self._metadata])
+        return CategoricalColumn(codes, categories)
+
+    def column(self, field: str) -> CategoricalColumn:
+        """Get the column for a field, encoding it on first use"""
+        column = self._columns.get(field)
+        if column is None:
+            column = self._build_column(field)
+            self._columns[field] = column
+        return column
+
+    def numeric(self, field: str) -> np.ndarray:
+        """Get a field as a float64 array (NaN where missing or non-numeric)"""
+        values = self._numeric.get(field)
+        if values is None:
+            column = self.column(field)
+            # Convert each distinct value once; the trailing NaN is the target of code -1
+            category_values = np.array([_to_number(c) for c in column.categories] + [math.nan], dtype=np.float64)
+            values = category_values[column.codes]
+            self._numeric[field] = values
+        return values
+
+    def _clause_mask(self, field: str, op: str, operand: Any) -> np.ndarray:
+        """Evaluate one parsed clause as a boolean mask"""
+        if op == 'min':
+            return self.numeric(field) >= _to_number(operand)
+        if op == 'max':
+            return self.numeric(field) <= _to_number(operand)
+
+        column = self.column(field)
+        if op == 'match':
+            return column.mask(lambda category: value_matches(category, operand))
+        if op == 'eq':
+            return column.mask(lambda category: value_equals(category, operand))
+        if op == 'contains':
+            needle = str(operand).lower()
+            return column.mask(lambda category: needle in str(category).lower())
+        if op == 'in':
+            return column.mask(lambda category: any(value_equals(category, v) for v in operand))
+        if op == 'not_in':
+            return ~column.mask(lambda category: any(value_equals(category, v) for v in operand))
+
+        raise ValueError(f"Unknown filter operator '{op}'")
+
+    def mask(self, source_filter: Dict[str, Any]) -> np.ndarray:
+        """
+        Evaluate a source filter as a boolean mask over all segments
+
+        Args:
+            source_filter: Filter in the language described in the module docstring
+
+        Returns:
+            Boolean array with one entry per segment
+        """
+        mask = np.ones(self.size, dtype=bool)
+
+        for field, op, operand in parse_filter(source_filter):
+            mask &= self._clause_mask(field, op, operand)
+
+        return mask
+
+    def filter_indices(self, source_filter: Dict[str, Any]) -> np.ndarray:
+        """Get the segment indices matching a source filter"""
+        return np.flatnonzero(self.mask(source_filter))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Neighbour links between segments for LDS Scripture Search
+Links each verse to the previous/next verse of its chapter and each
+conference paragraph to the previous/next paragraph of its talk, so search
+hits can be expanded into merged passages without extra searches
+"""
+
+import logging
+from typing import List, Tuple
+from pathlib import Path
+import numpy as np
+
+try:
+    from .references import CITATION_PATTERN
+except ImportError:  # Running as a standalone script
+    from references import CITATION_PATTERN
+
+logger = logging.getLogger(__name__)
+
+NEIGHBORS_FILE = "scripture_neighbors.npy"
+
+PREV, NEXT = 0, 1  # Rows of the (2, n) neighbour array; -1 marks no neighbour
+
+
+def _link(neighbors: np.ndarray, keys: List[np.ndarray], order: np.ndarray, eligible: np.ndarray):
+    """Link consecutive segments (by order) that share every group key"""
+    ids = np.flatnonzero(eligible)
+    if len(ids) < 2:
+        return
+
+    # np.lexsort sorts by its last key first: group keys, then order within the group
+    ids = ids[np.lexsort([order[ids]] + [key[ids] for key in reversed(keys)])]
+    same = np.ones(len(ids) - 1, dtype=bool)
+    for key in keys:
+        same &= key[ids[1:]] == key[ids[:-1]]
+
+    neighbors[NEXT, ids[:-1][same]] = ids[1:][same]
+    neighbors[PREV, ids[1:][same]] = ids[:-1][same]
+
+
+def _chapters(columns) -> np.ndarray:
+    """Chapter numbers, taken from the citation where the chapter field is missing (old D&C segments)"""
+    chapters = columns.numeric('chapter').copy()
+    citations = columns.column('citation')
+    parsed = []
+    for citation in citations.categories:
+        found = CITATION_PATTERN.search(str(citation))
+        parsed.append(float(found.group(1)) if found else np.nan)
+    from_citation = np.array(parsed + [np.nan], dtype=np.float64)[citations.codes]
+
+    missing = np.isnan(chapters)
+    chapters[missing] = from_citation[missing]
+    return chapters
+
+
+def compute_neighbors(columns) -> np.ndarray:
+    """
+    Compute previous/next links from segment metadata
+
+    Args:
+        columns: MetadataColumns over the segment metadata
+
+    Returns:
+        int32 array of shape (2, n): row PREV and row NEXT hold segment ids, -1 for none
+    """
+    neighbors = np.full((2, columns.size), -1, dtype=np.int32)
+
+    # Verses: same book and chapter, ordered by verse
+    books = columns.column('book').codes
+    chapters = _chapters(columns)
+    verses = columns.numeric('verse')
+    _link(neighbors, [books, chapters], verses, (books >= 0) & ~np.isnan(chapters) & ~np.isnan(verses))
+
+    # Conference paragraphs: same talk, ordered by paragraph
+    talk_keys = [columns.column(field).codes for field in ('speaker', 'title', 'year', 'session')]
+    paragraphs = columns.numeric('paragraph')
+    _link(neighbors, talk_keys, paragraphs, (talk_keys[0] >= 0) & (talk_keys[1] >= 0) & ~np.isnan(paragraphs))
+
+    linked = int(np.count_nonzero(neighbors[NEXT] >= 0))
+    logger.info(f"Computed neighbour links for {columns.size} segments ({linked} links)")
+    return neighbors
+
+
+def save_neighbors(index_dir: str, neighbors: np.ndarray):
+    """Write the neighbour links next to the FAISS files"""
+    np.save(Path(index_dir) / NEIGHBORS_FILE, neighbors)
+
+
+def load_neighbors(index_dir: str, mmap_files: bool = True) -> np.ndarray:
+    """Read saved neighbour links"""
+    return np.load(Path(index_dir) / NEIGHBORS_FILE, mmap_mode='r' if mmap_files else None)
+
+
+def neighbors_exist(index_dir: str) -> bool:
+    """Check whether an index directory has saved neighbour links"""
+    return (Path(index_dir) / NEIGHBORS_FILE).exists()
+
+
+def _window(neighbors: np.ndarray, idx: int, size: int) -> List[int]:
+    """Up to size segments either side of idx, in reading order"""
+    before = []
+    current = idx
+    for _ in range(size):
+        current = int(neighbors[PREV, current])
+        if current < 0:
+            break
+        before.append(current)
+
+    after = []
+    current = idx
+    for _ in range(size):
+        current = int(neighbors[NEXT, current])
+        if current < 0:
+            break
+        after.append(current)
+
+    return before[::-1] + [idx] + after
+
+
+def _in_reading_order(neighbors: np.ndarray, segment_ids: set) -> List[int]:
+    """Order a contiguous run of linked segments"""
+    start = next(i for i in segment_ids if int(neighbors[PREV, i]) not in segment_ids)
+    ordered = [start]
+    while True:
+        following = int(neighbors[NEXT, ordered[-1]])
+        if following not in segment_ids:
+            return ordered
+        ordered.append(following)
+
+
+def expand_hits(neighbors: np.ndarray, hits: List[Tuple[int, float]], size: int) -> List[Tuple[int, float, List[int]]]:
+    """
+    Expand ranked hits into passages of up to size neighbours either side
+
+    Windows that overlap a higher-ranked hit's passage are merged into it,
+    so every segment appears in at most one passage.
+
+    Args:
+        hits: (segment id, score) pairs, best first
+
+    Returns:
+        (hit segment id, score, passage segment ids in reading order) per passage, best first
+    """
+    passages = []           # [hit id, score, set of segment ids]
+    owner = {}              # segment id -> index into passages
+
+    for idx, score in hits:
+        window = _window(neighbors, idx, size)
+        overlapping = {owner[i] for i in window if i in owner}
+
+        if overlapping:
+            # Fold this window (and any passages it bridges) into the best-ranked passage
+            target = min(overlapping)
+            for other in sorted(overlapping - {target}):
+                passages[target][2] |= passages[other][2]
+                passages[other] = None
+            passages[target][2].update(window)
+            for i in passages[target][2]:
+                owner[i] = target
+        else:
+            owner.update((i, len(passages)) for i in window)
+            passages.append([idx, score, set(window)])
+
+    return [(hit, score, _in_reading_order(neighbors, ids)) for hit, score, ids in filter(None, passages)]
+
+
+def passage_citation(first: str, last: str) -> str:
+    """
+    Citation for a passage running from one segment's citation to another's
+
+    Verse citations in the same chapter become a range ("(Alma 32:20)" and
+    "(Alma 32:23)" give "(Alma 32:20-23)"); anything else keeps the first.
+    """
+    start, end = CITATION_PATTERN.search(first or ''), CITATION_PATTERN.search(last or '')
+    if not start or not end or start.group(1) != end.group(1) or start.group(2) == end.group(2):
+        return first
+    return f"{first[:start.end(2)]}-{end.group(2)}{first[start.end(2):]}"
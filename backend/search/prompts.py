@@ -4,9 +4,36 @@ System prompts and response generation for Gospel Guide AI
 Translated from prompts.ts for backend use
 """
 
-from typing import Dict, List, Any, Optional
+import os
+import re
+import time
+import logging
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, NamedTuple
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# Exact token counts need tiktoken; without it prompts are budgeted by estimate
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+    logger.warning("tiktoken not available - prompt token counts will be estimated")
+
+# Model the Q&A prompts are sent to (selects the tokenizer)
+PROMPT_MODEL = "gpt-4o"
+
+# Token budget for the context prompt (0 = unlimited)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 6000))
+
+# A source that would overflow the budget is truncated only if this much room is left
+MIN_TRUNCATED_SOURCE_TOKENS = 100
+
+# Word-trigram Jaccard similarity above which a source repeats a better-ranked one
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
 # Base system prompt for all modes
 BASE_SYSTEM_PROMPT = """
 You are a deeply faithful, testimony-bearing Latter-day Saint scholar who has spent decades studying the scriptures and modern revelation. 
@@ -73,38 +100,114 @@ def get_system_prompt(mode: str = 'default') -> str:
 
 Remember: Your role is to help people draw closer to Christ through study of restored gospel truths. Be a tool for the Spirit to teach through."""
 
-def build_context_prompt(query: str, search_results: List[Dict[str, Any]], mode: str = 'default') -> str:
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    """tiktoken encoding for a model, or None if unavailable"""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:  # Unknown model, or the encoding file cannot be fetched
+        logger.warning(f"tiktoken encoding for {model} unavailable ({e}) - estimating token counts")
+        return None
+
+def preload_encoding(model: str = PROMPT_MODEL) -> bool:
     """
-    Build the context prompt with search results and mode-specific instructions
+    Load the tokenizer for a model ahead of the first request
+
+    tiktoken downloads its BPE file on first use; doing that at startup keeps
+    the download off the /ask path. A failure is cached by _encoding, so
+    requests go straight to the estimate instead of retrying the download.
+
+    Returns:
+        True if exact token counts are available
+    """
+    start = time.time()
+    encoding = _encoding(model)
+    if encoding is not None:
+        logger.info(f"🔤 Tokenizer for {model} ready in {time.time() - start:.2f}s")
+    return encoding is not None
+
+def count_tokens(text: str, model: str = PROMPT_MODEL) -> int:
+    """Number of tokens in text (about 4 characters per token without tiktoken)"""
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = PROMPT_MODEL) -> str:
+    """Cut text to at most max_tokens tokens, ending at a word boundary where possible"""
+    encoding = _encoding(model)
+    if encoding is None:
+        truncated = text[:max_tokens * 4]
+    else:
+        truncated = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    if len(truncated) < len(text) and ' ' in truncated:
+        truncated = truncated[:truncated.rindex(' ')]
+    return truncated.rstrip()
+
+def _shingles(text: str) -> frozenset:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < 3:
+        return frozenset(words)
+    return frozenset(zip(words, words[1:], words[2:]))
+
+def dedupe_sources(search_results: List[Dict[str, Any]],
+                   threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[Dict[str, Any]]:
+    """Drop results whose content nearly repeats a better-ranked result's"""
+    kept, kept_shingles = [], []
+    for result in search_results:
+        shingles = _shingles(result.get('content', ''))
+        if shingles and any(len(shingles & other) / len(shingles | other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(result)
+        kept_shingles.append(shingles)
+    return kept
+
+def _context_section(number: int, metadata: Dict[str, Any], content: str) -> str:
+    return f"""Source {number} {format_citation(metadata)}:
+{content}
+
+---"""
+
+class ContextPrompt(NamedTuple):
+    """An assembled context prompt and what went into it"""
+    prompt: str
+    prompt_tokens: int              # Tokens in prompt
+    sources: List[Dict[str, Any]]   # Results included, best first (content as searched)
+    duplicates: int                 # Near-duplicate results removed
+    dropped: int                    # Results left out to fit the budget
+    truncated: int                  # Included results cut short to fit the budget
+
+def assemble_context_prompt(query: str, search_results: List[Dict[str, Any]], mode: str = 'default',
+                            token_budget: Optional[int] = None) -> ContextPrompt:
+    """
+    Build the context prompt within a token budget
+    
+    Near-duplicate sources are removed, then sources are added best first
+    until the budget runs out: the first one that does not fit is truncated
+    if enough room is left, and it and every lower-ranked source are dropped
+    otherwise. The best source is always included, truncated if need be.
     
     Args:
         query: The user's question
-        search_results: List of search results from scripture_search.py
+        search_results: Search results from scripture_search.py, best first
         mode: The selected mode (default, book-of-mormon-only, etc.)
+        token_budget: Maximum prompt tokens (defaults to CONTEXT_TOKEN_BUDGET; 0 = unlimited)
     """
+    if token_budget is None:
+        token_budget = CONTEXT_TOKEN_BUDGET
     
-    # Format search results into context sections
-    context_sections = []
-    for i, result in enumerate(search_results, 1):
-        metadata = result.get('metadata', {})
-        content = result.get('content', '').strip()
-        
-        # Format citations based on source type
-        citation = format_citation(metadata)
-        
-        context_section = f"""Source {i} {citation}:
-{content}
-
----"""
-        context_sections.append(context_section)
-    
-    # Join all context sections
-    all_contexts = "\n\n".join(context_sections)
+    unique_results = dedupe_sources(search_results)
     
     # Get mode-specific instructions
     mode_instructions = get_mode_specific_context_instructions(mode)
     
-    return f"""Based on the following sources, please answer this question: "{query}"
+    def render(context_sections: List[str]) -> str:
+        # Join all context sections
+        all_contexts = "\n\n".join(context_sections)
+        
+        return f"""Based on the following sources, please answer this question: "{query}"
 
 {mode_instructions}
 
@@ -112,6 +215,58 @@ SOURCES:
 {all_contexts}
 
 Remember to cite your sources exactly as shown and include full scripture text when quoting verses. Stay strictly within the provided sources."""
+    
+    # Format search results into context sections
+    remaining = token_budget - count_tokens(render([])) if token_budget > 0 else None
+    context_sections, included, truncated = [], [], 0
+    for i, result in enumerate(unique_results, 1):
+        metadata = result.get('metadata', {})
+        content = result.get('content', '').strip()
+        section = _context_section(i, metadata, content)
+        
+        if remaining is not None:
+            section_tokens = count_tokens(section) + 1  # + the blank line joining sections
+            if section_tokens > remaining:
+                room = remaining - (section_tokens - count_tokens(content))
+                if not included:
+                    room = max(room, MIN_TRUNCATED_SOURCE_TOKENS)
+                if room < MIN_TRUNCATED_SOURCE_TOKENS:
+                    break
+                section = _context_section(i, metadata, truncate_to_tokens(content, room) + " …")
+                section_tokens = remaining
+                truncated += 1
+            remaining -= section_tokens
+        
+        context_sections.append(section)
+        included.append(result)
+        if remaining is not None and remaining <= 0:
+            break
+    
+    prompt = render(context_sections)
+    context = ContextPrompt(
+        prompt=prompt,
+        prompt_tokens=count_tokens(prompt),
+        sources=included,
+        duplicates=len(search_results) - len(unique_results),
+        dropped=len(unique_results) - len(included),
+        truncated=truncated
+    )
+    if context.duplicates or context.dropped or context.truncated:
+        logger.info(f"Context prompt: {len(included)} sources, {context.prompt_tokens} tokens "
+                    f"({context.duplicates} near-duplicates removed, {context.dropped} dropped, "
+                    f"{context.truncated} truncated to fit {token_budget} tokens)")
+    return context
+
+def build_context_prompt(query: str, search_results: List[Dict[str, Any]], mode: str = 'default') -> str:
+    """
+    Build the context prompt with search results and mode-specific instructions
+    
+    Args:
+        query: The user's question
+        search_results: List of search results from scripture_search.py
+        mode: The selected mode (default, book-of-mormon-only, etc.)
+    """
+    return assemble_context_prompt(query, search_results, mode).prompt
 
 def format_citation(metadata: Dict[str, Any]) -> str:
     """Format citation based on metadata structure"""
@@ -185,28 +340,31 @@ def enhance_query_for_mode(query: str, mode: str) -> str:
     
     return enhancements.get(mode, query)
 
+# Source filters for each mode - a small fixed set, so the search engine
+# can prebuild a sub-index for each one
+MODE_SOURCE_FILTERS = {
+    'book-of-mormon-only': {
+        'source_type': 'scripture',
+        'standard_work': 'Book of Mormon'
+    },
+    'general-conference-only': {
+        'source_type': 'conference',
+        'min_year': 1971
+    },
+    'come-follow-me': {
+        'source_type': 'come_follow_me',
+        'year': 2025
+    },
+    'youth': {
+        'min_year': 2015  # Last 10 years for relevance
+    }
+}
+
 # Source filtering helpers that map to the existing search engine
 def get_mode_source_filter(mode: str) -> Optional[Dict[str, Any]]:
     """Get source filter based on mode"""
-    filters = {
-        'book-of-mormon-only': {
-            'source_type': 'scripture',
-            'standard_work': 'Book of Mormon'
-        },
-        'general-conference-only': {
-            'source_type': 'conference',
-            'min_year': 1971
-        },
-        'come-follow-me': {
-            'source_type': 'come_follow_me',
-            'year': 2025
-        },
-        'youth': {
-            'min_year': 2015  # Last 10 years for relevance
-        }
-    }
-    
-    return filters.get(mode, None)
+    mode_filter = MODE_SOURCE_FILTERS.get(mode)
+    return dict(mode_filter) if mode_filter else None
 
 # Popular filters for quick access
 POPULAR_FILTERS = {
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Scripture reference parsing and lookup for LDS Scripture Search
+Recognizes queries that are literally references ("Alma 32:21",
+"D&C 121:7-8", "Moroni 10", "1 Ne. 3:7; Ether 12:27") and resolves them to
+segment ids through a precomputed (book, chapter, verse) index, with no
+embedding call or vector scan
+"""
+
+import re
+import logging
+from typing import List, Dict, Optional, NamedTuple, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Canonical book name (as stored in segment metadata) -> accepted abbreviations
+BOOK_ALIASES = {
+    # Old Testament
+    'Genesis': ['gen'], 'Exodus': ['ex', 'exod'], 'Leviticus': ['lev'], 'Numbers': ['num'],
+    'Deuteronomy': ['deut'], 'Joshua': ['josh'], 'Judges': ['judg'], 'Ruth': [],
+    '1 Samuel': ['1 sam'], '2 Samuel': ['2 sam'], '1 Kings': ['1 kgs'], '2 Kings': ['2 kgs'],
+    '1 Chronicles': ['1 chr', '1 chron'], '2 Chronicles': ['2 chr', '2 chron'], 'Ezra': [],
+    'Nehemiah': ['neh'], 'Esther': ['esth'], 'Job': [], 'Psalms': ['ps', 'psalm', 'psa'],
+    'Proverbs': ['prov'], 'Ecclesiastes': ['eccl'], 'Song of Solomon': ['song'], 'Isaiah': ['isa'],
+    'Jeremiah': ['jer'], 'Lamentations': ['lam'], 'Ezekiel': ['ezek'], 'Daniel': ['dan'],
+    'Hosea': ['hosea'], 'Joel': [], 'Amos': [], 'Obadiah': ['obad'], 'Jonah': [], 'Micah': [],
+    'Nahum': [], 'Habakkuk': ['hab'], 'Zephaniah': ['zeph'], 'Haggai': ['hag'],
+    'Zechariah': ['zech'], 'Malachi': ['mal'],
+    # New Testament
+    'Matthew': ['matt', 'mt'], 'Mark': ['mk'], 'Luke': ['lk'], 'John': ['jn'], 'Acts': [],
+    'Romans': ['rom'], '1 Corinthians': ['1 cor'], '2 Corinthians': ['2 cor'], 'Galatians': ['gal'],
+    'Ephesians': ['eph'], 'Philippians': ['philip', 'phil'], 'Colossians': ['col'],
+    '1 Thessalonians': ['1 thes', '1 thess'], '2 Thessalonians': ['2 thes', '2 thess'],
+    '1 Timothy': ['1 tim'], '2 Timothy': ['2 tim'], 'Titus': [], 'Philemon': ['philem'],
+    'Hebrews': ['heb'], 'James': ['jas'], '1 Peter': ['1 pet'], '2 Peter': ['2 pet'],
+    '1 John': ['1 jn'], '2 John': ['2 jn'], '3 John': ['3 jn'], 'Jude': [], 'Revelation': ['rev'],
+    # Book of Mormon
+    '1 Nephi': ['1 ne'], '2 Nephi': ['2 ne'], 'Jacob': ['jac'], 'Enos': [], 'Jarom': [], 'Omni': [],
+    'Words of Mormon': ['w of m', 'wom'], 'Mosiah': [], 'Alma': [], 'Helaman': ['hel'],
+    '3 Nephi': ['3 ne'], '4 Nephi': ['4 ne'], 'Mormon': ['morm'], 'Ether': [], 'Moroni': ['moro'],
+    # Doctrine and Covenants
+    'Doctrine and Covenants': ['d&c', 'd & c', 'dc', 'd and c', 'doctrine & covenants'],
+    # Pearl of Great Price
+    'Moses': [], 'Abraham': ['abr'], 'Joseph Smith—Matthew': ['js-m', 'jsm', 'joseph smith matthew'],
+    'Joseph Smith—History': ['js-h', 'jsh', 'joseph smith history'],
+    'Articles of Faith': ['a of f', 'aof'],
+}
+
+# Books with one chapter, where "Enos 8" means verse 8
+SINGLE_CHAPTER_BOOKS = {
+    'Obadiah', 'Philemon', '2 John', '3 John', 'Jude', 'Enos', 'Jarom', 'Omni', 'Words of Mormon',
+    '4 Nephi', 'Joseph Smith—Matthew', 'Joseph Smith—History', 'Articles of Faith',
+}
+
+# "D&C 121:7-8", "Moroni 10", "Alma 32:21, 27-28", "Alma 32-33"
+REFERENCE_PATTERN = re.compile(
+    r'^(?P<book>.*?[^\d\s].*?)\s*(?P<chapter>\d+)'
+    r'(?:\s*[-–]\s*(?P<last_chapter>\d+)|\s*:\s*(?P<verses>\d+(?:\s*[-–]\s*\d+)?(?:\s*,\s*\d+(?:\s*[-–]\s*\d+)?)*))?$'
+)
+
+# Segment metadata citation, used when chapter is missing (e.g. "(D&C 121:7)")
+CITATION_PATTERN = re.compile(r'(\d+):(\d+)\)?\s*$')
+
+# Caps on what a single reference query can expand to (e.g. "Alma 1-63")
+MAX_REFERENCE_VERSES = 500
+MAX_CHAPTER_SPAN = 150
+
+
+class Reference(NamedTuple):
+    """A chapter or verse span; first_verse is None for a whole chapter"""
+    book: str
+    chapter: int
+    first_verse: Optional[int] = None
+    last_verse: Optional[int] = None
+
+
+def _normalize_book_name(name: str) -> str:
+    name = name.lower().replace('—', '-').replace('–', '-').replace('.', ' ')
+    name = re.sub(r'\s*-\s*', '-', name)
+    name = re.sub(r'^(first|1st|i)\s', '1 ', name)
+    name = re.sub(r'^(second|2nd|ii)\s', '2 ', name)
+    name = re.sub(r'^(third|3rd|iii)\s', '3 ', name)
+    name = re.sub(r'^(fourth|4th|iv)\s', '4 ', name)
+    name = re.sub(r'^(\d)(?=[a-z])', r'\1 ', name)  # "1ne" -> "1 ne"
+    return re.sub(r'\s+', ' ', name).strip()
+
+
+def _alias_table() -> Dict[str, str]:
+    table = {}
+    for book, aliases in BOOK_ALIASES.items():
+        for alias in [book] + aliases:
+            table[_normalize_book_name(alias)] = book
+    return table
+
+
+_BOOKS_BY_ALIAS = _alias_table()
+
+
+def canonical_book(name: str) -> Optional[str]:
+    """Canonical book name for a name or abbreviation, None if unknown"""
+    return _BOOKS_BY_ALIAS.get(_normalize_book_name(name))
+
+
+def _parse_one(text: str) -> List[Reference]:
+    match = REFERENCE_PATTERN.match(text.strip())
+    if not match:
+        return []
+    book = canonical_book(match.group('book'))
+    if book is None:
+        return []
+
+    chapter = int(match.group('chapter'))
+    if chapter == 0:
+        return []
+    if match.group('last_chapter'):
+        last_chapter = int(match.group('last_chapter'))
+        if last_chapter < chapter:
+            return []
+        if book in SINGLE_CHAPTER_BOOKS:
+            return [Reference(book, 1, chapter, last_chapter)]
+        return [Reference(book, c) for c in range(chapter, min(last_chapter, chapter + MAX_CHAPTER_SPAN) + 1)]
+
+    if not match.group('verses'):
+        if book in SINGLE_CHAPTER_BOOKS:
+            return [Reference(book, 1, chapter, chapter)]
+        return [Reference(book, chapter)]
+
+    references = []
+    for span in match.group('verses').split(','):
+        bounds = [int(v) for v in re.split(r'[-–]', span)]
+        if bounds[0] == 0 or bounds[0] > bounds[-1]:
+            return []  # "Alma 32:0", "Alma 32:28-21"
+        references.append(Reference(book, chapter, bounds[0], bounds[-1]))
+    return references
+
+
+def parse_references(query: str) -> List[Reference]:
+    """
+    Parse a query consisting only of scripture references
+
+    Several references may be separated by ';'. Queries with any other
+    text ("faith in Alma 32") are not references.
+
+    Returns:
+        The references, or an empty list if the query is not a reference query
+    """
+    query = query.strip().rstrip('.?!').strip()
+    if not query or not any(ch.isdigit() for ch in query):
+        return []
+
+    references = []
+    for part in query.split(';'):
+        parsed = _parse_one(part)
+        if not parsed:
+            return []
+        references.extend(parsed)
+    return references
+
+
+class ReferenceIndex:
+    """(book, chapter, verse) -> segment id lookup built from segment metadata"""
+
+    def __init__(self, columns):
+        """
+        Build the index from metadata columns
+
+        Args:
+            columns: MetadataColumns over the segment metadata; D&C segments
+                without a chapter take their section from the citation
+        """
+        books = columns.column('book')
+        chapters = columns.numeric('chapter')
+        verses = columns.numeric('verse')
+        citations = columns.column('citation')
+
+        book_names = [canonical_book(str(book)) or book for book in books.categories]
+
+        self._chapters: Dict[Tuple[str, int], Dict[int, int]] = {}
+        for idx in np.flatnonzero((books.codes >= 0) & ~np.isnan(verses)):
+            book = book_names[books.codes[idx]]
+            chapter = chapters[idx]
+            if np.isnan(chapter):
+                code = citations.codes[idx]
+                found = CITATION_PATTERN.search(str(citations.categories[code])) if code >= 0 else None
+                if not found:
+                    continue
+                chapter = found.group(1)
+            self._chapters.setdefault((book, int(chapter)), {})[int(verses[idx])] = int(idx)
+
+        logger.info(f"Built reference index for {len(self._chapters)} chapters")
+
+    def lookup(self, references: List[Reference]) -> np.ndarray:
+        """
+        Segment ids of the referenced verses, in reference order
+
+        Verses missing from the corpus are skipped; duplicates are kept once.
+        """
+        ids: Dict[int, None] = {}
+        for reference in references:
+            verses = self._chapters.get((reference.book, reference.chapter))
+            if not verses:
+                continue
+            if reference.first_verse is None:
+                wanted = sorted(verses)
+            else:
+                wanted = range(reference.first_verse, min(reference.last_verse, max(verses)) + 1)
+            for verse in wanted:
+                idx = verses.get(verse)
+                if idx is not None:
+                    ids[idx] = None
+                    if len(ids) >= MAX_REFERENCE_VERSES:
+                        return np.fromiter(ids, dtype=np.int64)
+        return np.fromiter(ids, dtype=np.int64, count=len(ids))
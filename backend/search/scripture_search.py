@@ -6,70 +6,315 @@ Query the FAISS index with OpenAI embeddings and rich metadata filtering
 
 import json
 import os
+import asyncio
+import hashlib
+import time
 import logging
 import argparse
 from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 import numpy as np
 import faiss
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .ann_index import read_index, configure_search, search_parameters
+    from .metadata_columns import MetadataColumns
+    from .segment_store import SegmentStore
+    from .embedding_cache import EmbeddingCache
+    from .lexical_index import LexicalIndex
+    from .references import ReferenceIndex, parse_references
+    from .neighbors import compute_neighbors, load_neighbors, neighbors_exist, expand_hits, passage_citation
+    from .facets import compute_facets, load_facets, facets_etag
+    from .index_versions import MANIFEST_FILE
+except ImportError:  # Running as a standalone script
+    from ann_index import read_index, configure_search, search_parameters
+    from metadata_columns import MetadataColumns
+    from segment_store import SegmentStore
+    from embedding_cache import EmbeddingCache
+    from lexical_index import LexicalIndex
+    from references import ReferenceIndex, parse_references
+    from neighbors import compute_neighbors, load_neighbors, neighbors_exist, expand_hits, passage_citation
+    from facets import compute_facets, load_facets, facets_etag
+    from index_versions import MANIFEST_FILE
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Number of compiled filter selectors kept per engine
+SELECTOR_CACHE_SIZE = 64
+
+# Mode sub-indexes are skipped for filters covering more than this share of
+# the corpus - the in-place selector search is just as fast there and a copy
+# would only double memory
+SUBINDEX_MAX_FRACTION = 0.5
+
+SUBINDEX_DIR = "subindexes"
+
+# Inputs per embeddings API call when embedding many queries
+EMBEDDING_BATCH_SIZE = 256
+
+# Threads running FAISS searches for asearch(); bounded so a burst of
+# concurrent requests queues instead of oversubscribing the CPU
+SEARCH_THREADS = int(os.getenv("SEARCH_THREADS", min(4, os.cpu_count() or 1)))
+
+# semantic: embeddings only; lexical: BM25 only (no network call);
+# hybrid: both rankings merged with reciprocal rank fusion
+RETRIEVAL_MODES = ('semantic', 'hybrid', 'lexical')
+
+# Reciprocal rank fusion constant and the depth of each ranking fed into it
+RRF_K = 60
+HYBRID_CANDIDATES = 50
+
+def filter_key(source_filter: Dict[str, Any]) -> str:
+    """Canonical string form of a source filter, used as a cache key"""
+    return json.dumps(source_filter, sort_keys=True, default=str)
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int = RRF_K):
+    """
+    Merge rankings of segment ids by summing 1 / (k + rank) per ranking
+    
+    Returns:
+        Tuple of (scores, indices) arrays, best first
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking, 1):
+            fused[int(idx)] = fused.get(int(idx), 0.0) + 1.0 / (k + rank)
+    
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return (np.array([score for _, score in ordered], dtype=np.float32),
+            np.array([idx for idx, _ in ordered], dtype=np.int64))
+
 class ScriptureSearchEngine:
-    def __init__(self, index_dir: str = "indexes", openai_api_key: str = None):
+    def __init__(self, index_dir: str = "indexes", openai_api_key: str = None,
+                 search_params: Optional[Dict[str, Any]] = None, mmap: bool = True,
+                 embedding_cache: Optional[EmbeddingCache] = None):
         """
         Initialize the scripture search engine
         
         Args:
             index_dir: Directory containing FAISS index and metadata files
             openai_api_key: OpenAI API key (or set OPENAI_API_KEY env var)
+            search_params: Optional nprobe / ef_search overriding config.json
+            mmap: Memory-map the index and segment store instead of reading them into RAM
+            embedding_cache: Query embedding cache (defaults to one configured from
+                EMBEDDING_CACHE_* env vars; EMBEDDING_CACHE_SIZE=0 disables it)
         """
         self.index_dir = Path(index_dir)
         
-        # Initialize OpenAI client
+        # Initialize OpenAI clients (async one for asearch)
         if openai_api_key:
             self.client = OpenAI(api_key=openai_api_key)
+            self.async_client = AsyncOpenAI(api_key=openai_api_key)
         else:
             self.client = OpenAI()  # Uses OPENAI_API_KEY env var
+            self.async_client = AsyncOpenAI()
         
         # Load configuration
         config_path = self.index_dir / "config.json"
-        with open(config_path, 'r') as f:
-            self.config = json.load(f)
+        with open(config_path, 'rb') as f:
+            config_bytes = f.read()
+        self.config = json.loads(config_bytes)
         
         self.embedding_model = self.config["embedding_model"]
         self.embedding_dim = self.config["embedding_dim"]
         
         # Load FAISS index
+        self.mmap = mmap
         index_path = self.index_dir / "scripture_index.faiss"
-        self.index = faiss.read_index(str(index_path))
+        self.index = read_index(index_path, mmap=mmap)
         logger.info(f"Loaded FAISS index with {self.index.ntotal} vectors")
         
-        # Load metadata
-        metadata_path = self.index_dir / "scripture_metadata.pkl"
-        with open(metadata_path, 'rb') as f:
-            self.metadata = pickle.load(f)
+        # Changes whenever the index is rebuilt; lets caches of derived data
+        # (e.g. generated answers) notice that they are stale
+        index_stat = index_path.stat()
+        self.index_version = hashlib.sha256(
+            config_bytes + f"{index_stat.st_size}:{index_stat.st_mtime_ns}".encode()
+        ).hexdigest()[:16]
+        
+        # Build name from a versioned index directory's manifest (None if unversioned)
+        manifest_path = self.index_dir / MANIFEST_FILE
+        self.index_release = None
+        if manifest_path.exists():
+            with open(manifest_path, 'r') as f:
+                self.index_release = json.load(f).get('version')
+        
+        # Approximate indexes (IVF / HNSW) carry their tuning in config.json
+        self.index_params = dict(self.config.get("index_params", {}))
+        self.index_params.update(search_params or {})
+        configure_search(self.index, self.index_params)
+        logger.info(f"Index type {self.config.get('index_type', 'IndexFlatIP')} {self.index_params}")
+        
+        # Load metadata - the compact segment store assembles records on access;
+        # index directories built before it existed fall back to the pickle
+        if SegmentStore.exists(self.index_dir):
+            self.metadata = SegmentStore(self.index_dir, mmap_files=mmap)
+        else:
+            metadata_path = self.index_dir / "scripture_metadata.pkl"
+            with open(metadata_path, 'rb') as f:
+                self.metadata = pickle.load(f)
         logger.info(f"Loaded metadata for {len(self.metadata)} segments")
         
         assert len(self.metadata) == self.index.ntotal, "Metadata count must match index size"
+        
+        # Columnar view of the metadata for vectorized source filtering
+        # (taken directly from the segment store's interned columns when available)
+        self.columns = MetadataColumns(self.metadata)
+        
+        # (book, chapter, verse) -> segment lookup for queries that are references
+        self.reference_index = ReferenceIndex(self.columns)
+        
+        # Previous/next verse and paragraph links for expanding hits into passages
+        # (computed from the metadata for index directories that predate them)
+        if neighbors_exist(self.index_dir):
+            self.segment_links = load_neighbors(self.index_dir, mmap_files=mmap)
+        else:
+            self.segment_links = compute_neighbors(self.columns)
+        
+        # /sources summary, saved by the builder or computed once here
+        self.facets = load_facets(self.index_dir, len(self.metadata)) or compute_facets(self.columns)
+        self.facets_etag = facets_etag(self.facets)
+        
+        # Compiled FAISS ID selectors keyed by source filter (LRU)
+        self._selector_cache = OrderedDict()
+        self._selector_lock = threading.Lock()
+        
+        # Prebuilt (index, id map) pairs for fixed mode filters, keyed by filter_key
+        self.subindexes = {}
+        
+        # Repeated questions skip the embeddings round trip
+        self.embedding_cache = embedding_cache if embedding_cache is not None else EmbeddingCache.from_env()
+        
+        # FAISS work offloaded from the event loop by asearch() (None after close())
+        self._executor = ThreadPoolExecutor(max_workers=SEARCH_THREADS, thread_name_prefix="faiss-search")
+        
+        # BM25 index over segment content for lexical / hybrid retrieval
+        # (built on first use for index directories that predate it)
+        self._lexical_index = LexicalIndex.load(self.index_dir, mmap_files=mmap) if LexicalIndex.exists(self.index_dir) else None
+        self._lexical_lock = threading.Lock()
+    
+    @property
+    def lexical_index(self) -> LexicalIndex:
+        """The BM25 index, built from the segment content if none was saved"""
+        if self._lexical_index is None:
+            with self._lexical_lock:
+                if self._lexical_index is None:
+                    logger.info("No saved BM25 index, building one from segment content...")
+                    self._lexical_index = LexicalIndex.build(self._segment(i)[0] for i in range(len(self.metadata)))
+        return self._lexical_index
+    
+    def _cached_embedding(self, query: str) -> Optional[np.ndarray]:
+        """Get a query embedding from the cache, None on a miss"""
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(query, self.embedding_model)
+            if cached is not None:
+                return cached.reshape(1, -1)
+        return None
+    
+    async def _acached_embedding(self, query: str) -> Optional[np.ndarray]:
+        """Async _cached_embedding: the persistent tier is read off the event loop"""
+        if self.embedding_cache is not None:
+            cached = await self.embedding_cache.aget(query, self.embedding_model)
+            if cached is not None:
+                return cached.reshape(1, -1)
+        return None
+    
+    def _finish_embedding(self, query: str, raw_embedding: List[float]) -> np.ndarray:
+        """Normalize an API embedding and remember it in the cache"""
+        embedding = np.array(raw_embedding, dtype=np.float32)
+        
+        # Normalize for cosine similarity (since we use IndexFlatIP)
+        embedding = embedding / np.linalg.norm(embedding)
+        
+        if self.embedding_cache is not None:
+            self.embedding_cache.put(query, self.embedding_model, embedding)
+        return embedding.reshape(1, -1)
     
     def _embed_query(self, query: str) -> np.ndarray:
-        """Generate embedding for search query using OpenAI"""
+        """Generate embedding for search query using OpenAI (cached by normalized query text)"""
+        cached = self._cached_embedding(query)
+        if cached is not None:
+            return cached
+        
         response = self.client.embeddings.create(
             input=query,
             model=self.embedding_model
         )
-        embedding = np.array(response.data[0].embedding, dtype=np.float32)
+        return self._finish_embedding(query, response.data[0].embedding)
+    
+    def _cached_embeddings(self, queries: List[str]):
+        """
+        Fill a matrix with the cached embeddings of many queries
         
-        # Normalize for cosine similarity (since we use IndexFlatIP)
-        embedding = embedding / np.linalg.norm(embedding)
-        return embedding.reshape(1, -1)
+        Returns:
+            Tuple of the (len(queries), dim) matrix and a dict mapping each
+            distinct uncached query to the rows it still has to fill
+        """
+        return self._fill_cached(queries, [self._cached_embedding(query) for query in queries])
     
-    def _filter_indices(self, source_filter: Dict[str, Any]) -> List[int]:
+    async def _acached_embeddings(self, queries: List[str]):
+        """Async _cached_embeddings"""
+        return self._fill_cached(queries, [await self._acached_embedding(query) for query in queries])
+    
+    def _fill_cached(self, queries: List[str], cached_embeddings: List[Optional[np.ndarray]]):
+        embeddings = np.empty((len(queries), self.embedding_dim), dtype=np.float32)
+        missing = {}
+        for row, (query, cached) in enumerate(zip(queries, cached_embeddings)):
+            if cached is not None:
+                embeddings[row] = cached
+            else:
+                missing.setdefault(query, []).append(row)
+        return embeddings, missing
+    
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed many queries with as few API calls as possible
+        
+        Cached queries are skipped and the rest are sent in batches of
+        EMBEDDING_BATCH_SIZE inputs.
+        
+        Returns:
+            (len(queries), dim) matrix of normalized embeddings
+        """
+        embeddings, missing = self._cached_embeddings(queries)
+        pending = list(missing)
+        for start in range(0, len(pending), EMBEDDING_BATCH_SIZE):
+            batch = pending[start:start + EMBEDDING_BATCH_SIZE]
+            response = self.client.embeddings.create(input=batch, model=self.embedding_model)
+            for query, item in zip(batch, response.data):
+                embeddings[missing[query]] = self._finish_embedding(query, item.embedding)
+        return embeddings
+    
+    async def aembed_queries(self, queries: List[str]) -> np.ndarray:
+        """Async version of _embed_queries"""
+        embeddings, missing = await self._acached_embeddings(queries)
+        pending = list(missing)
+        for start in range(0, len(pending), EMBEDDING_BATCH_SIZE):
+            batch = pending[start:start + EMBEDDING_BATCH_SIZE]
+            response = await self.async_client.embeddings.create(input=batch, model=self.embedding_model)
+            for query, item in zip(batch, response.data):
+                embeddings[missing[query]] = self._finish_embedding(query, item.embedding)
+        return embeddings
+    
+    async def aembed_query(self, query: str) -> np.ndarray:
+        """Async version of _embed_query - the event loop stays free during the API call"""
+        cached = await self._acached_embedding(query)
+        if cached is not None:
+            return cached
+        
+        response = await self.async_client.embeddings.create(
+            input=query,
+            model=self.embedding_model
+        )
+        return self._finish_embedding(query, response.data[0].embedding)
+    
+    def _filter_indices(self, source_filter: Dict[str, Any]) -> np.ndarray:
         """
         Filter metadata indices based on source criteria
         
@@ -80,120 +325,450 @@ class ScriptureSearchEngine:
                 - book: "1 Nephi", "Matthew", etc.
                 - speaker: "Russell M. Nelson", etc.
                 - year: 2024, etc.
+                - min_year / max_year: inclusive range bounds (any numeric field)
+                - {"field": {"in" | "not_in" | "eq" | "contains" | "min" | "max": ...}}
                 - Any other metadata field
+              See metadata_columns for the full predicate language.
+        
+        Returns:
+            Array of indices that match the filter criteria
+        """
+        return self.columns.filter_indices(source_filter)
+    
+    def _filter_selector(self, source_filter: Dict[str, Any]):
+        """
+        Get FAISS search parameters restricting a search to a source filter
+        
+        The filter is compiled once into a bitmap ID selector and cached, so
+        repeated filtered searches scan the main index in place without
+        reconstructing or copying any vectors.
         
         Returns:
-            List of indices that match the filter criteria
+            Tuple of (faiss.SearchParameters, number of matching segments)
+        """
+        key = filter_key(source_filter)
+        
+        with self._selector_lock:
+            cached = self._selector_cache.get(key)
+            if cached is not None:
+                self._selector_cache.move_to_end(key)
+                return cached
+        
+        mask = self.columns.mask(source_filter)
+        match_count = int(np.count_nonzero(mask))
+        
+        # FAISS reads the bitmap through a raw pointer: the params hold it and the
+        # selector, so a search keeps both alive even if the cache evicts the entry
+        bitmap = np.packbits(mask, bitorder='little')
+        selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+        params = search_parameters(self.index, self.index_params, selector)
+        params.referenced_objects = [bitmap, selector]
+        
+        with self._selector_lock:
+            self._selector_cache[key] = (params, match_count)
+            while len(self._selector_cache) > SELECTOR_CACHE_SIZE:
+                self._selector_cache.popitem(last=False)
+        
+        return params, match_count
+    
+    def build_mode_subindexes(self, mode_filters: Dict[str, Dict[str, Any]], persist: bool = False):
+        """
+        Prepare one small flat sub-index per fixed mode filter
+        
+        Sub-indexes written by build_embeddings.py (or a previous persist=True
+        call) are loaded from the subindexes/ directory next to the main index
+        when their recorded filter still matches; otherwise they are built
+        from the main index.
+        
+        Args:
+            mode_filters: Dict of mode name -> source filter
+            persist: Write newly built sub-indexes to disk for the next startup
         """
-        matching_indices = []
+        subindex_dir = self.index_dir / SUBINDEX_DIR
+        manifest_path = subindex_dir / "manifest.json"
+        manifest = {}
+        if manifest_path.exists():
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
         
-        for i, meta in enumerate(self.metadata):
-            match = True
+        manifest_changed = False
+        for mode, mode_filter in mode_filters.items():
+            if not mode_filter:
+                continue
+            
+            entry = manifest.get(mode)
+            index_path = subindex_dir / f"{mode}.faiss"
+            ids_path = subindex_dir / f"{mode}_ids.npy"
             
-            for key, value in source_filter.items():
-                meta_value = meta.get(key)
+            if (entry and entry.get('filter') == filter_key(mode_filter)
+                    and entry.get('total_segments') == self.index.ntotal
+                    and index_path.exists() and ids_path.exists()):
+                sub_index = read_index(index_path, mmap=self.mmap)
+                ids = np.load(ids_path, mmap_mode='r' if self.mmap else None)
+                logger.info(f"Loaded '{mode}' sub-index with {len(ids)} vectors")
+            else:
+                ids = self._filter_indices(mode_filter).astype(np.int64)
+                if len(ids) == 0:
+                    logger.warning(f"Mode '{mode}' filter matches no segments, skipping sub-index")
+                    continue
+                if len(ids) > SUBINDEX_MAX_FRACTION * self.index.ntotal:
+                    logger.info(f"Mode '{mode}' covers {len(ids)} segments, using in-place filtered search")
+                    continue
                 
-                if meta_value is None:
-                    match = False
-                    break
+                sub_index = faiss.IndexFlatIP(self.embedding_dim)
+                sub_index.add(self.index.reconstruct_batch(ids))
+                logger.info(f"Built '{mode}' sub-index with {len(ids)} vectors")
                 
-                # Handle different comparison types
-                if isinstance(value, list):
-                    if meta_value not in value:
-                        match = False
-                        break
-                elif isinstance(value, str):
-                    if isinstance(meta_value, str):
-                        if value.lower() not in meta_value.lower():
-                            match = False
-                            break
-                    else:
-                        if str(meta_value).lower() != value.lower():
-                            match = False
-                            break
-                elif isinstance(value, (int, float)):
-                    if meta_value != value:
-                        match = False
-                        break
-                else:
-                    if meta_value != value:
-                        match = False
-                        break
+                if persist:
+                    subindex_dir.mkdir(parents=True, exist_ok=True)
+                    faiss.write_index(sub_index, str(index_path))
+                    np.save(ids_path, ids)
+                    manifest[mode] = {
+                        'filter': filter_key(mode_filter),
+                        'total_segments': self.index.ntotal,
+                        'count': len(ids)
+                    }
+                    manifest_changed = True
             
-            if match:
-                matching_indices.append(i)
+            self.subindexes[filter_key(mode_filter)] = (sub_index, ids)
         
-        return matching_indices
+        if manifest_changed:
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f, indent=2)
     
-    def search(self, 
-               query: str, 
-               top_k: int = 10, 
-               source_filter: Optional[Dict[str, Any]] = None,
-               min_score: float = 0.0) -> List[Dict[str, Any]]:
+    def _search_embeddings(self,
+                           query_embeddings: np.ndarray,
+                           top_k: int,
+                           source_filter: Optional[Dict[str, Any]] = None):
         """
-        Search scripture content with semantic similarity and source filtering
-        
-        Args:
-            query: Natural language search query
-            top_k: Number of results to return
-            source_filter: Optional filtering criteria (see _filter_indices for options)
-            min_score: Minimum similarity score (0.0 to 1.0)
+        Run one FAISS search for a matrix of already-embedded queries
         
         Returns:
-            List of search results with content, metadata, and scores
+            Tuple of (scores, indices) arrays with one row per query; missing hits are -1
         """
-        logger.info(f"Searching for: '{query}'")
+        subindex = self.subindexes.get(filter_key(source_filter)) if source_filter else None
         
-        # Generate query embedding
-        query_embedding = self._embed_query(query)
-        
-        # Apply source filtering if specified
-        if source_filter:
-            filtered_indices = self._filter_indices(source_filter)
-            logger.info(f"Source filter matched {len(filtered_indices)} segments")
+        if subindex is not None:
+            # Fixed mode filter - search its prebuilt sub-index and map back to global IDs
+            sub_index, ids = subindex
+            scores, sub_indices = sub_index.search(query_embeddings, min(top_k, len(ids)))
+            indices = np.where(sub_indices >= 0, ids[sub_indices], -1)
+        elif source_filter:
+            params, match_count = self._filter_selector(source_filter)
+            logger.info(f"Source filter matched {match_count} segments")
             
-            if not filtered_indices:
+            if match_count == 0:
                 logger.warning("No segments match the source filter")
-                return []
-            
-            # Create a subset index for filtered search
-            filtered_vectors = np.array([self.index.reconstruct(i) for i in filtered_indices])
-            temp_index = faiss.IndexFlatIP(self.embedding_dim)
-            temp_index.add(filtered_vectors)
+                num_queries = len(query_embeddings)
+                return np.empty((num_queries, 0), dtype=np.float32), np.empty((num_queries, 0), dtype=np.int64)
             
-            # Search the filtered index
-            scores, temp_indices = temp_index.search(query_embedding, min(top_k, len(filtered_indices)))
-            
-            # Map back to original indices
-            original_indices = [filtered_indices[i] for i in temp_indices[0]]
+            # Search the main index restricted to the filtered IDs
+            scores, indices = self.index.search(query_embeddings, min(top_k, match_count), params=params)
         else:
             # Search the full index
-            scores, indices = self.index.search(query_embedding, top_k)
-            original_indices = indices[0]
+            scores, indices = self.index.search(query_embeddings, top_k)
+        
+        return scores, indices
+    
+    def _search_embedding(self,
+                          query_embedding: np.ndarray,
+                          top_k: int,
+                          source_filter: Optional[Dict[str, Any]] = None):
+        """
+        Run the FAISS search for an already-embedded query
+        
+        Returns:
+            Tuple of (scores, indices) arrays for the query; missing hits are -1
+        """
+        scores, indices = self._search_embeddings(query_embedding, top_k, source_filter)
+        return scores[0], indices[0]
+    
+    def _segment(self, idx: int):
+        """Get (content, metadata) for a segment"""
+        if isinstance(self.metadata, SegmentStore):
+            # Records are assembled fresh from the store, so no copy is needed
+            return self.metadata.content(idx), self.metadata[idx]
         
-        scores = scores[0]
+        # Legacy pickled metadata keeps the text inside each dict; take it out so
+        # results have the same metadata either way
+        meta = self.metadata[idx].copy()
+        content = meta.pop('content', None)
+        if content is None:
+            content = f"[Content for index {idx}] - {meta.get('citation', 'Unknown citation')}"
+        return content, meta
+    
+    def _build_results(self, indices: np.ndarray, scores: np.ndarray, min_score: float,
+                       context: int = 0) -> List[Dict[str, Any]]:
+        """Turn FAISS hits into result dicts with content and metadata"""
+        if context > 0:
+            return self._build_passages(indices, scores, min_score, context)
         
-        # Build results
         results = []
-        for i, (idx, score) in enumerate(zip(original_indices, scores)):
-            if score < min_score:
+        for i, (idx, score) in enumerate(zip(indices, scores)):
+            if idx < 0 or score < min_score:
                 continue
-                
-            meta = self.metadata[idx].copy()
             
-            # Reconstruct the text content (you might want to store this separately for efficiency)
-            # For now, we'll include the full metadata
+            content, meta = self._segment(idx)
             result = {
                 'rank': i + 1,
                 'score': float(score),
-                'content': meta.get('content', f"[Content for index {idx}] - {meta.get('citation', 'Unknown citation')}"),
+                'content': content,
                 'metadata': meta
             }
             results.append(result)
         
+        return results
+    
+    def _build_passages(self, indices: np.ndarray, scores: np.ndarray, min_score: float,
+                        context: int) -> List[Dict[str, Any]]:
+        """
+        Turn hits into passages of up to context verses / paragraphs either side
+        
+        Passages whose windows overlap are merged under the better-ranked hit,
+        so no segment is returned twice and there may be fewer passages than hits.
+        The passage keeps the hit's score and metadata, with the citation
+        widened to the verse range and a 'passage' entry describing the span.
+        """
+        hits = [(int(idx), float(score)) for idx, score in zip(indices, scores) if idx >= 0 and score >= min_score]
+        
+        results = []
+        for rank, (hit, score, segment_ids) in enumerate(expand_hits(self.segment_links, hits, context), 1):
+            segments = [self._segment(idx) for idx in segment_ids]
+            meta = dict(segments[segment_ids.index(hit)][1])
+            first_citation = segments[0][1].get('citation', '')
+            last_citation = segments[-1][1].get('citation', '')
+            meta['passage'] = {
+                'segments': len(segment_ids),
+                'hit_citation': meta.get('citation', ''),
+                'first_citation': first_citation,
+                'last_citation': last_citation,
+            }
+            if 'citation' in meta:
+                meta['citation'] = passage_citation(first_citation, last_citation)
+            
+            results.append({
+                'rank': rank,
+                'score': score,
+                'content': '\n'.join(content for content, _ in segments),
+                'metadata': meta
+            })
+        
+        return results
+    
+    def _search_and_build(self, query_embedding: np.ndarray, top_k: int,
+                          source_filter: Optional[Dict[str, Any]], min_score: float,
+                          context: int = 0) -> List[Dict[str, Any]]:
+        """FAISS search plus result assembly for an embedded query"""
+        scores, indices = self._search_embedding(query_embedding, top_k, source_filter)
+        return self._build_results(indices, scores, min_score, context)
+    
+    def _lexical_search(self, query: str, top_k: int, source_filter: Optional[Dict[str, Any]]):
+        """BM25 search restricted to the segments matching a source filter"""
+        mask = self.columns.mask(source_filter) if source_filter else None
+        return self.lexical_index.search(query, top_k, mask)
+    
+    def _reference_ids(self, query: str, source_filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Segment ids of the verses a reference query names, None for any other query"""
+        references = parse_references(query)
+        if not references:
+            return None
+        
+        ids = self.reference_index.lookup(references)
+        if source_filter and len(ids):
+            ids = ids[self.columns.mask(source_filter)[ids]]
+        return ids if len(ids) else None
+    
+    def needs_embedding(self, query: str, retrieval: str = 'semantic') -> bool:
+        """Whether searching for query calls the embeddings API (lexical and reference queries do not)"""
+        return retrieval != 'lexical' and not parse_references(query)
+    
+    def _reference_results(self, reference_ids: np.ndarray, source_filter: Optional[Dict[str, Any]],
+                           min_score: float, neighbors: int, context: int = 0) -> List[Dict[str, Any]]:
+        """
+        The referenced verses (score 1.0, in reference order) plus optional semantic neighbours
+        
+        Neighbours are found with the centroid of the referenced verses'
+        own vectors, so no embedding call is needed.
+        """
+        indices, scores = reference_ids, np.ones(len(reference_ids), dtype=np.float32)
+        
+        if neighbors > 0:
+            centroid = self.index.reconstruct_batch(reference_ids).mean(axis=0, keepdims=True)
+            faiss.normalize_L2(centroid)
+            neighbor_scores, neighbor_indices = self._search_embedding(centroid, neighbors + len(reference_ids), source_filter)
+            keep = (neighbor_indices >= 0) & (neighbor_scores >= min_score) & ~np.isin(neighbor_indices, reference_ids)
+            indices = np.concatenate([indices, neighbor_indices[keep][:neighbors]])
+            scores = np.concatenate([scores, neighbor_scores[keep][:neighbors]])
+        
+        return self._build_results(indices, scores, 0.0, context)
+    
+    def _retrieve(self, query: str, query_embedding: Optional[np.ndarray], top_k: int,
+                  source_filter: Optional[Dict[str, Any]], min_score: float, retrieval: str,
+                  context: int = 0) -> List[Dict[str, Any]]:
+        """Run one retrieval mode and assemble its results"""
+        if retrieval == 'semantic':
+            return self._search_and_build(query_embedding, top_k, source_filter, min_score, context)
+        
+        if retrieval == 'lexical':
+            scores, indices = self._lexical_search(query, top_k, source_filter)
+            return self._build_results(indices, scores, 0.0, context)
+        
+        # Hybrid: fuse the semantic ranking (above min_score) with the BM25 ranking
+        depth = max(top_k, HYBRID_CANDIDATES)
+        semantic_scores, semantic_indices = self._search_embedding(query_embedding, depth, source_filter)
+        semantic_indices = semantic_indices[(semantic_indices >= 0) & (semantic_scores >= min_score)]
+        _, lexical_indices = self._lexical_search(query, depth, source_filter)
+        
+        scores, indices = reciprocal_rank_fusion([semantic_indices, lexical_indices])
+        return self._build_results(indices[:top_k], scores[:top_k], 0.0, context)
+    
+    def search(self, 
+               query: str, 
+               top_k: int = 10, 
+               source_filter: Optional[Dict[str, Any]] = None,
+               min_score: float = 0.0,
+               retrieval: str = 'semantic',
+               reference_neighbors: int = 0,
+               expand_context: int = 0) -> List[Dict[str, Any]]:
+        """
+        Search scripture content with semantic similarity and source filtering
+        
+        Args:
+            query: Natural language search query
+            top_k: Number of results to return
+            source_filter: Optional filtering criteria (see _filter_indices for options)
+            min_score: Minimum similarity score (0.0 to 1.0); applies to the semantic ranking
+            retrieval: 'semantic', 'hybrid' (semantic + BM25 via reciprocal rank fusion)
+                or 'lexical' (BM25 only, no embedding call)
+            reference_neighbors: For reference queries ("Alma 32:21"), how many
+                semantically similar segments to add after the exact verses
+            expand_context: Expand each hit into a passage with up to this many
+                neighbouring verses (same chapter) or paragraphs (same talk) on
+                each side; overlapping passages are merged (see _build_passages)
+        
+        Queries that are scripture references return every referenced verse
+        (regardless of top_k) straight from the reference index.
+        
+        Returns:
+            List of search results with content, metadata, and scores
+            (cosine similarity, fused RRF score, or BM25 score depending on retrieval)
+        """
+        if retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{retrieval}', expected one of {list(RETRIEVAL_MODES)}")
+        
+        logger.info(f"Searching for: '{query}' ({retrieval})")
+        
+        reference_ids = self._reference_ids(query, source_filter)
+        if reference_ids is not None:
+            logger.info(f"Resolved reference query to {len(reference_ids)} verses")
+            return self._reference_results(reference_ids, source_filter, min_score, reference_neighbors,
+                                           expand_context)
+        
+        # Generate query embedding
+        query_embedding = self._embed_query(query) if retrieval != 'lexical' else None
+        
+        results = self._retrieve(query, query_embedding, top_k, source_filter, min_score, retrieval, expand_context)
+        
+        logger.info(f"Found {len(results)} results")
+        return results
+    
+    async def asearch(self, 
+                      query: str, 
+                      top_k: int = 10, 
+                      source_filter: Optional[Dict[str, Any]] = None,
+                      min_score: float = 0.0,
+                      retrieval: str = 'semantic',
+                      reference_neighbors: int = 0,
+                      expand_context: int = 0,
+                      query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """
+        Non-blocking search() for async callers
+        
+        The embedding request is awaited on the async OpenAI client and the
+        FAISS / BM25 search runs on the engine's bounded thread pool, so the
+        event loop keeps serving other requests meanwhile.
+        
+        Args:
+            query_embedding: Already computed embedding of query (see aembed_query)
+        """
+        if retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{retrieval}', expected one of {list(RETRIEVAL_MODES)}")
+        
+        logger.info(f"Searching for: '{query}' ({retrieval})")
+        
+        loop = asyncio.get_running_loop()
+        
+        reference_ids = self._reference_ids(query, source_filter)
+        if reference_ids is not None:
+            logger.info(f"Resolved reference query to {len(reference_ids)} verses")
+            return await loop.run_in_executor(
+                self._executor, self._reference_results, reference_ids, source_filter, min_score,
+                reference_neighbors, expand_context
+            )
+        
+        if retrieval != 'lexical' and query_embedding is None:
+            query_embedding = await self.aembed_query(query)
+        
+        results = await loop.run_in_executor(
+            self._executor, self._retrieve, query, query_embedding, top_k, source_filter, min_score, retrieval,
+            expand_context
+        )
+        
         logger.info(f"Found {len(results)} results")
         return results
     
+    def _search_many_and_build(self, query_embeddings: np.ndarray, top_k: int,
+                               source_filter: Optional[Dict[str, Any]], min_score: float) -> List[List[Dict[str, Any]]]:
+        """Matrix FAISS search plus per-query result assembly"""
+        scores, indices = self._search_embeddings(query_embeddings, top_k, source_filter)
+        return [self._build_results(row_indices, row_scores, min_score)
+                for row_indices, row_scores in zip(indices, scores)]
+    
+    def search_many(self,
+                    queries: List[str],
+                    top_k: int = 10,
+                    source_filter: Optional[Dict[str, Any]] = None,
+                    min_score: float = 0.0) -> List[List[Dict[str, Any]]]:
+        """
+        Search many queries at once
+        
+        All uncached queries are embedded in batched API calls and searched
+        with a single matrix FAISS search, which is far faster than calling
+        search() in a loop.
+        
+        Args:
+            queries: Natural language search queries
+            top_k: Number of results per query
+            source_filter: Optional filtering criteria applied to every query
+            min_score: Minimum similarity score (0.0 to 1.0)
+        
+        Returns:
+            One list of search results per query, in input order
+        """
+        logger.info(f"Searching for {len(queries)} queries")
+        if not queries:
+            return []
+        
+        query_embeddings = self._embed_queries(queries)
+        return self._search_many_and_build(query_embeddings, top_k, source_filter, min_score)
+    
+    async def asearch_many(self,
+                           queries: List[str],
+                           top_k: int = 10,
+                           source_filter: Optional[Dict[str, Any]] = None,
+                           min_score: float = 0.0) -> List[List[Dict[str, Any]]]:
+        """Non-blocking search_many() for async callers (see asearch)"""
+        logger.info(f"Searching for {len(queries)} queries")
+        if not queries:
+            return []
+        
+        query_embeddings = await self.aembed_queries(queries)
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._search_many_and_build, query_embeddings, top_k, source_filter, min_score
+        )
+    
     def search_by_source(self, query: str, source_type: str, **kwargs) -> List[Dict[str, Any]]:
         """Convenience method to search within a specific source type"""
         source_filter = {"source_type": source_type}
@@ -220,34 +795,46 @@ class ScriptureSearchEngine:
         source_filter.update(kwargs)
         return self.search(query, source_filter=source_filter)
     
+    def close(self):
+        """
+        Shut down the search thread pool once the engine has been replaced
+        
+        Work already queued on the pool still finishes. Requests still holding
+        this engine that search again run on the event loop's default pool.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+    
+    def warm_up(self):
+        """
+        Run one search through each local path without calling the embeddings API
+        
+        Pages the memory-mapped index and postings in, builds anything built
+        lazily (e.g. a missing BM25 index) and starts FAISS's thread pool, so
+        the first real request does not pay for it.
+        """
+        start = time.time()
+        probe = np.zeros((1, self.embedding_dim), dtype=np.float32)
+        probe[0, 0] = 1.0
+        
+        scores, indices = self._search_embedding(probe, 10, None)
+        for subindex, _ in self.subindexes.values():
+            subindex.search(probe, 10)
+        self._build_results(indices, scores, -1.0, context=1)
+        self._lexical_search("faith", 10, None)
+        self._reference_ids("Alma 32:21", None)
+        
+        logger.info(f"Search engine warmed up in {time.time() - start:.2f}s")
+    
     def get_available_sources(self) -> Dict[str, Any]:
-        """Get summary of available sources for filtering"""
-        sources = {
-            "source_types": set(),
-            "standard_works": set(),
-            "books": set(),
-            "speakers": set(),
-            "years": set(),
-            "total_segments": len(self.metadata)
-        }
-        
-        for meta in self.metadata:
-            if "source_type" in meta:
-                sources["source_types"].add(meta["source_type"])
-            if "standard_work" in meta:
-                sources["standard_works"].add(meta["standard_work"])
-            if "book" in meta:
-                sources["books"].add(meta["book"])
-            if "speaker" in meta:
-                sources["speakers"].add(meta["speaker"])
-            if "year" in meta:
-                sources["years"].add(meta["year"])
-        
-        # Convert sets to sorted lists for JSON serialization
-        for key in ["source_types", "standard_works", "books", "speakers", "years"]:
-            sources[key] = sorted(list(sources[key]))
-        
-        return sources
+        """
+        Get summary of available sources for filtering
+        
+        Precomputed at load (see facets.compute_facets); treat as read-only.
+        facets_etag identifies this version of it.
+        """
+        return self.facets
 
 def main():
     parser = argparse.ArgumentParser(description="Search LDS Scripture Content")
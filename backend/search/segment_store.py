@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Compact, memory-mapped segment store for LDS Scripture Search
+Metadata is kept as string-interned categorical columns, chapter/verse/paragraph
+are packed into one integer per segment, and content lives in a contiguous
+UTF-8 blob addressed by an offsets array. Records are assembled on access,
+so startup is near-instant and worker processes share the mapped pages.
+"""
+
+import json
+import mmap
+import pickle
+import logging
+import argparse
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
+from pathlib import Path
+import numpy as np
+
+try:
+    from .metadata_columns import CategoricalColumn, encode_values
+except ImportError:  # Running as a standalone script
+    from metadata_columns import CategoricalColumn, encode_values
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SPEC_FILE = "scripture_segments.json"
+CODES_FILE = "scripture_segment_codes.npy"
+LOCATION_FILE = "scripture_segment_loc.npy"
+CONTENT_FILE = "scripture_content.bin"
+CONTENT_OFFSETS_FILE = "scripture_content_offsets.npy"
+
+# Small integer fields packed 16 bits each into one int64 per segment
+PACKED_FIELDS = ('chapter', 'verse', 'paragraph')
+PACKED_BITS = 16
+PACKED_MISSING = (1 << PACKED_BITS) - 1  # Slot value for None / absent
+
+# Code row holding each segment's key layout (which keys its dict has, in order)
+SCHEMA_FIELD = '__schema__'
+
+
+def _packable(values: Sequence[Any]) -> bool:
+    """Whether every non-null value of a field fits a packed 16-bit slot"""
+    return all(
+        value is None or (isinstance(value, int) and not isinstance(value, bool) and 0 <= value < PACKED_MISSING)
+        for value in values
+    )
+
+
+class SegmentStore:
+    """
+    Read-only sequence of segment metadata dicts
+
+    store[i] returns the metadata of segment i without its text;
+    store.content(i) returns the text.
+    """
+
+    def __init__(self, index_dir: str, mmap_files: bool = True):
+        """
+        Open the segment store in an index directory
+
+        Args:
+            index_dir: Directory written by SegmentStore.write
+            mmap_files: Memory-map the arrays and content blob instead of reading them
+        """
+        index_dir = Path(index_dir)
+        mmap_mode = 'r' if mmap_files else None
+
+        with open(index_dir / SPEC_FILE, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+
+        self._size = spec['size']
+        self._fields: List[str] = spec['fields']
+        self._categories: Dict[str, List[Any]] = spec['categories']
+        self._packed_fields: List[str] = spec['packed_fields']
+        self._schemas: List[List[str]] = self._categories[SCHEMA_FIELD]
+
+        codes = np.load(index_dir / CODES_FILE, mmap_mode=mmap_mode)
+        self._codes = {field: codes[row] for row, field in enumerate(self._fields)}
+        self._location = np.load(index_dir / LOCATION_FILE, mmap_mode=mmap_mode)
+        self._content_offsets = np.load(index_dir / CONTENT_OFFSETS_FILE, mmap_mode=mmap_mode)
+
+        with open(index_dir / CONTENT_FILE, 'rb') as f:
+            if not self._content_offsets[-1]:
+                self._content = b''
+            elif mmap_files:
+                # The mapping stays valid after the file object is closed
+                self._content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._content = f.read()
+
+        logger.info(f"Opened segment store with {self._size} segments "
+                    f"({len(self._fields) - 1} interned fields, {self._content_offsets[-1] / 1024 / 1024:.1f}MB content)")
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        """Check whether an index directory has a segment store"""
+        index_dir = Path(index_dir)
+        return all((index_dir / name).exists() for name in
+                   (SPEC_FILE, CODES_FILE, LOCATION_FILE, CONTENT_FILE, CONTENT_OFFSETS_FILE))
+
+    @staticmethod
+    def write(index_dir: str, metadata: Sequence[Dict[str, Any]]):
+        """
+        Write segment metadata dicts (with their 'content') as a compact store
+
+        Every dict key other than 'content' becomes an interned column; the
+        per-segment key layout is interned too so records round-trip exactly.
+        """
+        index_dir = Path(index_dir)
+        size = len(metadata)
+
+        schemas = [tuple(key for key in meta if key != 'content') for meta in metadata]
+        all_fields = list(dict.fromkeys(key for schema in dict.fromkeys(schemas) for key in schema))
+        values = {field: [meta.get(field) for meta in metadata] for field in all_fields}
+
+        packed_fields = [field for field in PACKED_FIELDS if field in values and _packable(values[field])]
+        location = np.zeros(size, dtype=np.int64)
+        for slot, field in enumerate(PACKED_FIELDS):
+            column = values.get(field) if field in packed_fields else None
+            slot_values = np.array(
+                [PACKED_MISSING if column is None or column[i] is None else column[i] for i in range(size)],
+                dtype=np.int64
+            )
+            location |= slot_values << (slot * PACKED_BITS)
+
+        fields = [SCHEMA_FIELD] + [field for field in all_fields if field not in packed_fields]
+        codes = np.full((len(fields), size), -1, dtype=np.int32)
+        categories = {}
+        for row, field in enumerate(fields):
+            column_values = [list(schema) for schema in schemas] if field == SCHEMA_FIELD else values[field]
+            codes[row], categories[field] = encode_values(column_values)
+
+        content_offsets = np.zeros(size + 1, dtype=np.int64)
+        with open(index_dir / CONTENT_FILE, 'wb') as f:
+            for i, meta in enumerate(metadata):
+                text = (meta.get('content') or '').encode('utf-8')
+                f.write(text)
+                content_offsets[i + 1] = content_offsets[i] + len(text)
+
+        np.save(index_dir / CODES_FILE, codes)
+        np.save(index_dir / LOCATION_FILE, location)
+        np.save(index_dir / CONTENT_OFFSETS_FILE, content_offsets)
+        with open(index_dir / SPEC_FILE, 'w', encoding='utf-8') as f:
+            json.dump({
+                'size': size,
+                'fields': fields,
+                'packed_fields': packed_fields,
+                'categories': categories
+            }, f, ensure_ascii=False)
+
+        logger.info(f"Segment store saved to {index_dir} ({len(fields) - 1} interned fields, "
+                    f"packed {packed_fields}, {content_offsets[-1] / 1024 / 1024:.1f}MB content)")
+
+    def _packed_values(self, field: str) -> np.ndarray:
+        """Unpack one packed field as an int64 array (PACKED_MISSING where absent)"""
+        slot = PACKED_FIELDS.index(field)
+        return (self._location >> (slot * PACKED_BITS)) & PACKED_MISSING
+
+    def column(self, field: str) -> Optional[CategoricalColumn]:
+        """
+        Get a stored field as a categorical column for filtering
+
+        Returns:
+            The column, or None if the store does not hold the field
+        """
+        if field in self._codes and field != SCHEMA_FIELD:
+            return CategoricalColumn(self._codes[field], self._categories[field])
+
+        if field in self._packed_fields:
+            values = self._packed_values(field)
+            present = values != PACKED_MISSING
+            categories, inverse = np.unique(values[present], return_inverse=True)
+            codes = np.full(self._size, -1, dtype=np.int32)
+            codes[present] = inverse
+            return CategoricalColumn(codes, [int(c) for c in categories])
+
+        return None
+
+    def content(self, idx: int) -> str:
+        """Get the text of a segment"""
+        idx = self._check_index(idx)
+        start, end = int(self._content_offsets[idx]), int(self._content_offsets[idx + 1])
+        return self._content[start:end].decode('utf-8')
+
+    def _check_index(self, idx: int) -> int:
+        idx = int(idx)
+        if idx < 0:
+            idx += self._size
+        if not 0 <= idx < self._size:
+            raise IndexError(f"Segment index {idx} out of range")
+        return idx
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        idx = self._check_index(idx)
+        location = int(self._location[idx])
+
+        record = {}
+        for key in self._schemas[self._codes[SCHEMA_FIELD][idx]]:
+            if key in self._packed_fields:
+                value = (location >> (PACKED_FIELDS.index(key) * PACKED_BITS)) & PACKED_MISSING
+                record[key] = None if value == PACKED_MISSING else value
+            else:
+                code = self._codes[key][idx]
+                record[key] = None if code < 0 else self._categories[key][code]
+        return record
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._size):
+            yield self[i]
+
+
+def convert_pickle(index_dir: str):
+    """Write the segment store for an index that only has scripture_metadata.pkl"""
+    index_dir = Path(index_dir)
+    with open(index_dir / "scripture_metadata.pkl", 'rb') as f:
+        metadata: List[Dict[str, Any]] = pickle.load(f)
+
+    SegmentStore.write(index_dir, metadata)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert pickled metadata into the compact segment store')
+    parser.add_argument('--index-dir', default='./indexes',
+                        help='Directory containing scripture_metadata.pkl')
+
+    args = parser.parse_args()
+    convert_pickle(args.index_dir)
+
+
+if __name__ == "__main__":
+    main()
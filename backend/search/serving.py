@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Search engine loading and pre-fork serving for the Gospel Guide API
+Loads the index once in a master process, then forks worker processes that
+accept connections on one shared socket. Workers share the index, segment
+store and everything else loaded before the fork (memory-mapped files
+through the page cache, the rest copy-on-write), so adding workers adds
+CPU, not RAM.
+"""
+
+import os
+import time
+import signal
+import socket
+import logging
+import multiprocessing
+from typing import Optional, Dict
+
+import faiss
+
+try:
+    from .scripture_search import ScriptureSearchEngine
+    from .cloud_storage import CloudStorageManager, setup_cloud_storage
+    from .prompts import MODE_SOURCE_FILTERS, preload_encoding
+    from .embedding_cache import EmbeddingCache
+    from .index_versions import resolve_index_dir, verify_manifest, read_current, prune_versions
+    from .audio_mixer import preload_music_beds
+except ImportError:  # Running as a standalone script
+    from scripture_search import ScriptureSearchEngine
+    from cloud_storage import CloudStorageManager, setup_cloud_storage
+    from prompts import MODE_SOURCE_FILTERS, preload_encoding
+    from embedding_cache import EmbeddingCache
+    from index_versions import resolve_index_dir, verify_manifest, read_current, prune_versions
+    from audio_mixer import preload_music_beds
+
+logger = logging.getLogger(__name__)
+
+# Seconds a worker must stay up before its exit counts as a crash to back off from
+MIN_WORKER_UPTIME = 5.0
+
+
+def load_search_engine(version: Optional[str] = None,
+                       embedding_cache: Optional[EmbeddingCache] = None) -> Optional[ScriptureSearchEngine]:
+    """
+    Download the indexes if configured, then load and warm up the search engine
+
+    Args:
+        version: Index version to load from a versioned INDEX_DIR (defaults to CURRENT)
+        embedding_cache: Query embedding cache to carry over from the engine being replaced
+
+    Returns:
+        The engine, or None if INDEX_DIR has no index
+    """
+    # Setup Cloud Storage (download indexes if on Cloud Run)
+    if os.getenv('BUCKET_NAME'):
+        logger.info("📦 Setting up Cloud Storage...")
+        cloud_start = time.time()
+        setup_cloud_storage(version)
+        logger.info(f"📦 Cloud Storage setup completed in {time.time() - cloud_start:.2f}s")
+
+    # Initialize search engine (optional - only if indexes exist)
+    logger.info("🔍 Checking for search engine indexes...")
+    index_dir, version = resolve_index_dir(os.getenv("INDEX_DIR", "search/indexes"), version)
+    if version:
+        # Sizes only: checksums were verified when the version was downloaded or published
+        verify_manifest(index_dir, checksums=False)
+        logger.info(f"📚 Index version {version}")
+    config_path = os.path.join(index_dir, "config.json")
+
+    if not os.path.exists(config_path):
+        logger.warning("⚠️  Search index files not found - search functionality will be disabled")
+        logger.warning(f"⚠️  Looking for: {config_path}")
+        return None
+
+    logger.info("📚 Index files found, loading search engine...")
+    search_start = time.time()
+    # Use OPENAI_API_KEY for embeddings in search engine
+    search_engine = ScriptureSearchEngine(index_dir=str(index_dir), openai_api_key=os.getenv("OPENAI_API_KEY"),
+                                          embedding_cache=embedding_cache)
+    # Ready-made sub-indexes for the fixed mode filters used by /ask
+    search_engine.build_mode_subindexes(MODE_SOURCE_FILTERS)
+    search_engine.warm_up()
+    logger.info(f"✅ Search engine loaded with {search_engine.index.ntotal:,} segments in {time.time() - search_start:.2f}s")
+    return search_engine
+
+
+def latest_index_release() -> Optional[str]:
+    """Version currently published for INDEX_DIR (in the bucket when BUCKET_NAME is set)"""
+    if os.getenv('BUCKET_NAME'):
+        return CloudStorageManager().current_version()
+    return read_current(os.getenv("INDEX_DIR", "search/indexes"))
+
+
+def prune_index_versions(*keep: Optional[str]):
+    """Delete the local copies of every index version but these (and CURRENT) from INDEX_DIR"""
+    prune_versions(os.getenv("INDEX_DIR", "search/indexes"), keep)
+
+
+class PreforkServer:
+    """Master process that preloads the search engine and supervises forked uvicorn workers"""
+
+    def __init__(self, workers: int, host: str = "0.0.0.0", port: int = 8080, backlog: int = 2048,
+                 log_level: str = "info"):
+        """
+        Args:
+            workers: Number of worker processes
+            host: Interface to listen on
+            port: Port to listen on
+            backlog: Listen backlog of the shared socket
+            log_level: uvicorn log level
+        """
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.log_level = log_level
+
+        # One flag per worker slot, set once that worker is warm; lives in shared memory
+        self.readiness = multiprocessing.Array('b', workers, lock=False)
+        self.search_engine = None
+        self.socket: Optional[socket.socket] = None
+        self.children: Dict[int, int] = {}      # pid -> worker slot
+        self.started: Dict[int, float] = {}     # worker slot -> start time
+        self.stopping = False
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self, slot: int):
+        """Fork the worker for one slot"""
+        self.readiness[slot] = 0
+        pid = os.fork()
+        if pid:
+            self.children[pid] = slot
+            self.started[slot] = time.time()
+            return
+
+        # Child: never returns
+        exit_code = 1
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, signal.SIG_DFL)
+            self._serve(slot)
+            exit_code = 0
+        except BaseException:
+            logger.exception(f"Worker {slot} failed")
+        finally:
+            os._exit(exit_code)
+
+    def _serve(self, slot: int):
+        """Worker body: import the app, hand it the preloaded engine and serve the shared socket"""
+        import uvicorn
+        try:
+            from . import api
+        except ImportError:  # Running as a standalone script
+            import api
+
+        # Split the cores between workers for FAISS's own parallelism
+        faiss.omp_set_num_threads(max(1, (os.cpu_count() or 1) // self.workers))
+
+        api.search_engine = self.search_engine
+        api.readiness = self.readiness
+        api.worker_slot = slot
+
+        server = uvicorn.Server(uvicorn.Config(api.app, log_level=self.log_level))
+        server.run(sockets=[self.socket])
+
+    def _stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"🛑 Received signal {signum}, stopping {len(self.children)} workers...")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        """Preload, fork the workers and restart any that exit until signalled to stop"""
+        start = time.time()
+        logger.info(f"🚀 Pre-fork server: {self.workers} workers on {self.host}:{self.port}")
+
+        # OpenMP's thread pool does not survive fork(): keep FAISS single-threaded
+        # in the master so no pool exists yet when the workers are forked
+        faiss.omp_set_num_threads(1)
+        self.search_engine = load_search_engine()
+        # Podcast music beds and the prompt tokenizer too, so the workers share one copy
+        preload_music_beds()
+        preload_encoding()
+        self.socket = self._bind()
+        logger.info(f"📚 Preloaded in {time.time() - start:.2f}s, forking workers...")
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            slot = self.children.pop(pid, None)
+            if slot is None:
+                continue
+            self.readiness[slot] = 0
+            if self.stopping:
+                continue
+
+            logger.warning(f"⚠️ Worker {slot} (pid {pid}) exited with status {status}, restarting")
+            if time.time() - self.started[slot] < MIN_WORKER_UPTIME:
+                time.sleep(MIN_WORKER_UPTIME)
+            if not self.stopping:
+                self._spawn(slot)
+
+        self.socket.close()
+        logger.info("👋 Pre-fork server stopped")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Request coalescing (single-flight) for the search API
+Concurrent identical requests share one execution: the first caller (the
+leader) does the work and every caller that arrives while it is in flight
+awaits the same result, or for streams, subscribes to the leader's events
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class _Broadcast:
+    """Events of one running stream, replayable by any number of subscribers"""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        # Wake every waiting subscriber and arm a fresh event for the next change
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def run(self, source: AsyncIterator[Any]):
+        """Drain the source, publishing each event"""
+        try:
+            async for event in source:
+                self.events.append(event)
+                self._notify()
+        except BaseException as e:
+            self.error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        """Every event from the start of the stream, then live ones until it ends"""
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _forget(self, registry: Dict[Hashable, Any], key: Hashable, entry: Any):
+        if registry.get(key) is entry:
+            del registry[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn() unless an identical call is in flight, in which case share its result
+
+        The work runs as its own task so a disconnecting leader does not
+        cancel it for the followers. Exceptions reach every caller.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(self._calls, key, t))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logger.info(f"🔗 Joined in-flight request {key}")
+        return await asyncio.shield(task)
+
+    def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Subscribe to the in-flight stream for key, starting factory() if there is none
+
+        Followers first receive the events already produced, then the rest
+        live, so every subscriber sees the complete stream.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            task = asyncio.ensure_future(broadcast.run(factory()))
+            task.add_done_callback(lambda t: self._forget(self._streams, key, broadcast))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logger.info(f"🔗 Subscribed to in-flight stream {key}")
+        return broadcast.subscribe()
+
+    def reset(self):
+        """
+        Stop coalescing onto the calls and streams in flight (e.g. after an index swap)
+        
+        Callers already waiting still get their results; new identical
+        requests start fresh executions.
+        """
+        self._calls.clear()
+        self._streams.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing counters"""
+        return {
+            'in_flight': len(self._calls) + len(self._streams),
+            'leaders': self.leaders,
+            'followers': self.followers,
+        }
@@ -0,0 +1,13 @@
+"""
+Shared pytest setup: makes the search package importable the way main.py
+imports it (run from backend/: python -m pytest tests)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# api.py builds its OpenAI clients at import time; tests never reach the network
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
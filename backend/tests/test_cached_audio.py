@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for serving cached podcast audio with HTTP Range support (/tts/audio)
+Run from backend/: python -m pytest tests
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from search import api
+from search.api import parse_byte_range
+
+PODCAST_KEY = "audio-cache/podcast/podcast_0123456789abcdef_aoede.mp3"
+AUDIO = bytes(range(256)) * 4
+
+
+class FakeAudioCache:
+    """Stands in for AudioCacheManager: a bucket of files in memory"""
+
+    def __init__(self, files):
+        self.files = files
+        self.requested = []
+
+    def get_blob_info(self, cache_key):
+        self.requested.append(cache_key)
+        if cache_key not in self.files:
+            return None
+        return {'size': len(self.files[cache_key]), 'etag': 'etag-1', 'generation': 1}
+
+    def iter_range(self, cache_key, first, last, generation=None, chunk_size=100):
+        data = self.files[cache_key]
+        for position in range(first, last + 1, chunk_size):
+            yield data[position:min(position + chunk_size, last + 1)]
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', (0, 99)),
+    ('bytes=1000-', (1000, 1023)),         # Open-ended
+    ('bytes=1000-5000', (1000, 1023)),     # Clamped to the end of the file
+    ('bytes=-100', (924, 1023)),           # Suffix: the last 100 bytes
+    ('bytes=-5000', (0, 1023)),
+    (None, None),
+    ('bytes=0-99,200-299', None),          # Multiple ranges: whole file
+    ('items=0-99', None),
+    ('bytes=-', None),
+    ('bytes=a-b', None),
+])
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, len(AUDIO)) == expected
+
+
+@pytest.mark.parametrize('header, size', [
+    ('bytes=1024-', 1024),                 # Starts past the end
+    ('bytes=5000-', 1024),
+    ('bytes=10-5', 1024),                  # Reversed
+    ('bytes=-0', 1024),                    # Empty suffix
+    ('bytes=0-', 0),                       # Empty file
+    ('bytes=-100', 0),
+])
+def test_parse_byte_range_unsatisfiable(header, size):
+    with pytest.raises(ValueError):
+        parse_byte_range(header, size)
+
+
+def test_empty_file_without_range():
+    assert parse_byte_range(None, 0) is None
+
+
+@pytest.fixture
+def audio_cache(monkeypatch):
+    cache = FakeAudioCache({
+        PODCAST_KEY: AUDIO,
+        "audio-cache/study_guide/study_guide_week_01_essential_alnilam.mp3": b"",
+        "audio-cache/segments/" + "ab" * 32 + ".mp3": b"segment",
+    })
+    monkeypatch.setattr(api, 'audio_cache_manager', cache)
+    return cache
+
+
+@pytest.fixture
+def client(audio_cache):
+    return TestClient(api.app)
+
+
+def test_serves_whole_file(client):
+    response = client.get(f"/tts/audio/{PODCAST_KEY}")
+    assert response.status_code == 200
+    assert response.content == AUDIO
+    assert response.headers['content-type'] == 'audio/mpeg'
+    assert response.headers['accept-ranges'] == 'bytes'
+    assert response.headers['content-length'] == str(len(AUDIO))
+
+
+@pytest.mark.parametrize('header, first, last', [
+    ('bytes=100-349', 100, 349),
+    ('bytes=1000-', 1000, 1023),
+    ('bytes=-24', 1000, 1023),
+])
+def test_serves_range(client, header, first, last):
+    response = client.get(f"/tts/audio/{PODCAST_KEY}", headers={'Range': header})
+    assert response.status_code == 206
+    assert response.content == AUDIO[first:last + 1]
+    assert response.headers['content-range'] == f"bytes {first}-{last}/{len(AUDIO)}"
+    assert response.headers['content-length'] == str(last - first + 1)
+
+
+@pytest.mark.parametrize('header', ['bytes=1024-', 'bytes=-0'])
+def test_unsatisfiable_range_is_416(client, header):
+    response = client.get(f"/tts/audio/{PODCAST_KEY}", headers={'Range': header})
+    assert response.status_code == 416
+    assert response.headers['content-range'] == f"bytes */{len(AUDIO)}"
+
+
+def test_empty_file(client):
+    key = "audio-cache/study_guide/study_guide_week_01_essential_alnilam.mp3"
+    response = client.get(f"/tts/audio/{key}")
+    assert response.status_code == 200
+    assert response.content == b"" and response.headers['content-length'] == '0'
+    assert client.get(f"/tts/audio/{key}", headers={'Range': 'bytes=0-'}).status_code == 416
+
+
+def test_head_and_if_none_match(client):
+    response = client.head(f"/tts/audio/{PODCAST_KEY}", headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert response.headers['content-length'] == '10' and response.content == b""
+
+    etag = response.headers['etag']
+    assert client.get(f"/tts/audio/{PODCAST_KEY}", headers={'If-None-Match': etag}).status_code == 304
+
+
+@pytest.mark.parametrize('cache_key', [
+    "audio-cache/segments/" + "ab" * 32 + ".mp3",            # Per-segment TTS fragment
+    "audio-cache/podcast/../segments/" + "ab" * 32 + ".mp3",
+    "audio-cache/podcast/podcast_0123456789abcdef_aoede.wav",
+    "indexes/versions/v1/embeddings.mp3",
+    "audio-cache/podcast/other_0123456789abcdef.mp3",
+])
+def test_only_final_podcasts_are_served(client, audio_cache, cache_key):
+    assert client.get(f"/tts/audio/{cache_key}").status_code == 404
+    assert audio_cache.requested == []
+
+
+@pytest.mark.parametrize('fields', [
+    {},
+    {'content_type': 'study_guide', 'week_number': 1, 'study_level': 'essential'},
+    {'content_type': 'lesson_plan', 'week_number': 12, 'audience': 'youth', 'voice': 'en-US-Chirp3-HD-Aoede'},
+    {'content_type': 'core_content', 'week_number': 3},
+    {'content_type': 'daily_thoughts', 'week_number': 52},
+    {'content_type': 'chat_answer'},
+])
+def test_podcast_cache_keys_are_servable(fields):
+    request = api.TTSPodcastRequest(text="Faith is not to have a perfect knowledge of things.", **fields)
+    assert api.PODCAST_CACHE_KEY.fullmatch(api.podcast_cache_key(request, is_conversation=False))
+
+
+def test_missing_file_is_404(client):
+    assert client.get("/tts/audio/audio-cache/podcast/podcast_ffffffffffffffff.mp3").status_code == 404
+
+
+def test_unavailable_without_audio_cache(monkeypatch):
+    monkeypatch.setattr(api, 'audio_cache_manager', None)
+    assert TestClient(api.app).get(f"/tts/audio/{PODCAST_KEY}").status_code == 503
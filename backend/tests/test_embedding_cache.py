@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the query embedding cache's persistent tier: fork() and the event loop
+Run from backend/: python -m pytest tests
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from search.embedding_cache import EmbeddingCache
+
+MODEL = "text-embedding-3-small"
+WRITES_PER_WORKER = 200
+
+
+def _vector(worker: int, i: int) -> np.ndarray:
+    return np.full(8, worker * 1000 + i, dtype=np.float32)
+
+
+def _run_worker(cache: EmbeddingCache, parent_db, worker: int):
+    """Body of a forked worker: write through the inherited cache, then exit without returning"""
+    exit_code = 1
+    try:
+        with cache._db_lock:
+            assert cache._db() is not parent_db, "worker reused the parent's SQLite connection"
+        for i in range(WRITES_PER_WORKER):
+            cache.put(f"worker {worker} query {i}", MODEL, _vector(worker, i))
+        cache.flush()
+        exit_code = 0
+    finally:
+        os._exit(exit_code)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_forked_workers_write_through_own_connections(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(max_size=16, path=path)
+    cache.put("parent query", MODEL, _vector(0, 0))
+    cache.flush()
+    with cache._db_lock:
+        parent_db = cache._db()
+
+    pids = []
+    for worker in (1, 2):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(cache, parent_db, worker)
+        pids.append(pid)
+    for pid in pids:
+        _, status = os.waitpid(pid, 0)
+        assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+    # The parent's own connection still works and sees every worker's rows
+    assert cache.stats()['disk_size'] == 1 + 2 * WRITES_PER_WORKER
+    fresh = EmbeddingCache(max_size=16, path=path)
+    for worker in (1, 2):
+        for i in (0, WRITES_PER_WORKER - 1):
+            embedding = fresh.get(f"worker {worker} query {i}", MODEL)
+            assert embedding is not None
+            np.testing.assert_array_equal(embedding, _vector(worker, i))
+    assert fresh.disk_hits == 4
+
+
+def test_put_does_not_wait_for_the_write_lock(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(max_size=16, path=path)
+
+    # Another worker holds the database's write lock
+    other = sqlite3.connect(path)
+    other.execute("BEGIN IMMEDIATE")
+    start = time.time()
+    cache.put("held query", MODEL, _vector(1, 1))
+    assert time.time() - start < 0.5
+    assert cache.get("held query", MODEL) is not None  # Served from memory meanwhile
+
+    other.rollback()
+    other.close()
+    cache.flush()
+    fresh = EmbeddingCache(max_size=16, path=path)
+    np.testing.assert_array_equal(fresh.get("held query", MODEL), _vector(1, 1))
+
+
+def test_aget_reads_disk_off_the_event_loop(tmp_path, monkeypatch):
+    path = str(tmp_path / "embeddings.sqlite")
+    writer_cache = EmbeddingCache(path=path)
+    writer_cache.put("disk query", MODEL, _vector(2, 2))
+    writer_cache.flush()
+
+    cache = EmbeddingCache(max_size=16, path=path)
+    disk_threads = []
+    get_disk = cache._get_disk
+
+    def recording_get_disk(key):
+        disk_threads.append(threading.current_thread())
+        return get_disk(key)
+
+    monkeypatch.setattr(cache, "_get_disk", recording_get_disk)
+
+    async def lookups():
+        first = await cache.aget("disk query", MODEL)   # Memory miss: disk read on an executor
+        second = await cache.aget("disk query", MODEL)  # Promoted: memory hit, no disk read
+        missing = await cache.aget("never embedded", MODEL)
+        return first, second, missing
+
+    first, second, missing = asyncio.run(lookups())
+    np.testing.assert_array_equal(first, _vector(2, 2))
+    assert second is first and missing is None
+    assert len(disk_threads) == 2 and threading.main_thread() not in disk_threads
+    assert (cache.hits, cache.disk_hits, cache.misses) == (1, 1, 1)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for pruning local index versions (index_versions)
+Run from backend/: python -m pytest tests
+"""
+
+import os
+
+import numpy as np
+
+from search.index_versions import list_versions, prune_versions, set_current, version_dir
+
+
+def _publish(root: str, *versions: str):
+    for version in versions:
+        os.makedirs(version_dir(root, version))
+        np.save(os.path.join(version_dir(root, version), "embeddings.npy"), np.arange(4, dtype=np.float32))
+
+
+def test_prune_keeps_current_and_previous(tmp_path):
+    root = str(tmp_path)
+    _publish(root, "v1", "v2", "v3", "v4")
+    set_current(root, "v4")
+    # A download in progress in another worker
+    partial = os.path.join(root, "versions", ".v5.123.partial")
+    os.makedirs(partial)
+
+    assert prune_versions(root, ["v4", "v3"]) == ["v1", "v2"]
+    assert list_versions(root) == ["v3", "v4"]
+    assert os.path.isdir(partial)
+    assert prune_versions(root, ["v4", "v3"]) == []
+
+
+def test_prune_never_removes_current(tmp_path):
+    root = str(tmp_path)
+    _publish(root, "v1", "v2")
+    set_current(root, "v1")
+
+    # First load: no previous version
+    assert prune_versions(root, ["v2", None]) == []
+    assert list_versions(root) == ["v1", "v2"]
+
+
+def test_engine_still_reads_a_pruned_version(tmp_path):
+    root = str(tmp_path)
+    _publish(root, "v1", "v2")
+    set_current(root, "v2")
+    embeddings = np.load(os.path.join(version_dir(root, "v1"), "embeddings.npy"), mmap_mode="r")
+
+    assert prune_versions(root, ["v2"]) == ["v1"]
+    assert not os.path.exists(version_dir(root, "v1"))
+    np.testing.assert_array_equal(embeddings, np.arange(4, dtype=np.float32))
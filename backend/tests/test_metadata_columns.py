@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the source filter language (metadata_columns) and its 400 mapping in /search
+Run from backend/: python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from search import api
+from search.metadata_columns import MetadataColumns, parse_filter
+
+METADATA = [
+    {'source_type': 'scripture', 'book': 'Alma', 'chapter': 32, 'year': None},
+    {'source_type': 'scripture', 'book': '1 Nephi', 'chapter': 3},
+    {'source_type': 'conference', 'speaker': 'Russell M. Nelson', 'year': 2019},
+    {'source_type': 'conference', 'speaker': 'Dallin H. Oaks', 'year': '1995'},
+    {'source_type': 'conference', 'speaker': 'Gordon B. Hinckley', 'year': 'unknown'},
+]
+
+
+@pytest.fixture
+def columns():
+    return MetadataColumns(METADATA)
+
+
+def matches(columns, source_filter):
+    return np.flatnonzero(columns.mask(source_filter)).tolist()
+
+
+def test_parse_filter_forms():
+    clauses = parse_filter({
+        'book': 'nephi',
+        'min_year': 1971,
+        'year': {'max': 2000, 'not_in': [1990]},
+    })
+    assert clauses == [
+        ('book', 'match', 'nephi'),
+        ('year', 'min', 1971),
+        ('year', 'max', 2000),
+        ('year', 'not_in', [1990]),
+    ]
+    # A bare prefix is a field name, not a range bound
+    assert parse_filter({'min_': 'x'}) == [('min_', 'match', 'x')]
+
+
+@pytest.mark.parametrize('source_filter', [
+    {'book': {'like': 'Alma'}},
+    {'book': {}},
+    {'year': {'min': 'recent'}},
+    {'max_year': None},
+    {'speaker': {'in': 'Russell M. Nelson'}},
+    {'speaker': {'not_in': 'Russell M. Nelson'}},
+])
+def test_parse_filter_rejects_bad_input(source_filter):
+    with pytest.raises(ValueError):
+        parse_filter(source_filter)
+
+
+def test_plain_values(columns):
+    assert matches(columns, {'book': 'NEPHI'}) == [1]                          # Case-insensitive substring
+    assert matches(columns, {'chapter': '32'}) == [0]                          # str() equality for non-strings
+    assert matches(columns, {'chapter': 32}) == [0]
+    assert matches(columns, {'speaker': ['Dallin H. Oaks', 'Nobody']}) == [3]  # List: one of the values
+
+
+def test_eq_and_contains(columns):
+    assert matches(columns, {'book': {'eq': 'alma'}}) == [0]
+    assert matches(columns, {'book': {'eq': 'Alm'}}) == []
+    assert matches(columns, {'speaker': {'contains': 'nelson'}}) == [2]
+    assert matches(columns, {'chapter': {'contains': '3'}}) == [0, 1]
+
+
+def test_in_and_not_in(columns):
+    assert matches(columns, {'speaker': {'in': ['russell m. nelson', 'Dallin H. Oaks']}}) == [2, 3]
+    # Segments without the field pass not_in
+    assert matches(columns, {'speaker': {'not_in': ['Dallin H. Oaks']}}) == [0, 1, 2, 4]
+
+
+def test_ranges(columns):
+    # Numeric strings count; missing and non-numeric values are NaN and never match a bound
+    assert matches(columns, {'min_year': 1990}) == [2, 3]
+    assert matches(columns, {'max_year': '2000'}) == [3]
+    assert matches(columns, {'year': {'min': 1990, 'max': 2000}}) == [3]
+    assert matches(columns, {'year': {'min': 2020}}) == []
+
+
+def test_clauses_are_anded(columns):
+    assert matches(columns, {'source_type': 'conference', 'min_year': 1990, 'speaker': {'not_in': ['Dallin H. Oaks']}}) == [2]
+    assert matches(columns, {'source_type': 'scripture', 'book': {'in': ['Alma', '1 Nephi']}, 'chapter': {'max': 10}}) == [1]
+    assert matches(columns, {}) == [0, 1, 2, 3, 4]
+
+
+def test_search_maps_invalid_filter_to_400(monkeypatch):
+    class FilteringEngine:
+        """Stands in for the search engine: applies the filter, finds nothing"""
+
+        async def asearch(self, query, source_filter=None, **kwargs):
+            MetadataColumns(METADATA).mask(source_filter or {})
+            return []
+
+    monkeypatch.setattr(api, 'search_engine', FilteringEngine())
+    client = TestClient(api.app)
+
+    response = client.post('/search', json={'query': 'faith', 'source_filter': {'year': {'min': 'recent'}}})
+    assert response.status_code == 400
+    assert response.json()['detail'].startswith('Invalid source filter')
+
+    response = client.post('/search', json={'query': 'faith', 'source_filter': {'year': {'min': 1990}}})
+    assert response.status_code == 200
+    assert response.json()['results'] == []
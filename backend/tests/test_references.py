@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for scripture reference parsing and lookup (references) and for
+merging neighbouring hits into passages (neighbors, ScriptureSearchEngine)
+Run from backend/: python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+
+from search.metadata_columns import MetadataColumns
+from search.neighbors import compute_neighbors, expand_hits, passage_citation
+from search.references import MAX_CHAPTER_SPAN, Reference, ReferenceIndex, canonical_book, parse_references
+from search.scripture_search import ScriptureSearchEngine
+
+
+def _verse(book: str, chapter: int, verse: int):
+    return {'source_type': 'scripture', 'book': book, 'chapter': chapter, 'verse': verse,
+            'citation': f"({book} {chapter}:{verse})", 'content': f"{book} {chapter}:{verse} text"}
+
+
+# Alma 2:1-6, Alma 3:1-2, 1 Nephi 3:7, and D&C 121:7-8 stored without a chapter (older segments)
+METADATA = (
+    [_verse('Alma', 2, v) for v in range(1, 7)]
+    + [_verse('Alma', 3, v) for v in (1, 2)]
+    + [_verse('1 Nephi', 3, 7)]
+    + [{'source_type': 'scripture', 'book': 'Doctrine and Covenants', 'verse': v,
+        'citation': f"(D&C 121:{v})", 'content': f"D&C 121:{v} text"} for v in (7, 8)]
+)
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('Alma 2:3-5', [Reference('Alma', 2, 3, 5)]),
+    ('Alma 2', [Reference('Alma', 2)]),
+    ('Alma 2-3', [Reference('Alma', 2), Reference('Alma', 3)]),
+    ('1 Nephi 3:7', [Reference('1 Nephi', 3, 7, 7)]),
+    ('1 Ne. 3:7', [Reference('1 Nephi', 3, 7, 7)]),
+    ('First Nephi 3:7?', [Reference('1 Nephi', 3, 7, 7)]),
+    ('1ne 3:7', [Reference('1 Nephi', 3, 7, 7)]),
+    ('D&C 121:7–8', [Reference('Doctrine and Covenants', 121, 7, 8)]),
+    ('Alma 32:21, 27-28', [Reference('Alma', 32, 21, 21), Reference('Alma', 32, 27, 28)]),
+    ('1 Ne. 3:7; Ether 12:27', [Reference('1 Nephi', 3, 7, 7), Reference('Ether', 12, 27, 27)]),
+    ('Enos 8', [Reference('Enos', 1, 8, 8)]),                 # Single-chapter book: the number is a verse
+    ('Enos 3-8', [Reference('Enos', 1, 3, 8)]),
+])
+def test_parse_references(query, expected):
+    assert parse_references(query) == expected
+
+
+@pytest.mark.parametrize('query', [
+    'faith in Alma 32',      # Other words: a normal search query
+    'Alma',                  # No chapter
+    '1 Nephi',
+    'Hezekiah 3:2',          # Unknown book
+    'Alma 2:3-',             # Unfinished range
+    'Alma 5-3',              # Reversed chapter range
+    'Alma 2:5-3',            # Reversed verse range
+    'Enos 8-3',
+    'Alma 0',                # Chapters and verses start at 1
+    'Alma 2:0',
+    'Alma 2:3; faith',       # Every part must be a reference
+    '',
+])
+def test_parse_rejects_non_references(query):
+    assert parse_references(query) == []
+
+
+def test_chapter_span_is_capped():
+    references = parse_references('Alma 1-400')
+    assert len(references) == MAX_CHAPTER_SPAN + 1
+    assert references[-1] == Reference('Alma', 1 + MAX_CHAPTER_SPAN)
+
+
+def test_canonical_book():
+    assert canonical_book('d & c') == 'Doctrine and Covenants'
+    assert canonical_book('JS-H') == 'Joseph Smith—History'
+    assert canonical_book('Nephi') is None
+
+
+def test_reference_index_lookup():
+    index = ReferenceIndex(MetadataColumns(METADATA))
+    assert index.lookup(parse_references('Alma 2:3-5')).tolist() == [2, 3, 4]
+    assert index.lookup(parse_references('Alma 3')).tolist() == [6, 7]
+    # Verses past the end of the chapter are skipped; duplicates are kept once
+    assert index.lookup(parse_references('Alma 2:5-9; Alma 2:6; 1 Ne 3:7')).tolist() == [4, 5, 8]
+    # D&C segments without a chapter take their section from the citation
+    assert index.lookup(parse_references('D&C 121:7-8')).tolist() == [9, 10]
+    assert index.lookup(parse_references('Alma 40')).tolist() == []
+
+
+@pytest.mark.parametrize('first, last, expected', [
+    ('(Alma 2:2)', '(Alma 2:5)', '(Alma 2:2-5)'),
+    ('(Alma 2:2)', '(Alma 2:2)', '(Alma 2:2)'),
+    ('(Alma 2:6)', '(Alma 3:1)', '(Alma 2:6)'),             # Different chapters keep the first citation
+    ('Russell M. Nelson, 2019', 'Russell M. Nelson, 2019', 'Russell M. Nelson, 2019'),
+    ('', '(Alma 2:5)', ''),
+])
+def test_passage_citation(first, last, expected):
+    assert passage_citation(first, last) == expected
+
+
+def test_expand_hits_merges_overlapping_windows():
+    neighbors = compute_neighbors(MetadataColumns(METADATA))
+    # Alma 2:1-6 are linked to each other only; 2:6 does not run on into chapter 3
+    assert neighbors[1, 5] == -1 and neighbors[0, 6] == -1
+
+    # Hits on Alma 2:3 and 2:4 overlap: one passage, under the better-ranked hit
+    assert expand_hits(neighbors, [(2, 0.9), (3, 0.8)], 1) == [(2, 0.9, [1, 2, 3, 4])]
+    # Hits two verses apart are bridged by their windows
+    assert expand_hits(neighbors, [(4, 0.9), (0, 0.8), (2, 0.7)], 1) == [(4, 0.9, [0, 1, 2, 3, 4, 5])]
+    # Separate chapters stay separate passages, best first
+    assert expand_hits(neighbors, [(6, 0.9), (3, 0.5)], 1) == [(6, 0.9, [6, 7]), (3, 0.5, [2, 3, 4])]
+
+
+def test_build_passages_widens_the_citation():
+    engine = object.__new__(ScriptureSearchEngine)
+    engine.metadata = METADATA
+    engine.segment_links = compute_neighbors(MetadataColumns(METADATA))
+
+    results = engine._build_passages(np.array([2, 3, 8]), np.array([0.9, 0.8, 0.7]), min_score=0.0, context=1)
+    assert [r['rank'] for r in results] == [1, 2]
+
+    alma = results[0]
+    assert alma['score'] == pytest.approx(0.9)
+    assert alma['metadata']['citation'] == '(Alma 2:2-5)'
+    assert alma['metadata']['passage'] == {
+        'segments': 4,
+        'hit_citation': '(Alma 2:3)',
+        'first_citation': '(Alma 2:2)',
+        'last_citation': '(Alma 2:5)',
+    }
+    assert alma['content'] == '\n'.join(f"Alma 2:{v} text" for v in range(2, 6))
+    assert 'content' not in alma['metadata']
+
+    # A verse with no neighbours is its own passage with its own citation
+    assert results[1]['metadata']['citation'] == '(1 Nephi 3:7)'
+    assert results[1]['metadata']['passage']['segments'] == 1
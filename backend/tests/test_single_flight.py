@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Tests for request coalescing (single_flight)
+Run from backend/: python -m pytest tests
+"""
+
+import asyncio
+
+import pytest
+
+from search.single_flight import SingleFlight
+
+CALLERS = 10
+
+
+class Upstream:
+    """Counts calls and streams; each waits until released so callers overlap"""
+
+    def __init__(self, error: Exception = None):
+        self.calls = 0
+        self.streams = 0
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def call(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return f"result {self.calls}"
+
+    async def events(self, count: int = 5):
+        self.streams += 1
+        for i in range(count):
+            if i == 2:
+                await self.release.wait()
+            yield i
+            await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        callers = [asyncio.create_task(flight.do("key", upstream.call)) for _ in range(CALLERS)]
+        await asyncio.sleep(0.01)
+        upstream.release.set()
+        results = await asyncio.gather(*callers)
+
+        assert upstream.calls == 1
+        assert results == ["result 1"] * CALLERS
+        assert flight.stats() == {'in_flight': 0, 'leaders': 1, 'followers': CALLERS - 1}
+
+        # Finished calls are not reused
+        assert await flight.do("key", upstream.call) == "result 2"
+        # Different keys never share
+        other = await asyncio.gather(flight.do("a", upstream.call), flight.do("b", upstream.call))
+        assert upstream.calls == 4 and other == ["result 3", "result 4"]
+
+    asyncio.run(scenario())
+
+
+def test_exception_reaches_every_waiter():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream(error=ValueError("bad filter"))
+        callers = [asyncio.create_task(flight.do("key", upstream.call)) for _ in range(CALLERS)]
+        await asyncio.sleep(0.01)
+        upstream.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+
+        assert upstream.calls == 1
+        assert all(isinstance(r, ValueError) and str(r) == "bad filter" for r in results)
+        assert flight.stats()['in_flight'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        leader = asyncio.create_task(flight.do("key", upstream.call))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.do("key", upstream.call))
+        await asyncio.sleep(0.01)
+
+        leader.cancel()
+        upstream.release.set()
+        assert await follower == "result 1"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert upstream.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_late_subscriber_receives_the_full_stream():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        early = asyncio.create_task(_collect(flight.stream("key", upstream.events)))
+        # Let the leader publish its first events before the others join
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert flight._streams["key"].events == [0, 1]
+        late = [asyncio.create_task(_collect(flight.stream("key", upstream.events))) for _ in range(CALLERS - 1)]
+        await asyncio.sleep(0.01)
+        upstream.release.set()
+
+        results = await asyncio.gather(early, *late)
+        assert upstream.streams == 1
+        assert results == [[0, 1, 2, 3, 4]] * CALLERS
+        assert flight.stats() == {'in_flight': 0, 'leaders': 1, 'followers': CALLERS - 1}
+
+    asyncio.run(scenario())
+
+
+def test_stream_error_reaches_every_subscriber():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream(error=RuntimeError("upstream failed"))
+        subscribers = [asyncio.create_task(_collect(flight.stream("key", upstream.events))) for _ in range(CALLERS)]
+        await asyncio.sleep(0.01)
+        upstream.release.set()
+        results = await asyncio.gather(*subscribers, return_exceptions=True)
+
+        assert upstream.streams == 1
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    asyncio.run(scenario())
+
+
+def test_reset_starts_fresh_executions():
+    async def scenario():
+        flight, first = SingleFlight(), Upstream()
+        waiting = asyncio.create_task(flight.do("key", first.call))
+        streaming = asyncio.create_task(_collect(flight.stream("stream", first.events)))
+        await asyncio.sleep(0.01)
+
+        flight.reset()
+        assert flight.stats()['in_flight'] == 0
+
+        second = Upstream()
+        second.release.set()
+        assert await flight.do("key", second.call) == "result 1"
+        assert await _collect(flight.stream("stream", second.events)) == [0, 1, 2, 3, 4]
+        assert (second.calls, second.streams) == (1, 1)
+
+        # Callers from before the reset still get the original results
+        first.release.set()
+        assert await waiting == "result 1"
+        assert await streaming == [0, 1, 2, 3, 4]
+        assert (first.calls, first.streams) == (1, 1)
+
+    asyncio.run(scenario())